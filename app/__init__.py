@@ -11,6 +11,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .agent import root_agent
+from typing import Any
 
 __all__ = ["root_agent"]
+
+
+def __getattr__(name: str) -> Any:
+    # Loaded on first use, so tools like app.utils.file_tracing run without
+    # credentials or the ADK agent stack
+    if name == "root_agent":
+        from .agent import root_agent
+
+        return root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
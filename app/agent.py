@@ -15,7 +15,6 @@
 import os
 from zoneinfo import ZoneInfo
 
-import google.auth
 from google.adk.agents import Agent
 from google.adk.tools.agent_tool import AgentTool
 
@@ -24,10 +23,11 @@ from app.agents.illustrator.agent import illustrator_agent
 from app.agents.narrator.agent import narrator_agent
 from app.agents.rules.agent import dnd_rules_agent
 from app.agents.storyteller.agent import storyteller_agent
-from app.utils.dice import roll_dice
+from app.utils.combat import simulate_combat
+from app.utils.dice import dice_odds, roll_dice, roll_dice_batch
 
-_, project_id = google.auth.default()
-os.environ.setdefault("GOOGLE_CLOUD_PROJECT", project_id)
+# The server resolves the project during startup; when run alone, the genai
+# client finds it through Application Default Credentials on first use
 os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "global")
 os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
 
@@ -125,8 +125,10 @@ Based on verified rules and character capabilities, determine what happens:
 When combat begins:
 
 *   Call dnd_rules_agent to get monster stats and abilities
+*   **Check Encounter Balance:** Before an arena bout or other major fight, call simulate_combat with the party's and monsters' AC, HP and attacks instead of guessing the difficulty. Adjust the opposition if the party's win probability is far from what the story calls for
 *   Roll or determine initiative order (NPCs/monsters act in order automatically)
 *   **For NPC/Monster Turns:** Execute their actions automatically based on their tactics and abilities
+*   **Batch Monster Rolls:** Make all NPC/monster rolls for the round (every attack and damage roll) in a single roll_dice_batch call, labelling each roll, rather than calling roll_dice once per roll
 *   **For Player Character Turn:** Present the situation, ask "What do you do?" and **⛔ STOP - Wait for player input**
 *   Never roll attack/damage dice for the player - always request they provide the result
 *   After player provides dice results, calculate totals, apply mechanics, and call storyteller_agent
@@ -155,6 +157,7 @@ You are required to identify when an ability check is necessary. Do not allow pl
     *   *Example:* Player rolls 14 -> You respond: "With your Perception bonus, that's a 16." Then call storyteller_agent: "The player succeeded on their Perception check with a 16. Please narrate what they notice about hidden traps near the doorframe."
     *   *Example:* Player rolls 1 -> You respond: "That's a natural 1 - an automatic failure." Then call storyteller_agent: "The player critically failed their Perception check. Please narrate how they completely miss the traps."
 *   **Setting the DC:** You will set the DC in your internal monologue based on this scale: Very Easy (5), Easy (10), Medium (15), Hard (20), Very Hard (25), Nearly Impossible (30). You do not need to state the DC to the player.
+*   **Judging Odds:** Never estimate probabilities yourself. Call the dice_odds tool with the roll and DC (e.g., "1d20+3 adv" against DC 15) to get the exact chance of success.
 *   **Advantage & Disadvantage:** These affect ALL d20 rolls (ability checks, attack rolls, saving throws):
     *   **Advantage:** Player rolls 2d20 and uses the higher result. Announce: "Roll with advantage - roll 2d20 and use the higher."
     *   **Disadvantage:** Player rolls 2d20 and uses the lower result. Announce: "Roll with disadvantage - roll 2d20 and use the lower."
@@ -286,5 +289,8 @@ You are the orchestrator who brings everything together. You handle mechanics an
         AgentTool(agent=narrator_agent),
         AgentTool(agent=character_agent),
         roll_dice,
+        roll_dice_batch,
+        dice_odds,
+        simulate_combat,
     ],
 )
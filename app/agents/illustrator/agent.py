@@ -12,19 +12,141 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import hashlib
 from io import BytesIO
 import logging
+import os
+from typing import TYPE_CHECKING
 import uuid
-from PIL import Image
 
 from google.adk.agents import Agent
 from google.adk.tools import ToolContext
 from google.genai import types as genai_types
-from vertexai.preview.vision_models import ImageGenerationModel
 from google.genai import types
 from google import genai
 from google.genai.types import HttpOptions
 
+from app.utils.illustration_cache import IllustrationCache
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Cap on image generations running at once across all sessions
+MAX_CONCURRENT_ILLUSTRATIONS = int(os.getenv("MAX_CONCURRENT_ILLUSTRATIONS", "4"))
+
+# Format of saved illustrations: "png", "webp" or "jpeg"
+ILLUSTRATION_FORMAT = os.getenv("ILLUSTRATION_FORMAT", "png").lower()
+# WebP and JPEG encoder quality, from 1 to 100
+ILLUSTRATION_QUALITY = int(os.getenv("ILLUSTRATION_QUALITY", "80"))
+# Longest side in pixels of an extra thumbnail artifact, 0 for none
+ILLUSTRATION_THUMBNAIL_SIZE = int(os.getenv("ILLUSTRATION_THUMBNAIL_SIZE", "0"))
+
+_MIME_TYPES = {"png": "image/png", "webp": "image/webp", "jpeg": "image/jpeg"}
+if ILLUSTRATION_FORMAT not in _MIME_TYPES:
+    raise ValueError(f"Unsupported ILLUSTRATION_FORMAT: {ILLUSTRATION_FORMAT}")
+
+# Local disk cache of generated illustrations, disabled when the size is 0
+ILLUSTRATION_CACHE_DIR = os.getenv("ILLUSTRATION_CACHE_DIR", ".illustration_cache")
+ILLUSTRATION_CACHE_MAX_BYTES = int(
+    os.getenv("ILLUSTRATION_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+)
+# Minimum narrative similarity, from 0 to 1, to reuse the image of a
+# near-identical scene; 1 only reuses images of identical narratives. Scenes
+# that differ in a single word, e.g. the creature, score high, so lower it
+# with care
+ILLUSTRATION_CACHE_SIMILARITY = float(os.getenv("ILLUSTRATION_CACHE_SIMILARITY", "1"))
+# Session state mapping cache keys to the artifacts already saved for them
+CACHED_ARTIFACTS_STATE_KEY = "illustration_artifacts"
+
+_client: genai.Client | None = None
+_cache: IllustrationCache | None = None
+_generation_slots: asyncio.Semaphore | None = None
+_generation_slots_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _get_client() -> genai.Client:
+    """Return the process-wide genai client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = genai.Client(http_options=HttpOptions(api_version="v1"))
+    return _client
+
+
+def _get_generation_slots() -> asyncio.Semaphore:
+    """Return the generation cap of the running event loop."""
+    global _generation_slots, _generation_slots_loop
+    loop = asyncio.get_running_loop()
+    # A semaphore belongs to the event loop it first waits on
+    if _generation_slots is None or _generation_slots_loop is not loop:
+        _generation_slots = asyncio.Semaphore(MAX_CONCURRENT_ILLUSTRATIONS)
+        _generation_slots_loop = loop
+    return _generation_slots
+
+
+def _get_cache() -> IllustrationCache | None:
+    """Return the process-wide illustration cache, or None if disabled."""
+    global _cache
+    if _cache is None and ILLUSTRATION_CACHE_MAX_BYTES > 0:
+        _cache = IllustrationCache(
+            ILLUSTRATION_CACHE_DIR,
+            max_bytes=ILLUSTRATION_CACHE_MAX_BYTES,
+            similarity_threshold=(
+                ILLUSTRATION_CACHE_SIMILARITY
+                if ILLUSTRATION_CACHE_SIMILARITY < 1
+                else None
+            ),
+        )
+    return _cache
+
+
+def _encode(image: "Image.Image", image_format: str) -> bytes:
+    """Encode an image in the given output format."""
+    if image_format == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    options = {} if image_format == "png" else {"quality": ILLUSTRATION_QUALITY}
+    buffer = BytesIO()
+    image.save(buffer, format=image_format.upper(), **options)
+    return buffer.getvalue()
+
+
+def _apply_output_profile(
+    data: bytes, mime_type: str | None
+) -> tuple[bytes, bytes | None]:
+    """Convert generated image data to the configured output format.
+
+    Args:
+        data: The image bytes returned by the model
+        mime_type: Their MIME type
+
+    Returns:
+        The illustration bytes, and the thumbnail bytes or None if disabled
+    """
+    passthrough = mime_type == _MIME_TYPES[ILLUSTRATION_FORMAT]
+    if passthrough and not ILLUSTRATION_THUMBNAIL_SIZE:
+        # Already in the output format: save the model's bytes untouched
+        return data, None
+
+    # Deferred until the first illustration to keep agent import fast
+    from PIL import Image
+
+    image = Image.open(BytesIO(data))
+    image_bytes = data if passthrough else _encode(image, ILLUSTRATION_FORMAT)
+    thumbnail = None
+    if ILLUSTRATION_THUMBNAIL_SIZE:
+        image.thumbnail((ILLUSTRATION_THUMBNAIL_SIZE, ILLUSTRATION_THUMBNAIL_SIZE))
+        thumbnail = _encode(image, ILLUSTRATION_FORMAT)
+    return image_bytes, thumbnail
+
+
+# Style modifiers for consistent D&D fantasy art
+STYLE_SUFFIX = (
+    " | Fantasy art style, Dungeons and Dragons, detailed illustration, "
+    "dramatic lighting, epic fantasy scene, high quality digital art, "
+    "painterly style, rich colors"
+)
+
+
 def _create_imagen_prompt(narrative: str) -> str:
     """Convert a D&D narrative into an optimized Imagen prompt.
 
@@ -34,14 +156,68 @@ def _create_imagen_prompt(narrative: str) -> str:
     Returns:
         An optimized prompt for fantasy illustration generation
     """
-    # Add style modifiers for consistent D&D fantasy art
-    style_suffix = (
-        " | Fantasy art style, Dungeons and Dragons, detailed illustration, "
-        "dramatic lighting, epic fantasy scene, high quality digital art, "
-        "painterly style, rich colors"
+    return narrative + STYLE_SUFFIX
+
+
+async def _save_illustration(
+    tool_context: ToolContext, image_bytes: bytes, thumbnail_bytes: bytes | None
+) -> tuple[str, dict[str, int]]:
+    """Save an illustration, and its thumbnail if any, as session artifacts.
+
+    Args:
+        tool_context: Context of the tool call
+        image_bytes: The illustration in the output format
+        thumbnail_bytes: The thumbnail in the output format, or None
+
+    Returns:
+        The filename of the illustration artifact, and the version of every
+        artifact saved by filename
+    """
+    # Create a unique filename for the illustration
+    name = f"illustration_{uuid.uuid4().hex[:8]}"
+    filename = f"{name}.{ILLUSTRATION_FORMAT}"
+    mime_type = _MIME_TYPES[ILLUSTRATION_FORMAT]
+
+    # Create a Part with Blob to save as artifact
+    part = genai_types.Part(
+        inline_data=genai_types.Blob(mime_type=mime_type, data=image_bytes)
+    )
+
+    # Save the image as an artifact using ADK's artifact service (async)
+    version = await tool_context.save_artifact(filename, part)
+
+    logging.info(
+        f"Saved illustration as artifact: {filename} "
+        f"({len(image_bytes)} bytes, version: {version})"
     )
 
-    return narrative + style_suffix
+    versions = {filename: version}
+    if thumbnail_bytes is not None:
+        thumbnail_filename = f"{name}_thumb.{ILLUSTRATION_FORMAT}"
+        versions[thumbnail_filename] = await tool_context.save_artifact(
+            thumbnail_filename,
+            genai_types.Part(
+                inline_data=genai_types.Blob(mime_type=mime_type, data=thumbnail_bytes)
+            ),
+        )
+        logging.info(
+            f"Saved thumbnail as artifact: {thumbnail_filename} "
+            f"({len(thumbnail_bytes)} bytes)"
+        )
+
+    return filename, versions
+
+
+def _remember_artifact(
+    tool_context: ToolContext, key: str, filename: str, versions: dict[str, int]
+) -> None:
+    """Record which artifacts of the session hold the image cached under key."""
+    artifacts = tool_context.state.get(CACHED_ARTIFACTS_STATE_KEY, {})
+    # Reassigned rather than mutated so the change is persisted
+    tool_context.state[CACHED_ARTIFACTS_STATE_KEY] = {
+        **artifacts,
+        key: {"filename": filename, "versions": versions},
+    }
 
 
 async def generate_illustration_tool(narrative: str, tool_context: ToolContext) -> str:
@@ -53,51 +229,82 @@ async def generate_illustration_tool(narrative: str, tool_context: ToolContext)
     Returns:
         The filename of the saved illustration artifact
     """
-    # Initialize genai client
-    client = genai.Client(http_options=HttpOptions(api_version="v1"))
-
     # Create an optimized prompt for D&D fantasy art
     prompt = _create_imagen_prompt(narrative)
 
+    cache = _get_cache()
+    # Cached images are only valid for the style and output settings they were
+    # made with. The narrative alone is matched: the shared style text would
+    # make different scenes look alike.
+    style = hashlib.sha256(STYLE_SUFFIX.encode()).hexdigest()[:12]
+    profile = (
+        f"{ILLUSTRATION_FORMAT}:{ILLUSTRATION_QUALITY}:"
+        f"{ILLUSTRATION_THUMBNAIL_SIZE}:{style}"
+    )
+    if cache is not None:
+        cached = await asyncio.to_thread(cache.lookup, narrative, profile)
+        if cached is not None:
+            logging.info(
+                f"Reusing cached illustration {cached.key[:12]} "
+                f"(similarity {cached.similarity:.2f})"
+            )
+            # Repeated scenes in one session reuse the artifact already saved
+            saved = tool_context.state.get(CACHED_ARTIFACTS_STATE_KEY, {}).get(
+                cached.key
+            )
+            if isinstance(saved, dict):
+                # Announced again, since the UI shows the images of this
+                # turn's artifact_delta
+                tool_context.actions.artifact_delta.update(saved["versions"])
+                return saved["filename"]
+            filename, versions = await _save_illustration(
+                tool_context, cached.data, cached.thumbnail
+            )
+            _remember_artifact(tool_context, cached.key, filename, versions)
+            return filename
+
     logging.info(f"Generating illustration with prompt: {prompt[:100]}...")
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash-image",
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            image_config=types.ImageConfig(
-                aspect_ratio='1:1',
+    # The async API keeps the event loop, and so other sessions' streams,
+    # responsive during the multi-second generation
+    async with _get_generation_slots():
+        response = await _get_client().aio.models.generate_content(
+            model="gemini-2.5-flash-image",
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                image_config=types.ImageConfig(
+                    aspect_ratio='1:1',
+                ),
+                response_modalities=['Image'],
             ),
-            response_modalities=['Image'],
-        ),
-    )
+        )
 
-    image_parts = [
-        part.inline_data.data
+    images = [
+        part.inline_data
         for part in response.candidates[0].content.parts
         if part.inline_data
     ]
 
-    if image_parts:
-        image = Image.open(BytesIO(image_parts[0]))
-        buffer = BytesIO()
-        image.save(buffer, format='PNG')
-        image_bytes = buffer.getvalue()
+    if images:
+        image_bytes, thumbnail_bytes = await asyncio.to_thread(
+            _apply_output_profile, images[0].data, images[0].mime_type
+        )
     else:
         raise ValueError("No images were generated")
 
-    # Create a unique filename for the illustration
-    filename = f"illustration_{uuid.uuid4().hex[:8]}.png"
-
-    # Create a Part with Blob to save as artifact
-    part = genai_types.Part(
-        inline_data=genai_types.Blob(mime_type="image/png", data=image_bytes)
+    filename, versions = await _save_illustration(
+        tool_context, image_bytes, thumbnail_bytes
     )
-
-    # Save the image as an artifact using ADK's artifact service (async)
-    version = await tool_context.save_artifact(filename, part)
-
-    logging.info(f"Saved illustration as artifact: {filename} (version: {version})")
+    if cache is not None:
+        key = await asyncio.to_thread(
+            cache.store,
+            narrative,
+            _MIME_TYPES[ILLUSTRATION_FORMAT],
+            image_bytes,
+            thumbnail_bytes,
+            profile,
+        )
+        _remember_artifact(tool_context, key, filename, versions)
 
     # Return just the filename - the artifact will display automatically
     return filename
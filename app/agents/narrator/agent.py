@@ -1,20 +1,112 @@
+import asyncio
+import os
+import re
 import uuid
+from typing import TYPE_CHECKING
 
 from google.adk.agents import Agent
 from google.adk.tools import ToolContext
-from google.cloud import texttospeech
 from google.genai import types as genai_types
 
+from app.utils.metrics import phase_span
 
-async def narrator(text: str, tool_context: ToolContext) -> dict:
-    """Converts text to speech and saves it to a file."""
-    client = texttospeech.TextToSpeechClient()
+if TYPE_CHECKING:
+    from google.cloud import texttospeech
 
-    synthesis_input = texttospeech.SynthesisInput(text=text)
+MODEL = "gemini-2.5-flash-tts"
+VOICE = "Algenib"
+LANGUAGE_CODE = "en-us"
+# Cap on speech syntheses running at once across all sessions
+MAX_CONCURRENT_NARRATIONS = int(os.getenv("MAX_CONCURRENT_NARRATIONS", "4"))
+
+# "single" synthesizes the narrative in one request; "chunked" splits it into
+# sentence chunks and synthesizes a few at a time, which shortens long
+# narratives while synthesis slots are free. Both save a single MP3 file.
+NARRATION_MODE = os.getenv("NARRATION_MODE", "single")
+# Target chunk length in chunked mode
+NARRATION_CHUNK_CHARS = int(os.getenv("NARRATION_CHUNK_CHARS", "300"))
+# Cap on chunks of one narration synthesizing at once, so a long narrative
+# cannot take every synthesis slot from other sessions
+NARRATION_CHUNK_CONCURRENCY = int(os.getenv("NARRATION_CHUNK_CONCURRENCY", "2"))
+
+# A sentence runs to terminal punctuation, plus closing quotes or brackets,
+# followed by whitespace, or to the end of the text
+_SENTENCE = re.compile(
+    r'\S.*?(?:[.!?\u2026]+["\u201d\u2019\')\]]*(?=\s|$)|$)', re.DOTALL
+)
+
+_client: "texttospeech.TextToSpeechAsyncClient | None" = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_synthesis_slots = asyncio.Semaphore(MAX_CONCURRENT_NARRATIONS)
+
+
+def _get_client() -> "texttospeech.TextToSpeechAsyncClient":
+    """Return the shared async client, reusing its channel across calls."""
+    global _client, _client_loop, _synthesis_slots
+    loop = asyncio.get_running_loop()
+    # gRPC async channels belong to the event loop they were created on, and
+    # so does a semaphore once it has been waited on
+    if _client is None or _client_loop is not loop:
+        # Deferred until the first narration to keep agent import fast
+        from google.cloud import texttospeech
+
+        with phase_span("tts.client"):
+            _client = texttospeech.TextToSpeechAsyncClient()
+        _synthesis_slots = asyncio.Semaphore(MAX_CONCURRENT_NARRATIONS)
+        _client_loop = loop
+    return _client
+
+
+def _strip_id3(audio: bytes) -> bytes:
+    """Remove a leading ID3v2 tag from MP3 audio, if there is one."""
+    if len(audio) < 10 or audio[:3] != b"ID3":
+        return audio
+    # The tag size is a 28-bit syncsafe integer and excludes the 10-byte
+    # header and the optional 10-byte footer
+    size = 0
+    for byte in audio[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if audio[5] & 0x10 else 0
+    return audio[10 + size + footer :]
+
+
+def split_sentences(text: str) -> list[str]:
+    """Split text into sentences, keeping their punctuation."""
+    return [match.group().strip() for match in _SENTENCE.finditer(text)]
+
+
+def chunk_narrative(text: str, max_chars: int | None = None) -> list[str]:
+    """Group the sentences of a narrative into chunks to synthesize separately.
+
+    Args:
+        text: The narrative
+        max_chars: Target chunk length, defaults to NARRATION_CHUNK_CHARS;
+            longer sentences become their own chunk
 
-    MODEL = "gemini-2.5-flash-tts"
-    VOICE = "Algenib"
-    LANGUAGE_CODE = "en-us"
+    Returns:
+        The chunks in reading order
+    """
+    max_chars = max_chars or NARRATION_CHUNK_CHARS
+    chunks = []
+    current = ""
+    for sentence in split_sentences(text):
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def _synthesize(text: str) -> bytes:
+    """Synthesize text as MP3, waiting for a free synthesis slot first."""
+    from google.cloud import texttospeech
+
+    client = _get_client()
+
+    synthesis_input = texttospeech.SynthesisInput(text=text)
 
     voice = texttospeech.VoiceSelectionParams(
         name=VOICE, language_code=LANGUAGE_CODE, model_name=MODEL
@@ -24,19 +116,51 @@ async def narrator(text: str, tool_context: ToolContext) -> dict:
         audio_encoding=texttospeech.AudioEncoding.MP3
     )
 
-    response = client.synthesize_speech(
-        input=synthesis_input, voice=voice, audio_config=audio_config
-    )
+    # Each phase is a span, so /metrics breaks the call's latency down
+    with phase_span("tts.queue"):
+        await _synthesis_slots.acquire()
+    try:
+        with phase_span("tts.synthesize") as span:
+            span.set_attribute("tts.characters", len(text))
+            response = await client.synthesize_speech(
+                input=synthesis_input, voice=voice, audio_config=audio_config
+            )
+    finally:
+        _synthesis_slots.release()
+    return response.audio_content
 
-    filename = f"speech_{uuid.uuid4().hex[:8]}.mp3"
 
+async def _save_audio(tool_context: ToolContext, filename: str, audio: bytes) -> int:
+    """Save MP3 audio as an artifact, returning its version."""
     part = genai_types.Part(
-        inline_data=genai_types.Blob(
-            mime_type="audio/mpeg", data=response.audio_content
-        )
+        inline_data=genai_types.Blob(mime_type="audio/mpeg", data=audio)
     )
 
-    version = await tool_context.save_artifact(filename, part)
+    with phase_span("tts.save_artifact"):
+        return await tool_context.save_artifact(filename, part)
+
+
+async def narrator(text: str, tool_context: ToolContext) -> dict:
+    """Converts text to speech and saves it to a file."""
+    chunks = chunk_narrative(text) if NARRATION_MODE == "chunked" else []
+    if len(chunks) > 1:
+        chunk_slots = asyncio.Semaphore(NARRATION_CHUNK_CONCURRENCY)
+
+        async def synthesize_chunk(chunk: str) -> bytes:
+            # Granted first come, first served, so chunks start in order
+            async with chunk_slots:
+                return await _synthesize(chunk)
+
+        first, *rest = await asyncio.gather(*map(synthesize_chunk, chunks))
+        # Each response is a complete MP3 file; only the first keeps its ID3
+        # tag, which players would otherwise find in the middle of the stream
+        audio = b"".join([first, *map(_strip_id3, rest)])
+    else:
+        audio = await _synthesize(text)
+
+    filename = f"speech_{uuid.uuid4().hex[:8]}.mp3"
+
+    version = await _save_audio(tool_context, filename, audio)
 
     return {"status": "success", "filename": filename, "version": version}
 
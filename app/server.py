@@ -12,69 +12,216 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import logging
 import os
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from typing import Any, TypeVar
 
-import google.auth
 from fastapi import FastAPI
-from google.adk.cli.fast_api import get_fast_api_app
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from google.adk.sessions import BaseSessionService
 from google.cloud import logging as google_cloud_logging
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider, export
-from vertexai import agent_engines
+from opentelemetry.sdk.trace.export import SpanExporter
 
+from app.utils.admission import AdmissionController, AdmissionMiddleware
+from app.utils.file_tracing import JsonLinesSpanExporter
 from app.utils.gcs import create_bucket_if_not_exists
+from app.utils.log_batching import BatchedLogWriter
+from app.utils.metrics import SpanMetricsProcessor
+from app.utils.opening import OpeningSceneSessionService
+from app.utils.sampling import TailSamplingSpanProcessor
+from app.utils.sessions import (
+    WriteBehindSessionService,
+    create_artifact_service,
+    create_session_service,
+    register_artifact_service,
+    register_session_service,
+)
+from app.utils.startup import (
+    StartupTimer,
+    resolve_agent_engine,
+    resolve_project_id,
+)
 from app.utils.tracing import CloudTraceLoggingSpanExporter
 from app.utils.typing import Feedback
 
-_, project_id = google.auth.default()
-logging_client = google_cloud_logging.Client()
-logger = logging_client.logger(__name__)
+T = TypeVar("T")
+
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_NAME = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
 allow_origins = (
     os.getenv("ALLOW_ORIGINS", "").split(",") if os.getenv("ALLOW_ORIGINS") else None
 )
-
-bucket_name = f"gs://{project_id}-test-logs"
-create_bucket_if_not_exists(
-    bucket_name=bucket_name, project=project_id, location="europe-west1"
-)
+# Agent Engine session configuration
+# Use environment variable for agent name, default to project name
+agent_name = os.environ.get("AGENT_ENGINE_SESSION_NAME", "test")
+# "cloud" exports to Cloud Trace and Logging, "file" writes local span files
+# for offline profiling (see app/utils/file_tracing.py), "none" only keeps metrics
+telemetry_exporter = os.getenv("TELEMETRY_EXPORTER", "cloud")
+# File telemetry is for local profiling runs, which use no Cloud resources
+offline = telemetry_exporter == "file"
+# "agentengine" reads and writes Agent Engine on every call, "writebehind"
+# serves sessions from SESSION_LOCAL_URI (in memory when unset) and syncs
+# their events to Agent Engine in the background
+session_backend = os.getenv("SESSION_BACKEND", "agentengine")
+# Start new sessions with a pre-generated opening scene (see app/utils/opening.py).
+# Meant for SESSION_BACKEND=writebehind: copying the opening appends one event
+# per opening event, each a remote round trip with the agentengine backend.
+# Off by default: without a persistent OPENING_SCENE_CACHE_FILE, every cold
+# start pays for a full multi-agent generation
+prewarm_opening = os.getenv("PREWARM_OPENING_SCENE", "false").lower() == "true"
 
 provider = TracerProvider()
-processor = export.BatchSpanProcessor(CloudTraceLoggingSpanExporter())
-provider.add_span_processor(processor)
+# Aggregates every span, sampled or not, for the /metrics endpoint
+span_metrics = SpanMetricsProcessor()
+provider.add_span_processor(span_metrics)
 trace.set_tracer_provider(provider)
 
-AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-# Agent Engine session configuration
-# Use environment variable for agent name, default to project name
-agent_name = os.environ.get("AGENT_ENGINE_SESSION_NAME", "test")
+startup = StartupTimer()
+# Bounds concurrent agent turns (see MAX_IN_FLIGHT_TURNS and MAX_QUEUED_TURNS)
+admission = AdmissionController.from_env()
+# Set during startup; every Google Cloud client is created there, not at import
+feedback_writer: BatchedLogWriter | None = None
+
+
+def _create_span_exporter() -> SpanExporter | None:
+    if telemetry_exporter == "file":
+        return JsonLinesSpanExporter(os.getenv("TELEMETRY_DIR", ".telemetry"))
+    if telemetry_exporter == "none":
+        return None
+    return CloudTraceLoggingSpanExporter()
 
-# Check if an agent with this name already exists
-existing_agents = list(agent_engines.list(filter=f"display_name={agent_name}"))
-
-if existing_agents:
-    # Use the existing agent
-    agent_engine = existing_agents[0]
-else:
-    # Create a new agent if none exists
-    agent_engine = agent_engines.create(display_name=agent_name)
-
-session_service_uri = f"agentengine://{agent_engine.resource_name}"
-
-app: FastAPI = get_fast_api_app(
-    agents_dir=AGENT_DIR,
-    web=True,
-    artifact_service_uri=bucket_name,
-    allow_origins=allow_origins,
-    session_service_uri=session_service_uri,
-    # initial_agent_action=True,
+
+async def _timed(name: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking startup step in a thread, recording how long it took."""
+    start = time.monotonic()
+    try:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    finally:
+        startup.record(name, time.monotonic() - start)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Resolve cloud resources concurrently, then serve the ADK app."""
+    global feedback_writer
+
+    project_id = await _timed("project", resolve_project_id)
+    if offline:
+        # Offline profiling: sessions and artifacts stay in memory and no
+        # Cloud resource is created or looked up
+        span_exporter = await _timed("span_exporter", _create_span_exporter)
+        session_service_uri = "memory://"
+        artifact_service_uri = "memory://"
+    else:
+        bucket_name = f"gs://{project_id}-test-logs"
+        # Independent network round trips, so they run side by side
+        resource_name, _, span_exporter, logging_client = await asyncio.gather(
+            _timed("agent_engine", resolve_agent_engine, agent_name, project_id),
+            _timed(
+                "bucket",
+                create_bucket_if_not_exists,
+                bucket_name=bucket_name,
+                project=project_id,
+                location="europe-west1",
+            ),
+            _timed("span_exporter", _create_span_exporter),
+            _timed("logging_client", google_cloud_logging.Client),
+        )
+        # Feedback arrives in bursts during playtests; write it in bulk off the
+        # request path, with bounded memory
+        feedback_writer = BatchedLogWriter(
+            logging_client.logger(__name__), max_batch_size=100, flush_interval=2.0
+        )
+        session_service_uri = f"agentengine://{resource_name}"
+        artifact_service_uri = bucket_name
+    if span_exporter is not None:
+        # Keep error and slow traces, sample the rest (see TRACE_* variables)
+        provider.add_span_processor(
+            TailSamplingSpanProcessor.from_env(export.BatchSpanProcessor(span_exporter))
+        )
+
+    with startup.phase("adk_import"):
+        # Imported here: the ADK web server stack is the bulk of import time
+        from google.adk.cli.fast_api import get_fast_api_app
+    with startup.phase("adk_app"):
+        write_behind: WriteBehindSessionService | None = None
+        session_service: BaseSessionService | None = None
+        if session_backend == "writebehind" and not offline:
+            session_service = write_behind = WriteBehindSessionService.from_uris(
+                session_service_uri,
+                os.getenv("SESSION_LOCAL_URI"),
+                agents_dir=AGENT_DIR,
+            )
+        if prewarm_opening:
+            from app.agent import root_agent
+
+            # Shared with the ADK app, so the opening's image and audio can be
+            # copied into each new session
+            artifact_service = create_artifact_service(
+                artifact_service_uri, agents_dir=AGENT_DIR
+            )
+            artifact_service_uri = register_artifact_service(artifact_service)
+            opening = OpeningSceneSessionService(
+                session_service
+                or create_session_service(session_service_uri, agents_dir=AGENT_DIR),
+                root_agent,
+                APP_NAME,
+                artifact_service=artifact_service,
+            )
+            # Generated in the background; sessions created before it is
+            # ready start with the regular flow
+            opening.warm()
+            session_service = opening
+        if session_service is not None:
+            session_service_uri = register_session_service(session_service)
+
+        adk_app = get_fast_api_app(
+            agents_dir=AGENT_DIR,
+            web=True,
+            artifact_service_uri=artifact_service_uri,
+            session_service_uri=session_service_uri,
+            # initial_agent_action=True,
+        )
+    # Mounted last, so the routes defined below take precedence
+    app.mount("/", adk_app)
+    async with adk_app.router.lifespan_context(adk_app):
+        startup.finish()
+        yield
+    if write_behind is not None:
+        await write_behind.close()
+    if feedback_writer is not None:
+        # Blocks until the queued feedback is written
+        await asyncio.to_thread(feedback_writer.shutdown)
+    provider.shutdown()
+
+
+app = FastAPI(
+    title="test",
+    description="API for interacting with the Agent test",
+    lifespan=lifespan,
 )
-app.title = "test"
-app.description = "API for interacting with the Agent test"
+# Rejects turns over budget with 429 before the agent spends any tokens
+app.add_middleware(AdmissionMiddleware, controller=admission)
+if allow_origins:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=allow_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
 
 @app.post("/feedback")
-def collect_feedback(feedback: Feedback) -> dict[str, str]:
-    """Collect and log feedback.
+async def collect_feedback(feedback: Feedback) -> dict[str, str]:
+    """Collect feedback and queue it to be logged in the next batch.
 
     Args:
         feedback: The feedback data to log
@@ -82,10 +229,32 @@ def collect_feedback(feedback: Feedback) -> dict[str, str]:
     Returns:
         Success message
     """
-    logger.log_struct(feedback.model_dump(), severity="INFO")
+    if offline:
+        # No Cloud Logging when profiling offline; keep it in the local log
+        logging.info("Feedback: %s", feedback.model_dump_json())
+        return {"status": "success"}
+    if feedback_writer is None:
+        logging.warning("Feedback received before startup finished")
+        return {"status": "unavailable"}
+    if not feedback_writer.log_struct(feedback.model_dump(), severity="INFO"):
+        logging.warning("Feedback received after shutdown started")
+        return {"status": "unavailable"}
     return {"status": "success"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Serve agent latency histograms, token counts, startup timings and turn admission.
+
+    Returns:
+        Metrics in the Prometheus text exposition format
+    """
+    return PlainTextResponse(
+        span_metrics.render() + startup.render() + admission.render(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 # Main execution
 if __name__ == "__main__":
     import uvicorn
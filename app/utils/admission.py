@@ -0,0 +1,252 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# ADK endpoints that run an agent turn
+TURN_PATHS = ("/run", "/run_sse")
+# Bounds for the Retry-After hint, in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60
+
+
+class TurnRejected(Exception):
+    """Raised when a turn is not admitted."""
+
+    def __init__(self, reason: str, detail: str, retry_after: int) -> None:
+        super().__init__(detail)
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limits how many agent turns run at once.
+
+    At most ``max_in_flight`` turns run concurrently and each session has at
+    most one turn running or waiting. Turns over the budget wait in a FIFO
+    queue of at most ``max_queued`` entries for up to ``queue_timeout``
+    seconds. Turns that cannot be queued, or wait too long, are rejected with
+    a Retry-After hint derived from recent turn durations.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 16,
+        max_queued: int = 32,
+        queue_timeout: float = 30.0,
+    ) -> None:
+        """
+        Initialize the controller.
+
+        :param max_in_flight: Maximum number of turns running at once
+        :param max_queued: Maximum number of turns waiting for a slot
+        :param queue_timeout: Maximum seconds a turn waits for a slot
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted_turns = 0
+        self.rejected_turns: dict[str, int] = {}
+        # Exponentially weighted moving average of turn durations, in seconds
+        self.average_turn_seconds = 10.0
+        self._sessions: set[Any] = set()
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """
+        Create a controller configured from environment variables.
+
+        MAX_IN_FLIGHT_TURNS, MAX_QUEUED_TURNS and TURN_QUEUE_TIMEOUT override
+        the constructor defaults.
+
+        :return: The configured controller
+        """
+        return cls(
+            max_in_flight=int(os.getenv("MAX_IN_FLIGHT_TURNS", "16")),
+            max_queued=int(os.getenv("MAX_QUEUED_TURNS", "32")),
+            queue_timeout=float(os.getenv("TURN_QUEUE_TIMEOUT", "30")),
+        )
+
+    def retry_after(self) -> int:
+        """Estimate the seconds until a new turn would get a slot."""
+        turns_ahead = self.queued + 1
+        seconds = self.average_turn_seconds * turns_ahead / self.max_in_flight
+        return min(MAX_RETRY_AFTER, max(MIN_RETRY_AFTER, math.ceil(seconds)))
+
+    @asynccontextmanager
+    async def turn(self, session_key: Any = None) -> AsyncIterator[None]:
+        """
+        Hold a turn slot for the enclosed block.
+
+        :param session_key: Identifies the session, or None if unknown
+        :raises TurnRejected: If the session already has a turn, the queue is
+            full, or no slot freed up within ``queue_timeout``
+        """
+        if session_key is not None and session_key in self._sessions:
+            self._reject("session_busy", "A turn is already running for this session")
+        if self.in_flight >= self.max_in_flight and self.queued >= self.max_queued:
+            self._reject("queue_full", "Too many turns in progress")
+
+        if session_key is not None:
+            self._sessions.add(session_key)
+        try:
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("queue_timeout", "Timed out waiting for a free slot")
+            finally:
+                self.queued -= 1
+
+            self.in_flight += 1
+            self.admitted_turns += 1
+            start = time.monotonic()
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+                self._semaphore.release()
+                self.average_turn_seconds += 0.1 * (
+                    time.monotonic() - start - self.average_turn_seconds
+                )
+        finally:
+            self._sessions.discard(session_key)
+
+    def render(self) -> str:
+        """Return the admission metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP agent_turns_in_flight Agent turns currently running.",
+            "# TYPE agent_turns_in_flight gauge",
+            f"agent_turns_in_flight {self.in_flight}",
+            "# HELP agent_turns_queued Agent turns waiting for a free slot.",
+            "# TYPE agent_turns_queued gauge",
+            f"agent_turns_queued {self.queued}",
+            "# HELP agent_turns_admitted_total Agent turns admitted.",
+            "# TYPE agent_turns_admitted_total counter",
+            f"agent_turns_admitted_total {self.admitted_turns}",
+            "# HELP agent_turns_rejected_total Agent turns rejected, by reason.",
+            "# TYPE agent_turns_rejected_total counter",
+        ]
+        lines.extend(
+            f'agent_turns_rejected_total{{reason="{reason}"}} {count}'
+            for reason, count in sorted(self.rejected_turns.items())
+        )
+        return "\n".join(lines) + "\n"
+
+    def _reject(self, reason: str, detail: str) -> None:
+        self.rejected_turns[reason] = self.rejected_turns.get(reason, 0) + 1
+        raise TurnRejected(reason, detail, self.retry_after())
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController to ADK run requests.
+
+    The request body is read up front to find the session, then replayed to
+    the app. Rejected turns get a 429 response with a Retry-After header
+    before the agent runs, so no model tokens are spent on them. A slot is
+    held until the response, including a streamed one, has been sent.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController,
+        paths: tuple[str, ...] = TURN_PATHS,
+    ) -> None:
+        """
+        Initialize the middleware.
+
+        :param app: The wrapped ASGI app
+        :param controller: Controller deciding which turns run
+        :param paths: Request paths that run an agent turn
+        """
+        self.app = app
+        self.controller = controller
+        self.paths = paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                # The client left before sending the whole request
+                return
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        replayed = False
+
+        async def replay() -> Message:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        try:
+            async with self.controller.turn(_session_key(body)):
+                await self.app(scope, replay, send)
+        except TurnRejected as e:
+            response = JSONResponse(
+                {"detail": e.detail, "reason": e.reason},
+                status_code=429,
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, replay, send)
+
+
+def _session_key(body: bytes) -> tuple[str, str, str] | None:
+    """Return the (app, user, session) a run request targets, if it names one."""
+    try:
+        request = json.loads(body)
+        # ADK accepts both snake_case and camelCase field names
+        key = tuple(
+            request[name] if name in request else request[camel]
+            for name, camel in (
+                ("app_name", "appName"),
+                ("user_id", "userId"),
+                ("session_id", "sessionId"),
+            )
+        )
+    except (ValueError, TypeError, KeyError):
+        return None
+    # Anything else, e.g. an object, is unhashable; ADK rejects the request
+    if not all(isinstance(part, str) for part in key):
+        return None
+    return key  # type: ignore[return-value]
@@ -0,0 +1,365 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+from pydantic import BaseModel, Field
+
+from app.utils.dice import RollPlan, compile_dice_expression, roll_dice_array
+
+# Bounds on a single simulate_combat request
+DEFAULT_SIMULATIONS = 2000
+MAX_SIMULATIONS = 20_000
+MAX_ROUNDS = 50
+# Every turn visits every combatant, so the cost grows with their square
+MAX_GROUP_SIZE = 12
+MAX_COMBATANTS = 24
+MAX_ATTACKS_PER_TURN = 10
+MAX_DAMAGE_DICE = 100
+# Bound on combatants x (combatants + dice rolled per round) x simulations,
+# roughly a second of numpy work; bigger fights get fewer simulations
+MAX_SIMULATION_WORK = 5_000_000
+# Percentiles reported for rounds and remaining party HP
+COMBAT_PERCENTILES = (10, 50, 90)
+
+
+class Attack(BaseModel):
+    """Represents one attack a combatant makes on its turn."""
+
+    name: str = Field(default="attack", description="Name of the attack")
+    attack_bonus: int = Field(..., description="Bonus added to the d20 attack roll")
+    damage: str = Field(..., description="Damage dice expression (e.g., '1d6+2')")
+    count: int = Field(
+        default=1,
+        ge=1,
+        le=MAX_ATTACKS_PER_TURN,
+        description="Number of times it is made per turn",
+    )
+
+
+class Combatant(BaseModel):
+    """Represents a creature, or a group of identical creatures, in a combat."""
+
+    name: str = Field(..., description="Name of the creature")
+    armor_class: int = Field(..., description="Armor class")
+    hit_points: int = Field(..., ge=1, description="Hit points at the start of combat")
+    attacks: list[Attack] = Field(..., description="Attacks made each turn")
+    initiative_bonus: int = Field(default=0, description="Bonus added to initiative")
+    count: int = Field(
+        default=1,
+        ge=1,
+        le=MAX_GROUP_SIZE,
+        description="Number of identical creatures",
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class _CompiledAttack:
+    attack_bonus: int
+    damage: RollPlan
+    # The same dice without the modifier, rolled again on a critical hit
+    critical_dice: RollPlan
+
+
+@dataclass(slots=True)
+class CombatSimulation:
+    """Outcome of a batch of simulated combats, one entry per simulation."""
+
+    names: list[str]
+    is_party: npt.NDArray[np.bool_]
+    max_hit_points: npt.NDArray[np.int64]
+    # Remaining hit points, shape (simulations, combatants), never below zero
+    hit_points: npt.NDArray[np.int64]
+    rounds: npt.NDArray[np.int64]
+    party_won: npt.NDArray[np.bool_]
+    monsters_won: npt.NDArray[np.bool_]
+
+    def summary(self) -> dict[str, Any]:
+        """Summarize the simulations for the simulate_combat tool."""
+        simulations = len(self.rounds)
+        party_hp = self.hit_points[:, self.is_party].sum(axis=1)
+        combatants = {
+            name: {
+                "max_hp": int(max_hp),
+                "mean_remaining_hp": round(float(hp.mean()), 2),
+                "down_probability": round(float((hp == 0).mean()), 4),
+            }
+            for name, max_hp, hp in zip(
+                self.names, self.max_hit_points, self.hit_points.T, strict=True
+            )
+        }
+        return {
+            "simulations": simulations,
+            "party_win_probability": round(float(self.party_won.mean()), 4),
+            "monster_win_probability": round(float(self.monsters_won.mean()), 4),
+            "unresolved_probability": round(
+                float(1 - self.party_won.mean() - self.monsters_won.mean()), 4
+            ),
+            "expected_rounds": round(float(self.rounds.mean()), 2),
+            "rounds_percentiles": {
+                f"p{percent}": int(np.percentile(self.rounds, percent))
+                for percent in COMBAT_PERCENTILES
+            },
+            "party_hp_remaining_percentiles": {
+                f"p{percent}": int(np.percentile(party_hp, percent))
+                for percent in COMBAT_PERCENTILES
+            },
+            "combatants": combatants,
+        }
+
+
+def _expand(
+    combatants: list[Combatant],
+) -> list[tuple[str, Combatant]]:
+    """Split groups of identical creatures into individually tracked entries."""
+    expanded: list[tuple[str, Combatant]] = []
+    for combatant in combatants:
+        for number in range(combatant.count):
+            name = combatant.name
+            if combatant.count > 1:
+                name = f"{combatant.name} {number + 1}"
+            expanded.append((name, combatant))
+    return expanded
+
+
+def _damage_plan(attack: Attack) -> RollPlan:
+    damage = compile_dice_expression(attack.damage)
+    if sum(term.count for term in damage.terms) > MAX_DAMAGE_DICE:
+        raise ValueError(f"Damage can roll at most {MAX_DAMAGE_DICE} dice per attack")
+    return damage
+
+
+def max_simulations(party: list[Combatant], monsters: list[Combatant]) -> int:
+    """
+    Return how many simulations of a fight fit in the work budget.
+
+    Args:
+        party: The player characters and their allies
+        monsters: The opposing creatures
+
+    Returns:
+        The largest simulation count allowed, between 1 and MAX_SIMULATIONS
+
+    Raises:
+        ValueError: If a damage expression is invalid or rolls too many dice
+    """
+    combatants = sum(combatant.count for combatant in party + monsters)
+    # An attack roll, plus the damage dice again on a critical hit
+    dice_per_round = sum(
+        combatant.count
+        * sum(
+            attack.count
+            * (1 + 2 * sum(term.count for term in _damage_plan(attack).terms))
+            for attack in combatant.attacks
+        )
+        for combatant in party + monsters
+    )
+    work = combatants * (combatants + dice_per_round)
+    return max(1, min(MAX_SIMULATIONS, MAX_SIMULATION_WORK // work))
+
+
+def _compile_attacks(combatant: Combatant) -> list[_CompiledAttack]:
+    attacks: list[_CompiledAttack] = []
+    for attack in combatant.attacks:
+        damage = _damage_plan(attack)
+        critical_dice = RollPlan(
+            terms=damage.terms,
+            advantage=damage.advantage,
+            disadvantage=damage.disadvantage,
+        )
+        attacks.extend(
+            _CompiledAttack(attack.attack_bonus, damage, critical_dice)
+            for _ in range(attack.count)
+        )
+    return attacks
+
+
+def run_combat_simulation(
+    party: list[Combatant],
+    monsters: list[Combatant],
+    simulations: int = DEFAULT_SIMULATIONS,
+    max_rounds: int = MAX_ROUNDS,
+    rng: np.random.Generator | None = None,
+) -> CombatSimulation:
+    """
+    Simulate many combats between a party and a group of monsters at once.
+
+    Every simulation runs in lockstep: each array holds one row per simulation,
+    so a turn is a handful of numpy operations regardless of how many combats
+    are being simulated. Initiative is rolled once per simulation, every
+    creature attacks a random conscious enemy, natural 20s double the damage
+    dice and natural 1s miss. Creatures at 0 hit points are out of the fight.
+
+    Args:
+        party: The player characters and their allies
+        monsters: The opposing creatures
+        simulations: Number of combats to simulate
+        max_rounds: Rounds after which an unfinished combat is abandoned
+        rng: Optional numpy generator to draw from
+
+    Returns:
+        CombatSimulation with the final state of every simulated combat
+
+    Raises:
+        ValueError: If a side is empty, a damage expression is invalid, or the
+            simulation or combatant count is out of range, including more
+            simulations than max_simulations allows
+    """
+    if not party or not monsters:
+        raise ValueError("Both the party and the monsters need at least one combatant")
+    if sum(combatant.count for combatant in party + monsters) > MAX_COMBATANTS:
+        raise ValueError(f"A combat can have at most {MAX_COMBATANTS} combatants")
+    if not 1 <= simulations <= MAX_SIMULATIONS:
+        raise ValueError(f"Simulations must be between 1 and {MAX_SIMULATIONS}")
+    limit = max_simulations(party, monsters)
+    if simulations > limit:
+        raise ValueError(f"This fight can be simulated at most {limit} times")
+    generator = rng if rng is not None else np.random.default_rng()
+
+    entries = [(name, member, True) for name, member in _expand(party)] + [
+        (name, monster, False) for name, monster in _expand(monsters)
+    ]
+    compiled = {
+        id(combatant): _compile_attacks(combatant) for _, combatant, _ in entries
+    }
+    attacks = [compiled[id(combatant)] for _, combatant, _ in entries]
+    is_party = np.array([side for _, _, side in entries])
+    armor_class = np.array([combatant.armor_class for _, combatant, _ in entries])
+    max_hit_points = np.array(
+        [combatant.hit_points for _, combatant, _ in entries], dtype=np.int64
+    )
+    initiative_bonus = np.array(
+        [combatant.initiative_bonus for _, combatant, _ in entries]
+    )
+
+    count = len(entries)
+    hit_points = np.tile(max_hit_points, (simulations, 1))
+    # Initiative order per simulation, highest first; ties broken by bonus
+    initiative = (
+        roll_dice_array(count, 20, simulations, rng=generator) + initiative_bonus
+    )
+    order = np.argsort(-(initiative * 100 + initiative_bonus), axis=1, kind="stable")
+    rounds = np.zeros(simulations, dtype=np.int64)
+    active = np.ones(simulations, dtype=np.bool_)
+    rows = np.arange(simulations)
+
+    for round_number in range(1, max_rounds + 1):
+        rounds[active] = round_number
+        for turn in range(count):
+            actors = order[:, turn]
+            for actor in range(count):
+                acting = active & (actors == actor) & (hit_points[:, actor] > 0)
+                if not acting.any():
+                    continue
+                sims = rows[acting]
+                enemies = is_party != is_party[actor]
+                for attack in attacks[actor]:
+                    standing = (hit_points[sims][:, enemies] > 0).astype(np.float64)
+                    has_target = standing.any(axis=1)
+                    if not has_target.any():
+                        break
+                    sims = sims[has_target]
+                    # A random conscious enemy in each simulation
+                    weights = standing[has_target] * generator.random(
+                        (len(sims), int(enemies.sum()))
+                    )
+                    targets = np.flatnonzero(enemies)[weights.argmax(axis=1)]
+
+                    natural = generator.integers(1, 21, size=len(sims))
+                    hits = (natural == 20) | (
+                        (natural != 1)
+                        & (natural + attack.attack_bonus >= armor_class[targets])
+                    )
+                    damage = attack.damage.roll_totals(len(sims), generator)
+                    damage += np.where(
+                        natural == 20,
+                        attack.critical_dice.roll_totals(len(sims), generator),
+                        0,
+                    )
+                    damage = np.where(hits, np.maximum(damage, 0), 0)
+                    hit_points[sims, targets] = np.maximum(
+                        hit_points[sims, targets] - damage, 0
+                    )
+
+        party_standing = (hit_points[:, is_party] > 0).any(axis=1)
+        monsters_standing = (hit_points[:, ~is_party] > 0).any(axis=1)
+        active &= party_standing & monsters_standing
+        if not active.any():
+            break
+
+    party_standing = (hit_points[:, is_party] > 0).any(axis=1)
+    monsters_standing = (hit_points[:, ~is_party] > 0).any(axis=1)
+    return CombatSimulation(
+        names=[name for name, _, _ in entries],
+        is_party=is_party,
+        max_hit_points=max_hit_points,
+        hit_points=hit_points,
+        rounds=rounds,
+        party_won=party_standing & ~monsters_standing,
+        monsters_won=monsters_standing & ~party_standing,
+    )
+
+
+async def simulate_combat(
+    party: list[Combatant],
+    monsters: list[Combatant],
+    simulations: int = DEFAULT_SIMULATIONS,
+) -> dict[str, Any]:
+    """
+    Simulate a fight thousands of times to judge how dangerous an encounter is.
+    Use this to balance arena bouts and other encounters instead of guessing.
+
+    Args:
+        party: The player character and allies. Each entry has name, armor_class,
+            hit_points, initiative_bonus, optional count of identical creatures,
+            and attacks made each turn, each with name, attack_bonus, damage
+            expression and optional count. Example:
+            [{"name": "Fighter", "armor_class": 18, "hit_points": 44,
+              "initiative_bonus": 1,
+              "attacks": [{"name": "longsword", "attack_bonus": 7,
+                           "damage": "1d8+4", "count": 2}]}]
+        monsters: The opposing creatures, in the same format; at most 24
+            creatures in total across both sides. Example:
+            [{"name": "Goblin", "armor_class": 15, "hit_points": 7, "count": 4,
+              "initiative_bonus": 2,
+              "attacks": [{"name": "scimitar", "attack_bonus": 4,
+                           "damage": "1d6+2"}]}]
+        simulations: Number of fights to simulate (default 2000); large
+            encounters are simulated fewer times, as reported in the result
+
+    Returns:
+        Dictionary containing:
+            - simulations: Number of fights actually simulated
+            - party_win_probability, monster_win_probability: Chance each side wins
+            - unresolved_probability: Chance the fight lasts beyond 50 rounds
+            - expected_rounds and rounds_percentiles: How long the fight lasts
+            - party_hp_remaining_percentiles: Total party HP left at the end
+            - combatants: Mean remaining HP and chance of going down, per creature
+    """
+    try:
+        party_members = [Combatant.model_validate(member) for member in party]
+        opponents = [Combatant.model_validate(monster) for monster in monsters]
+        if simulations > 0:
+            simulations = min(simulations, max_simulations(party_members, opponents))
+        # A large encounter takes a while; keep the event loop serving other turns
+        result = await asyncio.to_thread(
+            run_combat_simulation, party_members, opponents, simulations=simulations
+        )
+        return result.summary()
+    except Exception as e:
+        return {"error": str(e)}
@@ -12,25 +12,50 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import random
+import asyncio
+import functools
+import math
+import re
+import secrets
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
 from typing import Any
 
+import numpy as np
+import numpy.typing as npt
 from google.adk.tools import ToolContext
 from pydantic import BaseModel, Field
 
 # Standard D&D dice faces
 VALID_DICE = [4, 6, 8, 10, 12, 20, 100]
 
+# Shared generator for the bulk engine; numpy draws whole arrays per call
+_rng = np.random.default_rng()
+
 
 class DiceRoll(BaseModel):
     """Represents a dice roll result."""
 
-    dice_type: int = Field(..., description="Number of faces on the die (e.g., 4, 6, 8, 10, 12, 20, 100)")
+    dice_type: int = Field(
+        ..., description="Number of faces on the die (e.g., 4, 6, 8, 10, 12, 20, 100)"
+    )
     result: int = Field(..., description="The rolled value")
     modifier: int = Field(default=0, description="Modifier added to the roll")
     total: int = Field(..., description="Total result including modifier")
 
 
+class LabelledRoll(BaseModel):
+    """Represents one labelled roll in a batch request."""
+
+    label: str = Field(
+        ..., description="What the roll is for (e.g., 'goblin 1 attack')"
+    )
+    expression: str = Field(..., description="Dice expression in D&D notation")
+
+
 class RollResult(BaseModel):
     """Represents the result of a complete roll request."""
 
@@ -39,6 +64,143 @@ class RollResult(BaseModel):
     expression: str = Field(..., description="Readable expression of what was rolled")
 
 
+@dataclass(slots=True)
+class RollOutcome:
+    """
+    Lightweight result of a roll used on the hot path.
+
+    Kept dice are stored as one plain list per dice group, so rolling never
+    validates or allocates per-die objects. The pydantic models describe the
+    API schema and are only built on request through ``to_model``.
+    """
+
+    expression: str
+    total: int
+    # (dice_type, sign, kept results) for each dice group
+    groups: list[tuple[int, int, list[int]]]
+
+    @property
+    def results(self) -> list[int]:
+        """Kept die values across all groups, in roll order."""
+        if len(self.groups) == 1:
+            return self.groups[0][2]
+        return [value for _, _, values in self.groups for value in values]
+
+    def to_model(self) -> RollResult:
+        """Build the equivalent RollResult in a single validation pass."""
+        rolls = [
+            {
+                "dice_type": dice_type,
+                "result": value,
+                "modifier": 0,
+                "total": sign * value,
+            }
+            for dice_type, sign, values in self.groups
+            for value in values
+        ]
+        return RollResult.model_validate(
+            {"rolls": rolls, "total": self.total, "expression": self.expression}
+        )
+
+    def to_response(self) -> dict[str, Any]:
+        """Build the roll_dice tool response directly from the kept dice."""
+        return {
+            "total": self.total,
+            "expression": self.expression,
+            "rolls": self.results,
+            "details": [
+                {"dice_type": dice_type, "result": value, "modifier": 0}
+                for dice_type, _, values in self.groups
+                for value in values
+            ],
+        }
+
+
+def _validate_dice_type(dice_type: int) -> None:
+    if dice_type not in VALID_DICE:
+        raise ValueError(
+            f"Invalid dice type: {dice_type}. Valid types are: {', '.join(map(str, VALID_DICE))}"
+        )
+
+
+def roll_dice_array(
+    num_dice: int,
+    dice_type: int,
+    repetitions: int = 1,
+    advantage: bool = False,
+    disadvantage: bool = False,
+    rng: np.random.Generator | None = None,
+) -> npt.NDArray[np.int16]:
+    """
+    Roll ``num_dice`` dice ``repetitions`` times in a single vectorized draw.
+
+    This is the bulk engine behind every roll in this module. It never builds
+    per-die objects; callers that need a ``RollResult`` convert at the boundary.
+
+    Args:
+        num_dice: Number of dice in each repetition
+        dice_type: Number of faces on each die
+        repetitions: Number of independent repetitions of the roll
+        advantage: If True, roll each die twice and keep the higher result
+        disadvantage: If True, roll each die twice and keep the lower result
+        rng: Optional numpy generator to draw from instead of the module default
+
+    Returns:
+        Array of shape (repetitions, num_dice) with the kept value of each die
+
+    Raises:
+        ValueError: If dice_type is not valid, num_dice or repetitions < 1, or
+            both advantage and disadvantage are True
+    """
+    _validate_dice_type(dice_type)
+    if num_dice < 1:
+        raise ValueError("Number of dice must be at least 1")
+    if repetitions < 1:
+        raise ValueError("Number of repetitions must be at least 1")
+    if advantage and disadvantage:
+        raise ValueError("Cannot have both advantage and disadvantage")
+
+    generator = rng if rng is not None else _rng
+    if advantage or disadvantage:
+        pairs = generator.integers(
+            1, dice_type + 1, size=(2, repetitions, num_dice), dtype=np.int16
+        )
+        return pairs.max(axis=0) if advantage else pairs.min(axis=0)
+    return generator.integers(
+        1, dice_type + 1, size=(repetitions, num_dice), dtype=np.int16
+    )
+
+
+def roll_dice_totals(
+    num_dice: int,
+    dice_type: int,
+    repetitions: int = 1,
+    modifier: int = 0,
+    advantage: bool = False,
+    disadvantage: bool = False,
+    rng: np.random.Generator | None = None,
+) -> npt.NDArray[np.int64]:
+    """
+    Roll ``num_dice``d``dice_type`` + ``modifier`` ``repetitions`` times.
+
+    Args:
+        num_dice: Number of dice in each repetition
+        dice_type: Number of faces on each die
+        repetitions: Number of independent repetitions of the roll
+        modifier: Modifier added to every total
+        advantage: If True, roll each die twice and keep the higher result
+        disadvantage: If True, roll each die twice and keep the lower result
+        rng: Optional numpy generator to draw from instead of the module default
+
+    Returns:
+        Array of shape (repetitions,) with the total of each repetition
+    """
+    rolls = roll_dice_array(
+        num_dice, dice_type, repetitions, advantage, disadvantage, rng
+    )
+    return rolls.sum(axis=1, dtype=np.int64) + modifier
+
+
 def roll_single_die(dice_type: int, modifier: int = 0) -> DiceRoll:
     """
     Roll a single die of the specified type with an optional modifier.
@@ -53,12 +215,9 @@ def roll_single_die(dice_type: int, modifier: int = 0) -> DiceRoll:
     Raises:
         ValueError: If dice_type is not a valid D&D die
     """
-    if dice_type not in VALID_DICE:
-        raise ValueError(
-            f"Invalid dice type: {dice_type}. Valid types are: {', '.join(map(str, VALID_DICE))}"
-        )
+    _validate_dice_type(dice_type)
 
-    result = random.randint(1, dice_type)
+    result = int(_rng.integers(1, dice_type + 1))
     total = result + modifier
 
     return DiceRoll(
@@ -92,52 +251,343 @@ def roll_multiple_dice(
     Raises:
         ValueError: If dice_type is not valid, num_dice < 1, or both advantage and disadvantage are True
     """
-    if dice_type not in VALID_DICE:
-        raise ValueError(
-            f"Invalid dice type: {dice_type}. Valid types are: {', '.join(map(str, VALID_DICE))}"
+    values = roll_dice_array(num_dice, dice_type, 1, advantage, disadvantage)[0]
+    final_total = int(values.sum()) + modifier
+
+    # Build expression string
+    advantage_str = " (advantage)" if advantage else ""
+    disadvantage_str = " (disadvantage)" if disadvantage else ""
+    modifier_str = f" + {modifier}" if modifier else ""
+    expression = (
+        f"{num_dice}d{dice_type}{advantage_str}{disadvantage_str}{modifier_str}"
+    )
+
+    return RollOutcome(
+        expression=expression,
+        total=final_total,
+        groups=[(dice_type, 1, values.tolist())],
+    ).to_model()
+
+
+# Upper bound on dice in one term so a malformed expression cannot exhaust memory
+MAX_DICE_PER_TERM = 10_000
+
+_TOKEN_PATTERN = re.compile(
+    r"\s*(?:(?P<number>\d+)|(?P<word>[a-z]+)|(?P<symbol>[+\-<]))"
+)
+_KEEP_SUFFIXES = {"k": True, "kh": True, "kl": False}
+_DROP_SUFFIXES = {"dl": True, "dh": False}
+_REROLL_SUFFIXES = {"r", "ro"}
+_MODE_WORDS = {
+    "adv": "advantage",
+    "advantage": "advantage",
+    "dis": "disadvantage",
+    "disadvantage": "disadvantage",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class DiceTerm:
+    """A single ``NdS`` group of a compiled dice expression."""
+
+    count: int
+    dice_type: int
+    sign: int = 1
+    keep: int | None = None
+    keep_highest: bool = True
+    reroll_at_most: int = 0
+
+    def describe(self) -> str:
+        """Return the term in dice notation, without its sign."""
+        text = f"{self.count}d{self.dice_type}"
+        if self.keep is not None:
+            text += f"{'kh' if self.keep_highest else 'kl'}{self.keep}"
+        if self.reroll_at_most:
+            text += f"r{self.reroll_at_most}"
+        return text
+
+    def roll(
+        self,
+        repetitions: int,
+        advantage: bool,
+        disadvantage: bool,
+        rng: np.random.Generator | None,
+    ) -> tuple[npt.NDArray[np.int16], npt.NDArray[np.bool_] | None]:
+        """
+        Roll this term ``repetitions`` times.
+
+        Returns:
+            The die values, shape (repetitions, count), and a mask of the kept
+            dice (``None`` when every die is kept)
+        """
+        values = roll_dice_array(
+            self.count, self.dice_type, repetitions, advantage, disadvantage, rng
         )
-    if num_dice < 1:
-        raise ValueError("Number of dice must be at least 1")
-    if advantage and disadvantage:
-        raise ValueError("Cannot have both advantage and disadvantage")
+        if self.reroll_at_most:
+            # Reroll once and keep the new result, as with Great Weapon Fighting
+            low = values <= self.reroll_at_most
+            if low.any():
+                rerolls = roll_dice_array(
+                    self.count,
+                    self.dice_type,
+                    repetitions,
+                    advantage,
+                    disadvantage,
+                    rng,
+                )
+                values = np.where(low, rerolls, values)
+        if self.keep is None or self.keep == self.count:
+            return values, None
 
-    rolls: list[DiceRoll] = []
+        order = np.argsort(values, axis=1, kind="stable")
+        selected = (
+            order[:, -self.keep :] if self.keep_highest else order[:, : self.keep]
+        )
+        kept = np.zeros(values.shape, dtype=np.bool_)
+        np.put_along_axis(kept, selected, True, axis=1)
+        return values, kept
 
-    # Roll the dice
-    for _ in range(num_dice):
-        roll = roll_single_die(dice_type, 0)
-        rolls.append(roll)
 
-    # Calculate total
-    base_total = sum(roll.result for roll in rolls)
+@dataclass(frozen=True, slots=True)
+class RollPlan:
+    """A compiled dice expression that can be rolled any number of times."""
 
-    # Apply advantage or disadvantage if specified
-    if advantage or disadvantage:
-        # Roll a second set
-        for i in range(num_dice):
-            reroll = roll_single_die(dice_type, 0)
-            if advantage:
-                # Take the higher of the two results
-                rolls[i] = rolls[i] if rolls[i].result >= reroll.result else reroll
+    terms: tuple[DiceTerm, ...]
+    modifier: int = 0
+    advantage: bool = False
+    disadvantage: bool = False
+
+    @property
+    def expression(self) -> str:
+        """Readable expression of what is rolled."""
+        text = self.terms[0].describe()
+        if self.terms[0].sign < 0:
+            text = f"-{text}"
+        for term in self.terms[1:]:
+            text += f" {'+' if term.sign > 0 else '-'} {term.describe()}"
+        if self.advantage:
+            text += " (advantage)"
+        if self.disadvantage:
+            text += " (disadvantage)"
+        if self.modifier:
+            text += f" {'+' if self.modifier > 0 else '-'} {abs(self.modifier)}"
+        return text
+
+    def roll_totals(
+        self, repetitions: int = 1, rng: np.random.Generator | None = None
+    ) -> npt.NDArray[np.int64]:
+        """
+        Roll the whole expression ``repetitions`` times.
+
+        Returns:
+            Array of shape (repetitions,) with the total of each repetition
+        """
+        totals = np.full(repetitions, self.modifier, dtype=np.int64)
+        for term in self.terms:
+            values, kept = term.roll(
+                repetitions, self.advantage, self.disadvantage, rng
+            )
+            if kept is not None:
+                values = np.where(kept, values, 0)
+            totals += term.sign * values.sum(axis=1, dtype=np.int64)
+        return totals
+
+    def roll(self, rng: np.random.Generator | None = None) -> RollOutcome:
+        """Roll the expression once and return the kept dice and total."""
+        groups: list[tuple[int, int, list[int]]] = []
+        total = self.modifier
+        for term in self.terms:
+            values, kept = term.roll(1, self.advantage, self.disadvantage, rng)
+            row = values[0] if kept is None else values[0][kept[0]]
+            total += term.sign * int(row.sum())
+            groups.append((term.dice_type, term.sign, row.tolist()))
+        return RollOutcome(expression=self.expression, total=total, groups=groups)
+
+    def roll_many(
+        self, repetitions: int, rng: np.random.Generator | None = None
+    ) -> list[RollOutcome]:
+        """Roll the expression ``repetitions`` times with one draw per dice group."""
+        totals = np.full(repetitions, self.modifier, dtype=np.int64)
+        kept_rows: list[list[list[int]]] = []
+        for term in self.terms:
+            values, kept = term.roll(
+                repetitions, self.advantage, self.disadvantage, rng
+            )
+            if kept is None:
+                totals += term.sign * values.sum(axis=1, dtype=np.int64)
+                kept_rows.append(values.tolist())
             else:
-                # Take the lower of the two results
-                rolls[i] = rolls[i] if rolls[i].result <= reroll.result else reroll
+                totals += term.sign * np.where(kept, values, 0).sum(
+                    axis=1, dtype=np.int64
+                )
+                kept_rows.append(
+                    [row[mask].tolist() for row, mask in zip(values, kept, strict=True)]
+                )
+        return [
+            RollOutcome(
+                expression=self.expression,
+                total=total,
+                groups=[
+                    (term.dice_type, term.sign, rows[index])
+                    for term, rows in zip(self.terms, kept_rows, strict=True)
+                ],
+            )
+            for index, total in enumerate(totals.tolist())
+        ]
 
-        base_total = sum(roll.result for roll in rolls)
 
-    final_total = base_total + modifier
+def _tokenize(expression: str) -> list[str]:
+    tokens: list[str] = []
+    position = 0
+    stripped = expression.rstrip()
+    while position < len(stripped):
+        match = _TOKEN_PATTERN.match(stripped, position)
+        if match is None:
+            raise ValueError(f"Cannot parse dice expression: {expression}")
+        tokens.append(match.group(match.lastgroup or "symbol"))
+        position = match.end()
+    return tokens
 
-    # Build expression string
-    advantage_str = " (advantage)" if advantage else ""
-    disadvantage_str = " (disadvantage)" if disadvantage else ""
-    modifier_str = f" + {modifier}" if modifier else ""
-    expression = f"{num_dice}d{dice_type}{advantage_str}{disadvantage_str}{modifier_str}"
 
-    return RollResult(
-        rolls=rolls,
-        total=final_total,
-        expression=expression,
+def _parse_term(tokens: list[str], index: int, sign: int) -> tuple[DiceTerm | int, int]:
+    """Parse a constant or an ``NdS`` group starting at ``tokens[index]``."""
+    count = 1
+    if index < len(tokens) and tokens[index].isdigit():
+        count = int(tokens[index])
+        index += 1
+        if index >= len(tokens) or tokens[index] != "d":
+            return sign * count, index
+    if index >= len(tokens) or tokens[index] != "d":
+        raise ValueError("Expected a number or a dice group")
+    index += 1
+    if index >= len(tokens) or not tokens[index].isdigit():
+        raise ValueError("Expected the number of faces after 'd'")
+    dice_type = int(tokens[index])
+    index += 1
+
+    _validate_dice_type(dice_type)
+    if not 1 <= count <= MAX_DICE_PER_TERM:
+        raise ValueError(f"Number of dice must be between 1 and {MAX_DICE_PER_TERM}")
+
+    keep: int | None = None
+    keep_highest = True
+    reroll_at_most = 0
+    while index < len(tokens) and (
+        tokens[index] in _KEEP_SUFFIXES
+        or tokens[index] in _DROP_SUFFIXES
+        or tokens[index] in _REROLL_SUFFIXES
+    ):
+        suffix = tokens[index]
+        index += 1
+        if suffix in _REROLL_SUFFIXES and index < len(tokens) and tokens[index] == "<":
+            index += 1
+        if index >= len(tokens) or not tokens[index].isdigit():
+            raise ValueError(f"Expected a number after '{suffix}'")
+        amount = int(tokens[index])
+        index += 1
+
+        if suffix in _REROLL_SUFFIXES:
+            if not 1 <= amount < dice_type:
+                raise ValueError(
+                    f"Reroll threshold must be between 1 and {dice_type - 1}"
+                )
+            reroll_at_most = amount
+            continue
+        if keep is not None:
+            raise ValueError("Only one keep or drop suffix is allowed per dice group")
+        if suffix in _KEEP_SUFFIXES:
+            keep_highest = _KEEP_SUFFIXES[suffix]
+            keep = amount
+        else:
+            keep_highest = _DROP_SUFFIXES[suffix]
+            keep = count - amount
+        if not 1 <= keep <= count:
+            raise ValueError(f"Cannot keep {keep} of {count} dice")
+
+    term = DiceTerm(
+        count=count,
+        dice_type=dice_type,
+        sign=sign,
+        keep=keep,
+        keep_highest=keep_highest,
+        reroll_at_most=reroll_at_most,
     )
+    return term, index
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_normalized(expression: str) -> RollPlan:
+    tokens = _tokenize(expression)
+    terms: list[DiceTerm] = []
+    modifier = 0
+    modes: set[str] = set()
+    index = 0
+    sign = 1
+    expect_term = True
+
+    try:
+        while index < len(tokens):
+            token = tokens[index]
+            if token in _MODE_WORDS:
+                modes.add(_MODE_WORDS[token])
+                index += 1
+            elif expect_term:
+                if token in "+-":
+                    sign = -sign if token == "-" else sign
+                    index += 1
+                    continue
+                term, index = _parse_term(tokens, index, sign)
+                if isinstance(term, DiceTerm):
+                    terms.append(term)
+                else:
+                    modifier += term
+                expect_term = False
+            elif token in "+-":
+                sign = -1 if token == "-" else 1
+                expect_term = True
+                index += 1
+            else:
+                raise ValueError(f"Unexpected '{token}'")
+    except ValueError as e:
+        raise ValueError(f"Cannot parse dice expression: {expression} ({e})") from e
+
+    if expect_term or not terms:
+        raise ValueError(f"Cannot parse dice expression: {expression}")
+    if len(modes) > 1:
+        raise ValueError("Cannot have both advantage and disadvantage")
+
+    return RollPlan(
+        terms=tuple(terms),
+        modifier=modifier,
+        advantage="advantage" in modes,
+        disadvantage="disadvantage" in modes,
+    )
+
+
+def compile_dice_expression(expression: str) -> RollPlan:
+    """
+    Compile a dice expression into a reusable roll plan.
+
+    Compiled plans are cached, so repeated expressions are only parsed once.
+
+    Grammar (case-insensitive, whitespace is ignored)::
+
+        expression := term (("+" | "-") term)* mode*
+        term       := number | [number] "d" number suffix*
+        suffix     := ("kh" | "k" | "kl" | "dh" | "dl") number
+                    | ("r" | "ro") ["<"] number
+        mode       := "adv" | "advantage" | "dis" | "disadvantage"
+
+    Args:
+        expression: Dice expression in D&D notation (e.g., "2d6+1d4+3")
+
+    Returns:
+        The compiled RollPlan
+
+    Raises:
+        ValueError: If the expression cannot be parsed
+    """
+    return _compile_normalized(expression.strip().lower())
 
 
 def roll_dice_expression(expression: str) -> RollResult:
@@ -152,6 +602,9 @@ def roll_dice_expression(expression: str) -> RollResult:
     - "1d20-2" - roll one d20 with -2 modifier
     - "1d20 adv" - roll with advantage
     - "1d20 dis" - roll with disadvantage
+    - "2d6+1d4+3" - add several dice groups and modifiers
+    - "4d6kh3" / "2d20kl1" - keep the highest or lowest dice ("dl"/"dh" drop)
+    - "2d6r2" - reroll any die showing 2 or lower, once
 
     Args:
         expression: Dice expression in D&D notation (e.g., "2d6+3", "1d20")
@@ -162,40 +615,403 @@ def roll_dice_expression(expression: str) -> RollResult:
     Raises:
         ValueError: If the expression cannot be parsed
     """
-    expression = expression.strip().lower()
+    return compile_dice_expression(expression).roll().to_model()
 
-    # Check for advantage/disadvantage
-    has_advantage = " adv" in expression or " advantage" in expression
-    has_disadvantage = " dis" in expression or " disadvantage" in expression
-    if has_advantage:
-        expression = expression.replace(" adv", "").replace(" advantage", "")
-    if has_disadvantage:
-        expression = expression.replace(" dis", "").replace(" disadvantage", "")
 
-    # Parse the basic dice expression
-    if "d" not in expression:
-        raise ValueError(f"Cannot parse dice expression: {expression}")
+# Below this many output points direct convolution beats the FFT
+_FFT_THRESHOLD = 512
+# Percentiles reported by the dice_odds tool
+ODDS_PERCENTILES = (10, 25, 50, 75, 90)
+# Largest support for which dice_odds returns the full PMF
+MAX_PMF_POINTS = 200
+# Keep/drop distributions grow much faster with the pool size than plain sums
+MAX_KEEP_DISTRIBUTION_DICE = 20
+
+
+@dataclass(frozen=True, slots=True)
+class Distribution:
+    """Exact probability distribution of a dice expression total."""
+
+    minimum: int
+    pmf: npt.NDArray[np.float64]
+
+    @property
+    def maximum(self) -> int:
+        """Largest possible total."""
+        return self.minimum + len(self.pmf) - 1
+
+    @property
+    def mean(self) -> float:
+        """Expected total."""
+        return float(self.minimum + np.dot(np.arange(len(self.pmf)), self.pmf))
 
-    # Split into dice part and modifier part
-    if "+" in expression:
-        dice_part, modifier_str = expression.split("+", 1)
-        modifier = int(modifier_str.strip())
-    elif "-" in expression:
-        dice_part, modifier_str = expression.split("-", 1)
-        modifier = -int(modifier_str.strip())
+    def percentile(self, percent: float) -> int:
+        """Return the smallest total whose cumulative probability reaches ``percent``."""
+        index = np.searchsorted(np.cumsum(self.pmf), percent / 100 - 1e-12)
+        return self.minimum + int(min(index, len(self.pmf) - 1))
+
+    def probability_at_least(self, target: int) -> float:
+        """Return P(total >= target)."""
+        index = target - self.minimum
+        if index <= 0:
+            return 1.0
+        return float(self.pmf[index:].sum())
+
+
+def _convolve(
+    first: npt.NDArray[np.float64], second: npt.NDArray[np.float64]
+) -> npt.NDArray[np.float64]:
+    """Multiply two probability polynomials, using an FFT for large inputs."""
+    size = len(first) + len(second) - 1
+    if size < _FFT_THRESHOLD:
+        return np.convolve(first, second)
+    fft_size = 1 << (size - 1).bit_length()
+    product = np.fft.irfft(
+        np.fft.rfft(first, fft_size) * np.fft.rfft(second, fft_size), fft_size
+    )[:size]
+    # FFT round-off leaves tiny negative values where the probability is zero
+    np.clip(product, 0.0, None, out=product)
+    return product / product.sum()
+
+
+@functools.lru_cache(maxsize=128)
+def _die_pmf(
+    dice_type: int, advantage: bool, disadvantage: bool, reroll_at_most: int
+) -> npt.NDArray[np.float64]:
+    """PMF of one kept die over faces 1..dice_type."""
+    faces = np.arange(1, dice_type + 1, dtype=np.float64)
+    if advantage:
+        pmf = (2 * faces - 1) / dice_type**2
+    elif disadvantage:
+        pmf = (2 * (dice_type - faces) + 1) / dice_type**2
     else:
-        dice_part = expression
-        modifier = 0
+        pmf = np.full(dice_type, 1 / dice_type)
+    if reroll_at_most:
+        low = pmf[:reroll_at_most].sum()
+        pmf = pmf * low + np.where(faces > reroll_at_most, pmf, 0.0)
+    pmf.setflags(write=False)
+    return pmf
 
-    # Parse dice part
-    if "d" not in dice_part:
-        raise ValueError(f"Cannot parse dice expression: {expression}")
 
-    num_dice_str, dice_type_str = dice_part.split("d", 1)
-    num_dice = int(num_dice_str) if num_dice_str else 1
-    dice_type = int(dice_type_str)
+@functools.lru_cache(maxsize=256)
+def _sum_pmf(
+    dice_type: int,
+    count: int,
+    advantage: bool,
+    disadvantage: bool,
+    reroll_at_most: int,
+) -> npt.NDArray[np.float64]:
+    """PMF of the sum of ``count`` dice, indexed from a total of ``count``."""
+    if count == 1:
+        return _die_pmf(dice_type, advantage, disadvantage, reroll_at_most)
+    half = _sum_pmf(dice_type, count // 2, advantage, disadvantage, reroll_at_most)
+    result = _convolve(half, half)
+    if count % 2:
+        die = _die_pmf(dice_type, advantage, disadvantage, reroll_at_most)
+        result = _convolve(result, die)
+    result.setflags(write=False)
+    return result
+
+
+def _keep_pmf(
+    die: npt.NDArray[np.float64], count: int, keep: int, keep_highest: bool
+) -> npt.NDArray[np.float64]:
+    """
+    PMF of the sum of the ``keep`` highest (or lowest) of ``count`` dice.
+
+    Walks the faces from the kept end, tracking how many dice have been placed
+    and how many of them are kept, so it never enumerates individual outcomes.
+    Returned array is indexed by total, starting at zero.
+    """
+    dice_type = len(die)
+    faces = range(dice_type, 0, -1) if keep_highest else range(1, dice_type + 1)
+    # Probability that a die lands strictly beyond the current face
+    remaining_mass = 1.0
+    states: dict[tuple[int, int], npt.NDArray[np.float64]] = {
+        (0, 0): np.eye(1, keep * dice_type + 1)[0]
+    }
+    result = np.zeros(keep * dice_type + 1)
+    for face in faces:
+        probability = die[face - 1]
+        remaining_mass -= probability
+        next_states: dict[tuple[int, int], npt.NDArray[np.float64]] = {}
+        for (placed, kept), sums in states.items():
+            free = count - placed
+            for landed in range(free + 1):
+                weight = math.comb(free, landed) * probability**landed
+                if weight == 0.0:
+                    continue
+                added = min(landed, keep - kept)
+                shifted = np.roll(sums, added * face) * weight
+                key = (placed + landed, kept + added)
+                if key[1] == keep:
+                    # Every other die falls on the dropped side of this face
+                    result += shifted * max(remaining_mass, 0.0) ** (count - key[0])
+                elif key in next_states:
+                    next_states[key] += shifted
+                else:
+                    next_states[key] = shifted
+        states = next_states
+    return result
+
+
+@functools.lru_cache(maxsize=256)
+def _term_distribution(
+    term: DiceTerm, advantage: bool, disadvantage: bool
+) -> Distribution:
+    if term.keep is None or term.keep == term.count:
+        pmf = _sum_pmf(
+            term.dice_type,
+            term.count,
+            advantage,
+            disadvantage,
+            term.reroll_at_most,
+        )
+        minimum = term.count
+    else:
+        if term.count > MAX_KEEP_DISTRIBUTION_DICE:
+            raise ValueError(
+                "Odds of keep or drop rolls are limited to "
+                f"{MAX_KEEP_DISTRIBUTION_DICE} dice per group"
+            )
+        die = _die_pmf(term.dice_type, advantage, disadvantage, term.reroll_at_most)
+        full = _keep_pmf(die, term.count, term.keep, term.keep_highest)
+        pmf = full[term.keep :]
+        minimum = term.keep
+    if term.sign < 0:
+        return Distribution(minimum=-(minimum + len(pmf) - 1), pmf=pmf[::-1])
+    return Distribution(minimum=minimum, pmf=pmf)
+
+
+@functools.lru_cache(maxsize=256)
+def plan_distribution(plan: RollPlan) -> Distribution:
+    """
+    Compute the exact distribution of a compiled roll plan.
+
+    Args:
+        plan: The compiled RollPlan
+
+    Returns:
+        Distribution of the plan total, including its modifier
+    """
+    minimum = plan.modifier
+    pmf = np.ones(1)
+    for term in plan.terms:
+        distribution = _term_distribution(term, plan.advantage, plan.disadvantage)
+        minimum += distribution.minimum
+        pmf = _convolve(pmf, distribution.pmf)
+    pmf.setflags(write=False)
+    return Distribution(minimum=minimum, pmf=pmf)
+
+
+def dice_expression_distribution(expression: str) -> Distribution:
+    """
+    Compute the exact outcome distribution of a dice expression.
+
+    Args:
+        expression: Dice expression in D&D notation (e.g., "1d20+5 adv")
+
+    Returns:
+        Distribution of the expression total
+
+    Raises:
+        ValueError: If the expression cannot be parsed
+    """
+    return plan_distribution(compile_dice_expression(expression))
+
+
+# Session state keys for the per-session dice stream
+SEED_STATE_KEY = "dice_seed"
+ROLL_COUNT_STATE_KEY = "dice_roll_count"
+# Sessions whose roll journal is kept in memory on this worker
+MAX_JOURNALED_SESSIONS = 1024
+
+
+def roll_expressions(
+    expressions: Sequence[str], rng: np.random.Generator | None = None
+) -> list[RollOutcome | ValueError]:
+    """
+    Roll several expressions, sharing one bulk draw between identical ones.
 
-    return roll_multiple_dice(num_dice, dice_type, modifier, has_advantage, has_disadvantage)
+    Draws happen in order of each expression's first appearance, so the same
+    expressions and generator always give the same outcomes.
+
+    Args:
+        expressions: Dice expressions to roll, in order
+        rng: Optional numpy generator to draw from instead of the module default
+
+    Returns:
+        One RollOutcome per expression, or the ValueError raised while compiling it
+    """
+    pending: dict[str, list[int]] = {}
+    for index, expression in enumerate(expressions):
+        pending.setdefault(expression, []).append(index)
+
+    outcomes: list[RollOutcome | ValueError] = [ValueError()] * len(expressions)
+    for expression, indices in pending.items():
+        try:
+            plan = compile_dice_expression(expression)
+        except ValueError as e:
+            for index in indices:
+                outcomes[index] = e
+            continue
+        for index, outcome in zip(
+            indices, plan.roll_many(len(indices), rng), strict=True
+        ):
+            outcomes[index] = outcome
+    return outcomes
+
+
+def session_rng(seed: int, call_index: int) -> np.random.Generator:
+    """
+    Return the generator for one dice tool call of a session.
+
+    Each call gets an independent stream derived from the session seed, so any
+    call can be replayed on its own without replaying everything before it.
+    """
+    return np.random.Generator(
+        np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(call_index,)))
+    )
+
+
+class RollJournal:
+    """
+    Append-only record of every roll made in one session.
+
+    Die values, dice types and per-roll fields are stored in flat typed arrays
+    rather than per-roll objects, so a long session costs a few bytes per die.
+    """
+
+    def __init__(self, seed: int) -> None:
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._expressions: list[str] = []
+        self._expression_ids: dict[str, int] = {}
+        self._call_indices = array("I")
+        self._expression_indices = array("I")
+        self._totals = array("q")
+        self._offsets = array("I", [0])
+        self._dice_types = array("B")
+        self._values = array("B")
+
+    def __len__(self) -> int:
+        return len(self._totals)
+
+    def record(
+        self,
+        call_index: int,
+        expressions: Sequence[str],
+        outcomes: Sequence[RollOutcome | ValueError],
+    ) -> None:
+        """Append the successful outcomes of one tool call."""
+        with self._lock:
+            for expression, outcome in zip(expressions, outcomes, strict=True):
+                if not isinstance(outcome, RollOutcome):
+                    continue
+                expression_id = self._expression_ids.setdefault(
+                    expression, len(self._expressions)
+                )
+                if expression_id == len(self._expressions):
+                    self._expressions.append(expression)
+                self._call_indices.append(call_index)
+                self._expression_indices.append(expression_id)
+                self._totals.append(outcome.total)
+                for dice_type, _, values in outcome.groups:
+                    self._dice_types.extend([dice_type] * len(values))
+                    self._values.extend(values)
+                self._offsets.append(len(self._values))
+
+    def calls(self) -> dict[int, list[str]]:
+        """Return the expressions rolled by each journaled tool call, in order."""
+        calls: dict[int, list[str]] = {}
+        for call_index, expression_id in zip(
+            self._call_indices, self._expression_indices, strict=True
+        ):
+            calls.setdefault(call_index, []).append(self._expressions[expression_id])
+        return calls
+
+    def totals(self) -> list[int]:
+        """Return the total of every journaled roll, in order."""
+        return self._totals.tolist()
+
+    def stats(self) -> dict[str, Any]:
+        """Summarize the session's rolls."""
+        values = np.frombuffer(self._values, dtype=np.uint8)
+        dice_types = np.frombuffer(self._dice_types, dtype=np.uint8)
+        by_dice_type: dict[str, dict[str, float]] = {}
+        for dice_type in np.unique(dice_types).tolist():
+            faces = values[dice_types == dice_type]
+            by_dice_type[f"d{dice_type}"] = {
+                "count": int(faces.size),
+                "mean": round(float(faces.mean()), 3),
+            }
+        d20s = values[dice_types == 20]
+        return {
+            "rolls": len(self),
+            "dice": int(values.size),
+            "by_dice_type": by_dice_type,
+            "natural_20s": int((d20s == 20).sum()),
+            "natural_1s": int((d20s == 1).sum()),
+        }
+
+
+_journals: OrderedDict[str, RollJournal] = OrderedDict()
+_journals_lock = threading.Lock()
+
+
+def get_roll_journal(session_id: str) -> RollJournal | None:
+    """Return the roll journal of a session, if this worker has one."""
+    with _journals_lock:
+        return _journals.get(session_id)
+
+
+def _session_journal(session_id: str, seed: int) -> RollJournal:
+    with _journals_lock:
+        journal = _journals.get(session_id)
+        if journal is None or journal.seed != seed:
+            journal = _journals[session_id] = RollJournal(seed)
+        _journals.move_to_end(session_id)
+        while len(_journals) > MAX_JOURNALED_SESSIONS:
+            _journals.popitem(last=False)
+        return journal
+
+
+def _next_session_stream(
+    tool_context: ToolContext | None,
+) -> tuple[np.random.Generator, RollJournal | None, int]:
+    """Advance the session's dice stream by one tool call."""
+    if tool_context is None:
+        return _rng, None, 0
+    state = tool_context.state
+    seed = state.get(SEED_STATE_KEY)
+    if seed is None:
+        # 52 bits so the seed survives JSON and protobuf number round trips
+        seed = secrets.randbits(52)
+        state[SEED_STATE_KEY] = seed
+    call_index = state.get(ROLL_COUNT_STATE_KEY, 0)
+    state[ROLL_COUNT_STATE_KEY] = call_index + 1
+    journal = _session_journal(tool_context.session.id, seed)
+    return session_rng(seed, call_index), journal, call_index
+
+
+def replay_rolls(seed: int, calls: Mapping[int, Sequence[str]]) -> list[RollOutcome]:
+    """
+    Re-roll a session's dice tool calls from its seed.
+
+    Args:
+        seed: The session seed stored under SEED_STATE_KEY
+        calls: Expressions rolled by each tool call, keyed by call index
+            (as returned by RollJournal.calls)
+
+    Returns:
+        The outcomes of every call, identical to the original rolls
+    """
+    outcomes: list[RollOutcome] = []
+    for call_index, expressions in sorted(calls.items()):
+        for outcome in roll_expressions(expressions, session_rng(seed, call_index)):
+            if isinstance(outcome, RollOutcome):
+                outcomes.append(outcome)
+    return outcomes
 
 
 # Function for the ADK tool
@@ -211,6 +1027,9 @@ def roll_dice(expression: str, tool_context: ToolContext) -> dict[str, Any]:
             - "1d20 adv" - roll with advantage (roll twice, take higher)
             - "1d20 dis" - roll with disadvantage (roll twice, take lower)
             - "3d8+7" - roll three d8 and add 7
+            - "2d6+1d4+3" - roll several dice groups and add them together
+            - "4d6kh3" - roll four d6 and keep the highest three ("kl" keeps lowest)
+            - "2d6r2" - roll two d6, rerolling any 1 or 2 once
 
     Returns:
         Dictionary containing:
@@ -220,20 +1039,109 @@ def roll_dice(expression: str, tool_context: ToolContext) -> dict[str, Any]:
             - details: Detailed breakdown of each die
     """
     try:
-        result = roll_dice_expression(expression)
-        return {
-            "total": result.total,
-            "expression": result.expression,
-            "rolls": [roll.result for roll in result.rolls],
-            "details": [
-                {
-                    "dice_type": roll.dice_type,
-                    "result": roll.result,
-                    "modifier": roll.modifier,
-                }
-                for roll in result.rolls
-            ],
-        }
+        rng, journal, call_index = _next_session_stream(tool_context)
+        outcome = roll_expressions([expression], rng)[0]
+        if isinstance(outcome, ValueError):
+            return {"error": str(outcome)}
+        if journal is not None:
+            journal.record(call_index, [expression], [outcome])
+        return outcome.to_response()
     except Exception as e:
         return {"error": str(e)}
 
+
+def roll_dice_batch(
+    rolls: list[LabelledRoll], tool_context: ToolContext
+) -> dict[str, Any]:
+    """
+    Roll many labelled dice expressions in a single call. Use this whenever
+    several rolls are needed at once, such as every monster's attack and damage
+    rolls for a combat round, instead of calling roll_dice once per roll.
+
+    Args:
+        rolls: The rolls to make, in order. Each has a label saying what the
+            roll is for and an expression in the same notation as roll_dice. Example:
+            [{"label": "goblin 1 attack", "expression": "1d20+4"},
+             {"label": "goblin 1 damage", "expression": "1d6+2"},
+             {"label": "goblin 2 attack", "expression": "1d20+4"}]
+
+    Returns:
+        Dictionary containing:
+            - results: One entry per roll, in request order, with its label plus
+              the same fields roll_dice returns (or an error for that roll)
+    """
+    requests: list[LabelledRoll] = []
+    for item in rolls:
+        try:
+            requests.append(LabelledRoll.model_validate(item))
+        except Exception as e:
+            return {"error": f"Invalid roll {item!r}: {e}"}
+
+    expressions = [request.expression for request in requests]
+    rng, journal, call_index = _next_session_stream(tool_context)
+    outcomes = roll_expressions(expressions, rng)
+    if journal is not None:
+        journal.record(call_index, expressions, outcomes)
+
+    results: list[dict[str, Any]] = []
+    for request, outcome in zip(requests, outcomes, strict=True):
+        if isinstance(outcome, ValueError):
+            results.append({"label": request.label, "error": str(outcome)})
+        else:
+            results.append({"label": request.label, **outcome.to_response()})
+    return {"results": results}
+
+
+async def dice_odds(expression: str, dc: int | None = None) -> dict[str, Any]:
+    """
+    Calculate the exact odds of a dice roll instead of estimating them.
+
+    Use this to judge how likely a check, attack or damage roll is to succeed
+    before setting a DC or balancing an encounter.
+
+    Args:
+        expression: Dice expression in D&D notation, as for roll_dice. Examples:
+            - "1d20+5" - a check with a +5 bonus
+            - "1d20+5 adv" - the same check with advantage
+            - "2d6+3" - greatsword damage
+        dc: Optional target number; the result includes the chance of rolling
+            at least this total
+
+    Returns:
+        Dictionary containing:
+            - expression: What was analyzed
+            - min, max, mean: Range and expected total
+            - percentiles: Totals at the 10th, 25th, 50th, 75th and 90th percentile
+            - pmf: Probability of each total (omitted for very wide ranges)
+            - probability_at_least_dc: Chance that total >= dc (if dc was given)
+    """
+    # Large expressions take a while; keep the event loop serving other turns
+    return await asyncio.to_thread(_odds, expression, dc)
+
+
+def _odds(expression: str, dc: int | None) -> dict[str, Any]:
+    try:
+        distribution = dice_expression_distribution(expression)
+        result: dict[str, Any] = {
+            "expression": compile_dice_expression(expression).expression,
+            "min": distribution.minimum,
+            "max": distribution.maximum,
+            "mean": round(distribution.mean, 3),
+            "percentiles": {
+                f"p{percent}": distribution.percentile(percent)
+                for percent in ODDS_PERCENTILES
+            },
+        }
+        if len(distribution.pmf) <= MAX_PMF_POINTS:
+            result["pmf"] = {
+                str(distribution.minimum + offset): round(float(probability), 6)
+                for offset, probability in enumerate(distribution.pmf)
+            }
+        if dc is not None:
+            result["dc"] = dc
+            result["probability_at_least_dc"] = round(
+                distribution.probability_at_least(dc), 6
+            )
+        return result
+    except Exception as e:
+        return {"error": str(e)}
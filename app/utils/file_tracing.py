@@ -0,0 +1,233 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Offline span export to rotated JSON lines files, and a latency summary CLI.
+
+Usage: python -m app.utils.file_tracing [directory]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any, TextIO
+
+import numpy as np
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.trace import format_span_id, format_trace_id
+
+from app.utils.metrics import classify_span
+from app.utils.sampling import trim_attribute
+
+DEFAULT_TELEMETRY_DIR = ".telemetry"
+SPAN_FILE_PREFIX = "spans-"
+SPAN_FILE_SUFFIX = ".jsonl"
+
+
+def span_to_record(span: ReadableSpan, max_attribute_chars: int) -> dict[str, Any]:
+    """
+    Build the compact record written for a span.
+
+    Times stay in integer nanoseconds and long string attributes are
+    truncated, so records are cheap to write and to read back.
+
+    :param span: The finished span
+    :param max_attribute_chars: Longest string attribute written as is
+    :return: The span record
+    """
+    return {
+        "name": span.name,
+        "trace_id": format_trace_id(span.context.trace_id) if span.context else None,
+        "span_id": format_span_id(span.context.span_id) if span.context else None,
+        "parent_id": format_span_id(span.parent.span_id) if span.parent else None,
+        "start": span.start_time,
+        "end": span.end_time,
+        "status": span.status.status_code.name,
+        "attributes": {
+            key: _record_value(value, max_attribute_chars)
+            for key, value in (span.attributes or {}).items()
+        },
+    }
+
+
+def _record_value(value: Any, max_attribute_chars: int) -> Any:
+    if isinstance(value, str):
+        return trim_attribute(value, max_attribute_chars, "truncate")
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """
+    Writes spans as compact JSON lines to rotated files in a local directory.
+
+    Needs no Google Cloud clients or network access. A file is rotated once it
+    reaches ``max_file_bytes``, and only the newest ``max_files`` are kept.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str] = DEFAULT_TELEMETRY_DIR,
+        max_file_bytes: int = 64 * 1024 * 1024,
+        max_files: int = 10,
+        max_attribute_chars: int = 1024,
+    ) -> None:
+        """
+        Initialize the exporter.
+
+        :param directory: Directory the span files are written to
+        :param max_file_bytes: Size at which the current file is rotated
+        :param max_files: Number of span files kept, oldest deleted first
+        :param max_attribute_chars: Longest string attribute written as is
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.max_attribute_chars = max_attribute_chars
+        self._lock = threading.Lock()
+        self._file = self._open()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        """
+        Append the spans to the current span file.
+
+        :param spans: A sequence of spans to export
+        :return: The result of the export operation
+        """
+        lines = "".join(
+            json.dumps(
+                span_to_record(span, self.max_attribute_chars), separators=(",", ":")
+            )
+            + "\n"
+            for span in spans
+        )
+        with self._lock:
+            if self._file.closed:
+                return SpanExportResult.FAILURE
+            self._file.write(lines)
+            self._file.flush()
+            if self._file.tell() >= self.max_file_bytes:
+                self._file.close()
+                self._file = self._open()
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+        return True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _open(self) -> TextIO:
+        files = sorted(self.directory.glob(f"{SPAN_FILE_PREFIX}*{SPAN_FILE_SUFFIX}"))
+        for old_file in files[: max(len(files) - self.max_files + 1, 0)]:
+            old_file.unlink(missing_ok=True)
+        name = f"{SPAN_FILE_PREFIX}{time.time_ns()}-{os.getpid()}{SPAN_FILE_SUFFIX}"
+        return (self.directory / name).open("a", encoding="utf-8")
+
+
+def read_span_records(directory: str | os.PathLike[str]) -> Iterator[dict[str, Any]]:
+    """
+    Read every span record from the span files in a directory, oldest first.
+
+    :param directory: Directory written by JsonLinesSpanExporter
+    :return: Iterator over the span records
+    """
+    for path in sorted(Path(directory).glob(f"{SPAN_FILE_PREFIX}*{SPAN_FILE_SUFFIX}")):
+        with path.open(encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def summarize_latency(
+    records: Iterator[dict[str, Any]],
+) -> list[dict[str, Any]]:
+    """
+    Compute latency statistics per agent, sub-agent, tool and model.
+
+    :param records: Span records, as read by ``read_span_records``
+    :return: One row per component with count, mean, p50, p95, p99 and max in
+        milliseconds, slowest total time first
+    """
+    durations: defaultdict[tuple[str, str], list[float]] = defaultdict(list)
+    for record in records:
+        component = classify_span(record["name"], record.get("attributes"))
+        if component is None or record.get("start") is None or not record.get("end"):
+            continue
+        durations[component].append((record["end"] - record["start"]) / 1e6)
+
+    rows = []
+    for (component, name), values in durations.items():
+        latency = np.array(values)
+        p50, p95, p99 = np.percentile(latency, (50, 95, 99))
+        rows.append(
+            {
+                "component": component,
+                "name": name,
+                "count": len(latency),
+                "total_ms": float(latency.sum()),
+                "mean_ms": float(latency.mean()),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "p99_ms": float(p99),
+                "max_ms": float(latency.max()),
+            }
+        )
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """Print the per-component latency summary of a span directory."""
+    parser = argparse.ArgumentParser(
+        description="Summarize per-agent latency from local span files."
+    )
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        default=os.getenv("TELEMETRY_DIR", DEFAULT_TELEMETRY_DIR),
+        help="Directory written by the file telemetry exporter",
+    )
+    args = parser.parse_args(argv)
+
+    rows = summarize_latency(read_span_records(args.directory))
+    if not rows:
+        print(f"No agent spans found in {args.directory}")
+        return
+    header = f"{'component':<11} {'name':<32} {'count':>7}"
+    header += "".join(
+        f" {column:>10}" for column in ("mean", "p50", "p95", "p99", "max")
+    )
+    print(header)
+    for row in rows:
+        line = f"{row['component']:<11} {row['name'][:32]:<32} {row['count']:>7}"
+        line += "".join(
+            f" {row[f'{column}_ms']:>8.1f}ms"
+            for column in ("mean", "p50", "p95", "p99", "max")
+        )
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
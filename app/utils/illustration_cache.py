@@ -0,0 +1,309 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+NUM_PERMUTATIONS = 64
+SHINGLE_WORDS = 3
+# Fixed, so signatures stored on disk stay comparable across restarts
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.default_rng(20250101)
+_PERMUTATION_A = _rng.integers(1, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64)
+_PERMUTATION_B = _rng.integers(0, 1 << 32, NUM_PERMUTATIONS, dtype=np.uint64)
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+INDEX_FILE = "index.json"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase a prompt and reduce it to words separated by single spaces."""
+    return _NON_WORD.sub(" ", prompt.lower()).strip()
+
+
+def prompt_key(prompt: str, profile: str = "") -> str:
+    """
+    Return the cache key of a prompt.
+
+    :param prompt: The image prompt
+    :param profile: Output settings the cached image depends on, e.g. its format
+    :return: Hex digest of the profile and the normalized prompt
+    """
+    return hashlib.sha256(f"{profile}\n{normalize_prompt(prompt)}".encode()).hexdigest()
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> set[str]:
+    """Return the overlapping ``size``-word sequences of the normalized text."""
+    words = normalize_prompt(text).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(text: str) -> np.ndarray:
+    """
+    Return the MinHash signature of a text's word shingles.
+
+    The share of equal positions in two signatures estimates the Jaccard
+    similarity of the texts' shingle sets.
+
+    :param text: The text to sign
+    :return: Array of NUM_PERMUTATIONS unsigned integers
+    """
+    hashes = np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(shingle.encode(), digest_size=4).digest(), "little"
+            )
+            for shingle in shingles(text)
+        ),
+        dtype=np.uint64,
+    )
+    if hashes.size == 0:
+        return np.full(NUM_PERMUTATIONS, _MAX_HASH, dtype=np.uint64)
+    # Universal hashing: (a * x + b) mod p, kept to 32 bits; a * x fits in 64
+    permuted = (
+        np.outer(hashes, _PERMUTATION_A) + _PERMUTATION_B
+    ) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=0)
+
+
+@dataclass
+class CachedIllustration:
+    """An illustration found in the cache."""
+
+    key: str
+    mime_type: str
+    data: bytes
+    thumbnail: bytes | None
+    # 1.0 for an exact prompt match, the estimated similarity otherwise
+    similarity: float
+
+
+@dataclass
+class _Entry:
+    key: str
+    profile: str
+    mime_type: str
+    size: int
+    has_thumbnail: bool
+    signature: np.ndarray
+
+
+class IllustrationCache:
+    """
+    Least recently used cache of generated illustrations on local disk.
+
+    Images are keyed by a hash of their normalized prompt. When
+    ``similarity_threshold`` is set, a prompt without an exact match also
+    matches the most similar cached prompt whose estimated Jaccard
+    similarity, from MinHash signatures of word shingles, reaches the
+    threshold. Text shared by every prompt, e.g. a style suffix, inflates the
+    estimate, so pass only the part that varies. The least recently used
+    images are evicted once the cache exceeds ``max_bytes``; the usage order
+    is persisted when an image is stored. Methods do blocking file I/O and
+    are thread safe.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str] = ".illustration_cache",
+        max_bytes: int = 256 * 1024 * 1024,
+        similarity_threshold: float | None = None,
+    ) -> None:
+        """
+        Initialize the cache, loading the index of a previous run if present.
+
+        :param directory: Directory holding the images and their index
+        :param max_bytes: Maximum total size of the cached images
+        :param similarity_threshold: Minimum estimated similarity for a near
+            duplicate match, or None to only match exact prompts
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.near_duplicate_hits = 0
+        self.misses = 0
+
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def lookup(self, prompt: str, profile: str = "") -> CachedIllustration | None:
+        """
+        Find the cached illustration for a prompt.
+
+        :param prompt: The image prompt
+        :param profile: Output settings the image must have been stored with
+        :return: The cached illustration, or None on a miss
+        """
+        key = prompt_key(prompt, profile)
+        with self._lock:
+            entry = self._entries.get(key)
+            match = 1.0
+            if entry is None and self.similarity_threshold is not None:
+                entry, match = self._nearest(minhash(prompt), profile)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                data = self._path(entry.key).read_bytes()
+                thumbnail = (
+                    self._path(entry.key, "thumb").read_bytes()
+                    if entry.has_thumbnail
+                    else None
+                )
+            except OSError:
+                logging.warning(f"Cached illustration {entry.key} is missing")
+                self._remove(entry.key)
+                self._save_index()
+                self.misses += 1
+                return None
+            # Persisted with the next store, not rewritten on every hit
+            self._entries.move_to_end(entry.key)
+            self.hits += 1
+            if entry.key != key:
+                self.near_duplicate_hits += 1
+            return CachedIllustration(
+                entry.key, entry.mime_type, data, thumbnail, match
+            )
+
+    def store(
+        self,
+        prompt: str,
+        mime_type: str,
+        data: bytes,
+        thumbnail: bytes | None = None,
+        profile: str = "",
+    ) -> str:
+        """
+        Add an illustration to the cache, evicting the least recently used.
+
+        :param prompt: The prompt the image was generated from
+        :param mime_type: MIME type of the image
+        :param data: The image bytes
+        :param thumbnail: Thumbnail bytes, if any
+        :param profile: Output settings the image was produced with
+        :return: The cache key
+        """
+        key = prompt_key(prompt, profile)
+        size = len(data) + len(thumbnail or b"")
+        if size > self.max_bytes:
+            return key
+        with self._lock:
+            self._remove(key)
+            self._write(self._path(key), data)
+            if thumbnail is not None:
+                self._write(self._path(key, "thumb"), thumbnail)
+            self._entries[key] = _Entry(
+                key, profile, mime_type, size, thumbnail is not None, minhash(prompt)
+            )
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+            self._save_index()
+        return key
+
+    def stats(self) -> dict[str, int]:
+        """Return the cache's counters and size."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "near_duplicate_hits": self.near_duplicate_hits,
+                "misses": self.misses,
+            }
+
+    def _nearest(
+        self, signature: np.ndarray, profile: str
+    ) -> tuple[_Entry | None, float]:
+        candidates = [e for e in self._entries.values() if e.profile == profile]
+        if not candidates:
+            return None, 0.0
+        scores = np.mean(
+            np.stack([e.signature for e in candidates]) == signature, axis=1
+        )
+        best = int(np.argmax(scores))
+        assert self.similarity_threshold is not None
+        if scores[best] < self.similarity_threshold:
+            return None, 0.0
+        return candidates[best], float(scores[best])
+
+    def _path(self, key: str, suffix: str = "image") -> Path:
+        return self.directory / f"{key}.{suffix}"
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        temporary = path.with_name(path.name + ".tmp")
+        temporary.write_bytes(data)
+        temporary.replace(path)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry.size
+        for suffix in ("image", "thumb"):
+            self._path(key, suffix).unlink(missing_ok=True)
+
+    def _save_index(self) -> None:
+        index = [
+            {
+                "key": entry.key,
+                "profile": entry.profile,
+                "mime_type": entry.mime_type,
+                "size": entry.size,
+                "has_thumbnail": entry.has_thumbnail,
+                "signature": entry.signature.tolist(),
+            }
+            for entry in self._entries.values()
+        ]
+        try:
+            self._write(self.directory / INDEX_FILE, json.dumps(index).encode())
+        except OSError:
+            logging.warning(
+                f"Could not write the illustration cache index in {self.directory}"
+            )
+
+    def _load_index(self) -> None:
+        try:
+            index = json.loads((self.directory / INDEX_FILE).read_text())
+        except (OSError, ValueError):
+            return
+        # Stored least recently used first
+        for item in index:
+            entry = _Entry(
+                item["key"],
+                item["profile"],
+                item["mime_type"],
+                item["size"],
+                item["has_thumbnail"],
+                np.array(item["signature"], dtype=np.uint64),
+            )
+            self._entries[entry.key] = entry
+            self._size += entry.size
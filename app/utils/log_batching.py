@@ -0,0 +1,174 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Literal
+
+from google.cloud import logging as google_cloud_logging
+
+DropPolicy = Literal["drop_oldest", "drop_newest"]
+
+
+class BatchedLogWriter:
+    """
+    Writes structured entries to Google Cloud Logging in bulk from a background thread.
+
+    Callers enqueue entries without touching the network. A daemon thread
+    commits them with one ``entries.write`` call per batch, as soon as a batch
+    is full or ``flush_interval`` seconds have passed. The queue is bounded.
+    When it is full, ``drop_policy`` decides whether the oldest queued entry or
+    the incoming one is discarded.
+    """
+
+    def __init__(
+        self,
+        logger: google_cloud_logging.Logger,
+        max_batch_size: int = 32,
+        flush_interval: float = 5.0,
+        max_queue_size: int = 2048,
+        drop_policy: DropPolicy = "drop_oldest",
+    ) -> None:
+        """
+        Initialize the writer and start its flush thread.
+
+        :param logger: Cloud Logging logger the entries are written to
+        :param max_batch_size: Maximum entries per write; Cloud Logging rejects
+            requests over 10 MB, so keep this times the largest entry below that
+        :param flush_interval: Maximum seconds an entry waits before being written
+        :param max_queue_size: Maximum entries held in memory
+        :param drop_policy: Which entry to discard when the queue is full
+        """
+        if drop_policy not in ("drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.logger = logger
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.drop_policy = drop_policy
+
+        self._queue: deque[tuple[dict[str, Any], dict[str, Any]]] = deque()
+        self._condition = threading.Condition()
+        self._writing = False
+        self._flush_requested = False
+        self._closed = False
+        self.dropped_entries = 0
+        self.flushed_entries = 0
+        self.failed_entries = 0
+        self.flushed_batches = 0
+
+        self._thread = threading.Thread(
+            target=self._run, name="batched-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def log_struct(self, info: dict[str, Any], **kw: Any) -> bool:
+        """
+        Queue a structured entry for the next batch.
+
+        :param info: The entry payload
+        :param kw: Entry fields such as ``labels`` and ``severity``
+        :return: False if the entry was dropped instead of queued
+        """
+        with self._condition:
+            if self._closed:
+                self.dropped_entries += 1
+                return False
+            if len(self._queue) >= self.max_queue_size:
+                self.dropped_entries += 1
+                if self.drop_policy == "drop_newest":
+                    return False
+                self._queue.popleft()
+            self._queue.append((info, kw))
+            if len(self._queue) >= self.max_batch_size:
+                self._condition.notify_all()
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Write every queued entry now.
+
+        :param timeout: Maximum seconds to wait, or None to wait indefinitely
+        :return: True if the queue was drained before the timeout
+        """
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(
+                lambda: not self._queue and not self._writing, timeout
+            )
+
+    def shutdown(self, timeout: float | None = 30.0) -> None:
+        """Flush the remaining entries and stop the flush thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict[str, int]:
+        """Return the writer's counters."""
+        with self._condition:
+            return {
+                "queued_entries": len(self._queue),
+                "flushed_entries": self.flushed_entries,
+                "flushed_batches": self.flushed_batches,
+                "dropped_entries": self.dropped_entries,
+                "failed_entries": self.failed_entries,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while (
+                    len(self._queue) < self.max_batch_size
+                    and not self._flush_requested
+                    and not self._closed
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if not self._queue:
+                    self._flush_requested = False
+                    self._condition.notify_all()
+                    if self._closed:
+                        return
+                    continue
+                count = min(len(self._queue), self.max_batch_size)
+                entries = [self._queue.popleft() for _ in range(count)]
+                self._writing = True
+
+            self._write(entries)
+
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+    def _write(self, entries: list[tuple[dict[str, Any], dict[str, Any]]]) -> None:
+        batch = self.logger.batch()
+        for info, kw in entries:
+            batch.log_struct(info, **kw)
+        try:
+            batch.commit()
+        except Exception:
+            logging.exception(f"Failed to write {len(entries)} log entries")
+            with self._condition:
+                self.failed_entries += len(entries)
+            return
+        with self._condition:
+            self.flushed_entries += len(entries)
+            self.flushed_batches += 1
@@ -0,0 +1,244 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import threading
+from collections import defaultdict
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from typing import Any
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    20.0,
+    30.0,
+    60.0,
+    120.0,
+)
+# Quantiles estimated from the histograms and served alongside them
+REPORTED_QUANTILES = (0.5, 0.95, 0.99)
+
+# ADK span names for each component, see google.adk.telemetry
+_AGENT_SPAN_PREFIX = "invoke_agent "
+_TOOL_SPAN_PREFIX = "execute_tool "
+# Marks spans of application phases, e.g. the steps of a tool call
+PHASE_ATTRIBUTE = "app.phase"
+
+
+@contextmanager
+def phase_span(name: str, tracer: trace.Tracer | None = None) -> Iterator[trace.Span]:
+    """
+    Trace the enclosed block as a span reported on /metrics as phase ``name``.
+
+    :param name: The phase name, e.g. "tts.synthesize"
+    :param tracer: Tracer to use, defaults to one of the global tracer provider
+    """
+    tracer = tracer or trace.get_tracer(__name__)
+    with tracer.start_as_current_span(name, attributes={PHASE_ATTRIBUTE: name}) as span:
+        yield span
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram with fixed bucket bounds."""
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.bounds = bounds
+        # One count per bound plus the +Inf bucket, not cumulative
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """
+        Record one latency.
+
+        :param seconds: The observed latency in seconds
+        """
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile by interpolating within its bucket.
+
+        Uses the same method as Prometheus' ``histogram_quantile``.
+
+        :param q: The quantile, between 0 and 1
+        :return: The estimated latency in seconds, or NaN without observations
+        """
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.bounds):
+                    # Values beyond the last bound are reported at that bound
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.bounds[-1]
+
+
+def classify_span(
+    name: str, attributes: Mapping[str, Any] | None
+) -> tuple[str, str] | None:
+    """
+    Name the component an ADK span measures.
+
+    :param name: The span name
+    :param attributes: The span attributes
+    :return: (component, name) where component is one of "invocation",
+        "agent", "sub_agent", "tool", "model" or "phase", or None for other spans
+    """
+    attributes = attributes or {}
+    if PHASE_ATTRIBUTE in attributes:
+        return "phase", str(attributes[PHASE_ATTRIBUTE])
+    if name == "invocation":
+        return "invocation", "invocation"
+    if name.startswith(_AGENT_SPAN_PREFIX):
+        agent = attributes.get("gen_ai.agent.name", name[len(_AGENT_SPAN_PREFIX) :])
+        return "agent", str(agent)
+    if name.startswith(_TOOL_SPAN_PREFIX) and name != "execute_tool (merged)":
+        tool = attributes.get("gen_ai.tool.name", name[len(_TOOL_SPAN_PREFIX) :])
+        if attributes.get("gen_ai.tool.type") == "AgentTool":
+            return "sub_agent", str(tool)
+        return "tool", str(tool)
+    if name == "call_llm":
+        return "model", str(attributes.get("gen_ai.request.model", "unknown"))
+    return None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if value == value else "NaN"
+
+
+class SpanMetricsProcessor(SpanProcessor):
+    """
+    Aggregates ADK spans into latency histograms and token counters.
+
+    Runs next to the exporting processor and sees every span, including the
+    ones tail sampling drops. ``render`` serves the aggregates in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """
+        Initialize the processor.
+
+        :param bounds: Upper bounds of the latency buckets, in seconds
+        """
+        self.bounds = bounds
+        self._histograms: dict[tuple[str, str], LatencyHistogram] = {}
+        self._tokens: defaultdict[tuple[str, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def on_end(self, span: ReadableSpan) -> None:
+        component = classify_span(span.name, span.attributes)
+        if component is None or span.start_time is None or span.end_time is None:
+            return
+        seconds = (span.end_time - span.start_time) / 1e9
+        attributes = span.attributes or {}
+        with self._lock:
+            histogram = self._histograms.get(component)
+            if histogram is None:
+                histogram = self._histograms[component] = LatencyHistogram(self.bounds)
+            histogram.observe(seconds)
+            if component[0] == "model":
+                for token_type in ("input", "output"):
+                    tokens = attributes.get(f"gen_ai.usage.{token_type}_tokens")
+                    if isinstance(tokens, int):
+                        self._tokens[(component[1], token_type)] += tokens
+
+    def quantiles(self, component: str, name: str) -> dict[str, float]:
+        """
+        Return the reported latency quantiles of one component.
+
+        :param component: The component kind, see ``classify_span``
+        :param name: The agent, tool or model name
+        :return: Latency in seconds keyed by "p50", "p95" and "p99"
+        """
+        with self._lock:
+            histogram = self._histograms.get((component, name))
+            return {
+                f"p{round(q * 100)}": histogram.quantile(q)
+                if histogram
+                else float("nan")
+                for q in REPORTED_QUANTILES
+            }
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP agent_span_latency_seconds Latency of ADK agents, tools and models.",
+            "# TYPE agent_span_latency_seconds histogram",
+        ]
+        quantile_lines = [
+            "# HELP agent_span_latency_quantile_seconds Latency quantiles estimated "
+            "from agent_span_latency_seconds.",
+            "# TYPE agent_span_latency_quantile_seconds gauge",
+        ]
+        with self._lock:
+            for (component, name), histogram in sorted(self._histograms.items()):
+                labels = f'component="{component}",name="{_escape(name)}"'
+                cumulative = 0
+                for bound, bucket_count in zip(
+                    (*histogram.bounds, float("inf")), histogram.counts, strict=True
+                ):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else _format(bound)
+                    lines.append(
+                        f'agent_span_latency_seconds_bucket{{{labels},le="{le}"}} '
+                        f"{cumulative}"
+                    )
+                lines.append(
+                    f"agent_span_latency_seconds_sum{{{labels}}} {_format(histogram.sum)}"
+                )
+                lines.append(
+                    f"agent_span_latency_seconds_count{{{labels}}} {histogram.count}"
+                )
+                quantile_lines.extend(
+                    f'agent_span_latency_quantile_seconds{{{labels},quantile="{q}"}} '
+                    f"{_format(histogram.quantile(q))}"
+                    for q in REPORTED_QUANTILES
+                )
+            token_lines = [
+                "# HELP agent_model_tokens_total Tokens used per model.",
+                "# TYPE agent_model_tokens_total counter",
+            ] + [
+                f'agent_model_tokens_total{{model="{_escape(model)}",type="{token_type}"}} '
+                f"{tokens}"
+                for (model, token_type), tokens in sorted(self._tokens.items())
+            ]
+        return "\n".join(lines + quantile_lines + token_lines) + "\n"
@@ -0,0 +1,322 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from google.adk.agents import BaseAgent
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session
+from google.adk.sessions.base_session_service import (
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.tools.agent_tool import AgentTool
+from google.genai import types
+
+if TYPE_CHECKING:
+    from google.adk.artifacts import BaseArtifactService
+
+# Player message that starts the "new session" flow of the root agent
+OPENING_PROMPT = "I'm ready. Let's begin the adventure!"
+# File remembering the generated opening across restarts
+OPENING_CACHE_ENV = "OPENING_SCENE_CACHE_FILE"
+DEFAULT_OPENING_CACHE = ".opening_scene_cache.json"
+
+
+def agent_fingerprint(agent: BaseAgent, prompt: str = OPENING_PROMPT) -> str:
+    """
+    Hash everything the opening scene depends on.
+
+    Covers the names, models and instructions of the agent and of every agent
+    it can call, so editing the module or a prompt invalidates cached openings.
+
+    :param agent: The root agent
+    :param prompt: The opening player message
+    :return: Hex digest identifying the opening
+    """
+    digest = hashlib.sha256(prompt.encode())
+    pending = [agent]
+    while pending:
+        current = pending.pop()
+        digest.update(current.name.encode())
+        for field in ("model", "instruction"):
+            value = getattr(current, field, None)
+            if isinstance(value, str):
+                digest.update(value.encode())
+        pending.extend(current.sub_agents)
+        pending.extend(
+            tool.agent
+            for tool in getattr(current, "tools", [])
+            if isinstance(tool, AgentTool)
+        )
+    return digest.hexdigest()
+
+
+def _fresh_copy(
+    event: Event, invocation_id: str, artifact_versions: dict[str, int]
+) -> Event:
+    """Copy an opening event for a new session, leaving its state behind."""
+    # State changes belong to the warm-up session, e.g. its seed; artifacts
+    # point at the copies saved in the new session
+    artifact_delta = {
+        filename: artifact_versions[filename]
+        for filename in event.actions.artifact_delta
+        if filename in artifact_versions
+    }
+    actions = event.actions.model_copy(
+        update={"state_delta": {}, "artifact_delta": artifact_delta}
+    )
+    return event.model_copy(
+        update={
+            "id": Event.new_id(),
+            "invocation_id": invocation_id,
+            "timestamp": time.time(),
+            "actions": actions,
+        }
+    )
+
+
+@dataclass
+class _Opening:
+    events: list[Event]
+    # Latest version of every artifact the opening saved, by filename
+    artifacts: dict[str, types.Part]
+
+
+class OpeningSceneSessionService(BaseSessionService):
+    """
+    Starts every new session with a pre-generated opening scene.
+
+    The opening, i.e. the character introduction and first scene the root agent
+    produces for a new session, is the same for every player of the module. It
+    is generated once, cached in memory and on disk, and copied into each new
+    session together with the image and audio artifacts it produced, so a
+    player's first message continues the story instead of waiting for the
+    character and storyteller agents. Sessions created before the opening is
+    ready start with the regular new session flow.
+    """
+
+    def __init__(
+        self,
+        inner: BaseSessionService,
+        agent: BaseAgent,
+        app_name: str,
+        cache_file: str | os.PathLike[str] | None = None,
+        prompt: str = OPENING_PROMPT,
+        artifact_service: "BaseArtifactService | None" = None,
+    ) -> None:
+        """
+        Initialize the service.
+
+        :param inner: Session service storing the sessions
+        :param agent: Root agent that generates the opening
+        :param app_name: App whose new sessions get the opening
+        :param cache_file: Opening cache path, defaults to
+            OPENING_SCENE_CACHE_FILE or .opening_scene_cache.json
+        :param prompt: Player message that starts the opening
+        :param artifact_service: Artifact service of the new sessions; without
+            it the opening's images and audio are not copied
+        """
+        self.inner = inner
+        self.agent = agent
+        self.app_name = app_name
+        self.prompt = prompt
+        self.artifact_service = artifact_service
+        self.cache_path = Path(
+            cache_file or os.environ.get(OPENING_CACHE_ENV, DEFAULT_OPENING_CACHE)
+        )
+        self.fingerprint = agent_fingerprint(agent, prompt)
+        self._warming: asyncio.Task[_Opening | None] | None = None
+
+    def warm(self) -> "asyncio.Task[_Opening | None]":
+        """
+        Start loading or generating the opening in the background.
+
+        :return: Task resolving to the opening, or None if it failed
+        """
+        if self._warming is None:
+            self._warming = asyncio.get_running_loop().create_task(self._load())
+        return self._warming
+
+    def opening(self) -> "_Opening | None":
+        """Return the opening if it is ready, starting warm-up otherwise."""
+        warming = self.warm()
+        if not warming.done():
+            # Generating takes several agent calls; never make a player wait
+            return None
+        opening = warming.result()
+        if opening is None:
+            # The last attempt failed: retry in the background
+            self._warming = None
+            self.warm()
+        return opening
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: dict[str, Any] | None = None,
+        session_id: str | None = None,
+        **kwargs: Any,
+    ) -> Session:
+        session = await self.inner.create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        if app_name != self.app_name:
+            return session
+        opening = self.opening()
+        if opening is None:
+            return session
+        artifact_versions: dict[str, int] = {}
+        if self.artifact_service is not None:
+            # Independent writes, e.g. to GCS, so they run side by side
+            versions = await asyncio.gather(
+                *(
+                    self.artifact_service.save_artifact(
+                        app_name=app_name,
+                        user_id=user_id,
+                        session_id=session.id,
+                        filename=filename,
+                        artifact=artifact,
+                    )
+                    for filename, artifact in opening.artifacts.items()
+                )
+            )
+            artifact_versions = dict(zip(opening.artifacts, versions, strict=True))
+        # Appended one by one: events must stay in order
+        invocation_id = f"e-{uuid.uuid4()}"
+        for event in opening.events:
+            await self.inner.append_event(
+                session, _fresh_copy(event, invocation_id, artifact_versions)
+            )
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: GetSessionConfig | None = None,
+    ) -> Session | None:
+        return await self.inner.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: str | None = None
+    ) -> ListSessionsResponse:
+        return await self.inner.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        await self.inner.delete_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        return await self.inner.append_event(session, event)
+
+    async def _load(self) -> "_Opening | None":
+        try:
+            cached = json.loads(self.cache_path.read_text())
+            if cached.get("fingerprint") == self.fingerprint and "artifacts" in cached:
+                return _Opening(
+                    [Event.model_validate(event) for event in cached["events"]],
+                    {
+                        filename: types.Part.model_validate(artifact)
+                        for filename, artifact in cached["artifacts"].items()
+                    },
+                )
+        except (OSError, ValueError):
+            pass
+
+        start = time.monotonic()
+        try:
+            opening = await self._generate()
+        except Exception:
+            logging.exception("Failed to generate the opening scene")
+            return None
+        logging.info(f"Generated the opening scene in {time.monotonic() - start:.1f}s")
+        try:
+            self.cache_path.write_text(
+                json.dumps(
+                    {
+                        "fingerprint": self.fingerprint,
+                        "events": [
+                            event.model_dump(mode="json", exclude_none=True)
+                            for event in opening.events
+                        ],
+                        "artifacts": {
+                            filename: artifact.model_dump(
+                                mode="json", exclude_none=True
+                            )
+                            for filename, artifact in opening.artifacts.items()
+                        },
+                    }
+                )
+            )
+        except OSError:
+            logging.warning(f"Could not cache the opening scene in {self.cache_path}")
+        return opening
+
+    async def _generate(self) -> "_Opening":
+        from google.adk.artifacts import InMemoryArtifactService
+        from google.adk.runners import Runner
+
+        sessions = InMemorySessionService()
+        artifacts = InMemoryArtifactService()
+        runner = Runner(
+            app_name=self.app_name,
+            agent=self.agent,
+            session_service=sessions,
+            artifact_service=artifacts,
+        )
+        session = await sessions.create_session(
+            app_name=self.app_name, user_id="opening-scene"
+        )
+        message = types.Content(role="user", parts=[types.Part(text=self.prompt)])
+        async for _ in runner.run_async(
+            user_id=session.user_id, session_id=session.id, new_message=message
+        ):
+            pass
+        session = await sessions.get_session(
+            app_name=self.app_name, user_id=session.user_id, session_id=session.id
+        )
+        assert session is not None
+        # The illustration and narration the opening events refer to
+        saved = {}
+        for filename in await artifacts.list_artifact_keys(
+            app_name=self.app_name, user_id=session.user_id, session_id=session.id
+        ):
+            artifact = await artifacts.load_artifact(
+                app_name=self.app_name,
+                user_id=session.user_id,
+                session_id=session.id,
+                filename=filename,
+            )
+            if artifact is not None:
+                saved[filename] = artifact
+        return _Opening(session.events, saved)
@@ -0,0 +1,236 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Literal
+
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.trace import StatusCode
+
+AttributeMode = Literal["truncate", "hash", "keep"]
+
+# Trace ids are compared against the sample rate using their low 64 bits
+_TRACE_ID_LIMIT = 1 << 64
+
+
+def trim_attribute(value: str, max_chars: int, mode: AttributeMode) -> str:
+    """
+    Shorten a string attribute value that is longer than ``max_chars``.
+
+    :param value: The attribute value
+    :param max_chars: Longest value kept as is
+    :param mode: "truncate" keeps the first ``max_chars`` characters, "hash"
+        replaces the value with its SHA-256, "keep" leaves it untouched
+    :return: The value to export
+    """
+    if mode == "keep" or len(value) <= max_chars:
+        return value
+    if mode == "hash":
+        digest = hashlib.sha256(value.encode()).hexdigest()
+        return f"sha256:{digest} ({len(value)} chars)"
+    return f"{value[:max_chars]}... [truncated {len(value) - max_chars} chars]"
+
+
+def trim_span(span: ReadableSpan, max_chars: int, mode: AttributeMode) -> ReadableSpan:
+    """
+    Return a copy of a finished span with its long string attributes trimmed.
+
+    :param span: The finished span
+    :param max_chars: Longest attribute value kept as is
+    :param mode: How long values are shortened, see ``trim_attribute``
+    :return: The span itself if nothing needed trimming, else a trimmed copy
+    """
+    attributes = span.attributes or {}
+    if mode == "keep" or not any(
+        isinstance(value, str) and len(value) > max_chars
+        for value in attributes.values()
+    ):
+        return span
+    trimmed = {
+        key: trim_attribute(value, max_chars, mode) if isinstance(value, str) else value
+        for key, value in attributes.items()
+    }
+    return ReadableSpan(
+        name=span.name,
+        context=span.context,
+        parent=span.parent,
+        resource=span.resource,
+        attributes=trimmed,
+        events=span.events,
+        links=span.links,
+        kind=span.kind,
+        status=span.status,
+        start_time=span.start_time,
+        end_time=span.end_time,
+        instrumentation_scope=span.instrumentation_scope,
+    )
+
+
+class _BufferedTrace:
+    __slots__ = ("first_seen", "spans")
+
+    def __init__(self) -> None:
+        self.first_seen = time.monotonic()
+        self.spans: list[ReadableSpan] = []
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """
+    Decides whether to export a trace once its root span has ended.
+
+    Finished spans are held per trace until the local root span ends. Traces
+    that contain an error or whose root took at least ``slow_threshold_ms``
+    are always exported in full. Other traces are exported with probability
+    ``sample_rate``, decided from the trace id so that every process agrees,
+    and their long string attributes (LLM requests and responses, tool
+    arguments) are trimmed. Exported spans are passed on to ``delegate``,
+    typically a BatchSpanProcessor wrapping CloudTraceLoggingSpanExporter.
+    """
+
+    def __init__(
+        self,
+        delegate: SpanProcessor,
+        sample_rate: float = 0.1,
+        slow_threshold_ms: float = 10_000,
+        max_attribute_chars: int = 4096,
+        attribute_mode: AttributeMode = "truncate",
+        max_buffered_traces: int = 1024,
+        trace_timeout: float = 300.0,
+    ) -> None:
+        """
+        Initialize the processor.
+
+        :param delegate: Processor that receives the spans of kept traces
+        :param sample_rate: Fraction of healthy, fast traces to export
+        :param slow_threshold_ms: Root span duration above which a trace is kept
+        :param max_attribute_chars: Longest string attribute exported as is
+            from sampled healthy traces
+        :param attribute_mode: How longer attributes are shortened
+        :param max_buffered_traces: Traces held while waiting for their root
+        :param trace_timeout: Seconds after which an unfinished trace is decided
+            with the spans received so far
+        """
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("Sample rate must be between 0 and 1")
+        if attribute_mode not in ("truncate", "hash", "keep"):
+            raise ValueError(f"Unknown attribute mode: {attribute_mode}")
+        self.delegate = delegate
+        self.sample_rate = sample_rate
+        self.slow_threshold_ns = int(slow_threshold_ms * 1_000_000)
+        self.max_attribute_chars = max_attribute_chars
+        self.attribute_mode = attribute_mode
+        self.max_buffered_traces = max_buffered_traces
+        self.trace_timeout = trace_timeout
+
+        self._traces: OrderedDict[int, _BufferedTrace] = OrderedDict()
+        self._lock = threading.Lock()
+        self.kept_traces = 0
+        self.sampled_out_traces = 0
+
+    @classmethod
+    def from_env(cls, delegate: SpanProcessor) -> "TailSamplingSpanProcessor":
+        """
+        Create a processor configured from ``TRACE_*`` environment variables.
+
+        TRACE_SAMPLE_RATE, TRACE_SLOW_THRESHOLD_MS, TRACE_MAX_ATTRIBUTE_CHARS and
+        TRACE_ATTRIBUTE_MODE override the constructor defaults.
+
+        :param delegate: Processor that receives the spans of kept traces
+        :return: The configured processor
+        """
+        return cls(
+            delegate,
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.1")),
+            slow_threshold_ms=float(os.getenv("TRACE_SLOW_THRESHOLD_MS", "10000")),
+            max_attribute_chars=int(os.getenv("TRACE_MAX_ATTRIBUTE_CHARS", "4096")),
+            attribute_mode=os.getenv("TRACE_ATTRIBUTE_MODE", "truncate"),  # type: ignore[arg-type]
+        )
+
+    def on_start(self, span: Span, parent_context: Context | None = None) -> None:
+        self.delegate.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan) -> None:
+        if span.context is None:
+            return
+        trace_id = span.context.trace_id
+        is_root = span.parent is None or span.parent.is_remote
+        finished: list[tuple[list[ReadableSpan], ReadableSpan | None]] = []
+        with self._lock:
+            buffered = self._traces.get(trace_id)
+            if buffered is None:
+                buffered = self._traces[trace_id] = _BufferedTrace()
+            buffered.spans.append(span)
+            if is_root:
+                del self._traces[trace_id]
+                finished.append((buffered.spans, span))
+            finished.extend((spans, None) for spans in self._evict())
+        for spans, root in finished:
+            self._decide(spans, root)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pending = [trace.spans for trace in self._traces.values()]
+            self._traces.clear()
+        for spans in pending:
+            self._decide(spans, None)
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.delegate.force_flush(timeout_millis)
+
+    def _evict(self) -> list[list[ReadableSpan]]:
+        """Remove traces that are too old or beyond the buffer size."""
+        evicted = []
+        deadline = time.monotonic() - self.trace_timeout
+        while self._traces:
+            oldest = next(iter(self._traces.values()))
+            if (
+                len(self._traces) <= self.max_buffered_traces
+                and oldest.first_seen > deadline
+            ):
+                break
+            evicted.append(self._traces.popitem(last=False)[1].spans)
+        return evicted
+
+    def _decide(self, spans: list[ReadableSpan], root: ReadableSpan | None) -> None:
+        has_error = any(span.status.status_code is StatusCode.ERROR for span in spans)
+        is_slow = (
+            root is not None
+            and root.start_time is not None
+            and root.end_time is not None
+            and root.end_time - root.start_time >= self.slow_threshold_ns
+        )
+        if has_error or is_slow:
+            with self._lock:
+                self.kept_traces += 1
+            for span in spans:
+                self.delegate.on_end(span)
+            return
+
+        trace_id = spans[0].context.trace_id
+        if (trace_id % _TRACE_ID_LIMIT) >= self.sample_rate * _TRACE_ID_LIMIT:
+            with self._lock:
+                self.sampled_out_traces += 1
+            return
+        with self._lock:
+            self.kept_traces += 1
+        for span in spans:
+            self.delegate.on_end(
+                trim_span(span, self.max_attribute_chars, self.attribute_mode)
+            )
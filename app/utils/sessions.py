@@ -0,0 +1,355 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Any
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session
+from google.adk.sessions.base_session_service import (
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+
+if TYPE_CHECKING:
+    from google.adk.artifacts import BaseArtifactService
+
+SessionKey = tuple[str, str, str]
+# URI scheme the ADK web server resolves to the registered session service
+CUSTOM_SESSION_SCHEME = "app-sessions"
+CUSTOM_ARTIFACT_SCHEME = "app-artifacts"
+
+
+def create_session_service(uri: str, **kwargs: Any) -> BaseSessionService:
+    """
+    Create a session service the way the ADK web server does.
+
+    :param uri: Session service URI, e.g. agentengine://<name> or sqlite:///db
+    :param kwargs: Passed to the ADK session service factory, e.g. agents_dir
+    :return: The session service
+    """
+    # Imported here: google.adk.cli loads the whole ADK command line stack
+    from google.adk.cli.service_registry import get_service_registry
+
+    service = get_service_registry().create_session_service(uri, **kwargs)
+    if service is None:
+        raise ValueError(f"Unsupported session service URI: {uri}")
+    return service
+
+
+def register_session_service(service: BaseSessionService) -> str:
+    """
+    Make a session service instance available to get_fast_api_app.
+
+    :param service: The session service the ADK web server should use
+    :return: The URI to pass as session_service_uri
+    """
+    from google.adk.cli.service_registry import get_service_registry
+
+    get_service_registry().register_session_service(
+        CUSTOM_SESSION_SCHEME, lambda uri, **kwargs: service
+    )
+    return f"{CUSTOM_SESSION_SCHEME}://"
+
+
+def create_artifact_service(uri: str, **kwargs: Any) -> "BaseArtifactService":
+    """
+    Create an artifact service the way the ADK web server does.
+
+    :param uri: Artifact service URI, e.g. gs://<bucket> or memory://
+    :param kwargs: Passed to the ADK artifact service factory, e.g. agents_dir
+    :return: The artifact service
+    """
+    from google.adk.cli.service_registry import get_service_registry
+
+    service = get_service_registry().create_artifact_service(uri, **kwargs)
+    if service is None:
+        raise ValueError(f"Unsupported artifact service URI: {uri}")
+    return service
+
+
+def register_artifact_service(service: "BaseArtifactService") -> str:
+    """
+    Make an artifact service instance available to get_fast_api_app.
+
+    :param service: The artifact service the ADK web server should use
+    :return: The URI to pass as artifact_service_uri
+    """
+    from google.adk.cli.service_registry import get_service_registry
+
+    get_service_registry().register_artifact_service(
+        CUSTOM_ARTIFACT_SCHEME, lambda uri, **kwargs: service
+    )
+    return f"{CUSTOM_ARTIFACT_SCHEME}://"
+
+
+class WriteBehindSessionService(BaseSessionService):
+    """
+    Serves sessions from a local store and writes events to a remote one later.
+
+    Sessions are created on the remote service, which assigns their IDs, and
+    then mirrored locally. Reads and event appends only touch the local store;
+    appended events are queued and sent to the remote service by a background
+    task, in order per session and concurrently across sessions. A session
+    missing locally, e.g. after a restart, is reloaded from the remote service.
+    Once more than ``max_local_sessions`` are held locally, the least recently
+    used ones whose events have all been sent are evicted from the local store.
+    """
+
+    def __init__(
+        self,
+        remote: BaseSessionService,
+        local: BaseSessionService | None = None,
+        flush_interval: float = 0.5,
+        max_retries: int = 3,
+        max_local_sessions: int = 1024,
+    ) -> None:
+        """
+        Initialize the service.
+
+        :param remote: Durable session service, e.g. VertexAiSessionService
+        :param local: Session service holding hot sessions, in memory by default
+        :param flush_interval: Seconds appended events wait before being sent
+        :param max_retries: Attempts to send an event before it is dropped
+        :param max_local_sessions: Sessions kept in the local store before the
+            least recently used synced ones are evicted
+        """
+        self.remote = remote
+        self.local = local or InMemorySessionService()
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.max_local_sessions = max_local_sessions
+        self.flushed_events = 0
+        self.failed_events = 0
+        self.evicted_sessions = 0
+
+        self._pending: dict[SessionKey, deque[Event]] = {}
+        # Identity-only copies of each session, passed to the remote service
+        self._remote_sessions: dict[SessionKey, Session] = {}
+        # Sessions in the local store, least recently used first
+        self._local_sessions: OrderedDict[SessionKey, None] = OrderedDict()
+        # Events queued or being sent, per session; those sessions stay local
+        self._unsynced: dict[SessionKey, int] = {}
+        self._flush_lock: asyncio.Lock | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._flusher: asyncio.Task[None] | None = None
+
+    @classmethod
+    def from_uris(
+        cls, remote_uri: str, local_uri: str | None = None, **kwargs: Any
+    ) -> "WriteBehindSessionService":
+        """
+        Create the service from ADK session service URIs.
+
+        :param remote_uri: URI of the durable store, e.g. agentengine://<name>
+        :param local_uri: URI of the local store, e.g. sqlite:///sessions.db,
+            in memory when unset
+        :param kwargs: Passed to the ADK session service factories, e.g. agents_dir
+        :return: The write-behind session service
+        """
+        local = create_session_service(local_uri, **kwargs) if local_uri else None
+        return cls(create_session_service(remote_uri, **kwargs), local)
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: dict[str, Any] | None = None,
+        session_id: str | None = None,
+        **kwargs: Any,
+    ) -> Session:
+        remote_session = await self.remote.create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        session = await self.local.create_session(
+            app_name=app_name,
+            user_id=user_id,
+            state=remote_session.state,
+            session_id=remote_session.id,
+        )
+        await self._touch((app_name, user_id, session.id))
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: GetSessionConfig | None = None,
+    ) -> Session | None:
+        session = await self.local.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        if session is None:
+            if not await self._reload(app_name, user_id, session_id):
+                return None
+            session = await self.local.get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id, config=config
+            )
+        await self._touch((app_name, user_id, session_id))
+        return session
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: str | None = None
+    ) -> ListSessionsResponse:
+        # Sessions are created remotely first, so the remote list is complete
+        return await self.remote.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        key = (app_name, user_id, session_id)
+        self._pending.pop(key, None)
+        self._remote_sessions.pop(key, None)
+        self._local_sessions.pop(key, None)
+        self._unsynced.pop(key, None)
+        await self.local.delete_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+        await self.remote.delete_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        key = (session.app_name, session.user_id, session.id)
+        if not event.partial and key not in self._local_sessions:
+            # Evicted while its turn was running; bring the local copy back
+            if (
+                await self.local.get_session(
+                    app_name=key[0], user_id=key[1], session_id=key[2]
+                )
+                is None
+            ):
+                await self._reload(*key)
+        event = await self.local.append_event(session, event)
+        if event.partial:
+            return event
+        self._pending.setdefault(key, deque()).append(event)
+        self._unsynced[key] = self._unsynced.get(key, 0) + 1
+        self._ensure_flusher()
+        await self._touch(key)
+        return event
+
+    async def flush(self) -> None:
+        """Send every queued event to the remote service now."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            while self._pending:
+                pending, self._pending = self._pending, {}
+                await asyncio.gather(
+                    *(self._send(key, events) for key, events in pending.items())
+                )
+
+    async def close(self) -> None:
+        """Flush queued events and stop the background flush task."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        # Waits for a flush the flusher left running, then sends the rest
+        await self.flush()
+
+    def pending_events(self) -> int:
+        """Return the number of events not yet sent to the remote service."""
+        return sum(len(events) for events in self._pending.values())
+
+    def _ensure_flusher(self) -> None:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Lets events of the same turn accumulate into one flush
+            await asyncio.sleep(self.flush_interval)
+            try:
+                # Shielded so close() cannot cancel it with events taken off
+                # the queue but not yet sent
+                await asyncio.shield(self.flush())
+            except Exception:
+                logging.exception("Failed to flush session events")
+
+    async def _send(self, key: SessionKey, events: deque[Event]) -> None:
+        remote_session = self._remote_sessions.get(key)
+        if remote_session is None:
+            app_name, user_id, session_id = key
+            remote_session = self._remote_sessions[key] = Session(
+                id=session_id, app_name=app_name, user_id=user_id
+            )
+        for event in events:
+            for attempt in range(1, self.max_retries + 1):
+                try:
+                    await self.remote.append_event(remote_session, event)
+                    self.flushed_events += 1
+                    break
+                except Exception:
+                    if attempt == self.max_retries:
+                        logging.exception(
+                            f"Dropping event {event.id} of session {key[2]}"
+                        )
+                        self.failed_events += 1
+                    else:
+                        await asyncio.sleep(0.1 * 2**attempt)
+            self._mark_synced(key)
+        # Only the session identity is needed for later appends
+        remote_session.events.clear()
+        remote_session.state.clear()
+
+    def _mark_synced(self, key: SessionKey) -> None:
+        unsynced = self._unsynced.get(key, 0) - 1
+        if unsynced > 0:
+            self._unsynced[key] = unsynced
+        else:
+            self._unsynced.pop(key, None)
+
+    async def _touch(self, key: SessionKey) -> None:
+        """Mark a session as recently used, evicting old synced ones."""
+        self._local_sessions[key] = None
+        self._local_sessions.move_to_end(key)
+        for old_key in list(self._local_sessions):
+            if len(self._local_sessions) <= self.max_local_sessions:
+                break
+            if old_key == key or old_key in self._unsynced:
+                continue
+            del self._local_sessions[old_key]
+            app_name, user_id, session_id = old_key
+            await self.local.delete_session(
+                app_name=app_name, user_id=user_id, session_id=session_id
+            )
+            self.evicted_sessions += 1
+
+    async def _reload(self, app_name: str, user_id: str, session_id: str) -> bool:
+        remote_session = await self.remote.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+        if remote_session is None:
+            return False
+        local_session = await self.local.create_session(
+            app_name=app_name,
+            user_id=user_id,
+            state=remote_session.state,
+            session_id=session_id,
+        )
+        for event in remote_session.events:
+            await self.local.append_event(local_session, event)
+        return True
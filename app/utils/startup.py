@@ -0,0 +1,162 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import google.auth
+
+# Full Agent Engine resource name; skips the lookup entirely when set
+AGENT_ENGINE_RESOURCE_ENV = "AGENT_ENGINE_RESOURCE_NAME"
+# File remembering resolved resource names, keyed by project and display name
+AGENT_ENGINE_CACHE_ENV = "AGENT_ENGINE_CACHE_FILE"
+DEFAULT_AGENT_ENGINE_CACHE = ".agent_engine_cache.json"
+
+
+class StartupTimer:
+    """Records how long each server startup phase takes."""
+
+    def __init__(self, started_at: float | None = None) -> None:
+        """
+        Initialize the timer.
+
+        :param started_at: time.monotonic() value startup began at, e.g. when
+            the server module started importing
+        """
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.timings: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as the phase ``name``."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.monotonic() - start
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Record a phase timed elsewhere, e.g. in a worker thread.
+
+        :param name: The phase name
+        :param seconds: How long the phase took
+        """
+        self.timings[name] = seconds
+
+    def finish(self) -> float:
+        """Record and log the total startup time, returning it in seconds."""
+        self.timings["total"] = time.monotonic() - self.started_at
+        logging.info(
+            "Startup finished in %.2fs (%s)",
+            self.timings["total"],
+            ", ".join(
+                f"{name} {seconds:.2f}s"
+                for name, seconds in self.timings.items()
+                if name != "total"
+            ),
+        )
+        return self.timings["total"]
+
+    def render(self) -> str:
+        """Return the phase timings in the Prometheus text exposition format."""
+        lines = [
+            "# HELP app_startup_seconds Duration of each server startup phase.",
+            "# TYPE app_startup_seconds gauge",
+        ]
+        lines.extend(
+            f'app_startup_seconds{{phase="{name}"}} {seconds!r}'
+            for name, seconds in self.timings.items()
+        )
+        return "\n".join(lines) + "\n"
+
+
+def resolve_project_id() -> str:
+    """
+    Return the Google Cloud project, preferring GOOGLE_CLOUD_PROJECT.
+
+    Falls back to Application Default Credentials, which on Cloud Run queries
+    the metadata server, and exports the result for the agent modules.
+
+    :return: The project ID
+    """
+    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
+    if not project_id:
+        _, project_id = google.auth.default()
+        os.environ["GOOGLE_CLOUD_PROJECT"] = project_id
+    return project_id
+
+
+def _read_cache(cache_file: Path) -> dict[str, str]:
+    try:
+        return json.loads(cache_file.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def resolve_agent_engine(
+    display_name: str,
+    project_id: str,
+    cache_file: str | os.PathLike[str] | None = None,
+) -> str:
+    """
+    Return the resource name of the Agent Engine used for sessions.
+
+    Checked in order: the AGENT_ENGINE_RESOURCE_NAME environment variable, the
+    resource name cache file, then an Agent Engine lookup by display name that
+    creates the engine if none exists. Looked-up names are written to the
+    cache so later starts skip the network calls.
+
+    :param display_name: Display name of the Agent Engine
+    :param project_id: Project the Agent Engine belongs to
+    :param cache_file: Cache file path, defaults to AGENT_ENGINE_CACHE_FILE or
+        .agent_engine_cache.json
+    :return: The full Agent Engine resource name
+    """
+    resource_name = os.environ.get(AGENT_ENGINE_RESOURCE_ENV)
+    if resource_name:
+        return resource_name
+
+    cache_path = Path(
+        cache_file or os.environ.get(AGENT_ENGINE_CACHE_ENV, DEFAULT_AGENT_ENGINE_CACHE)
+    )
+    cache = _read_cache(cache_path)
+    # Engines with the same display name in another project must not be reused
+    cache_key = f"{project_id}/{display_name}"
+    if cache_key in cache:
+        return cache[cache_key]
+
+    import vertexai
+    from vertexai import agent_engines
+
+    vertexai.init(project=project_id)
+
+    existing_agents = list(agent_engines.list(filter=f"display_name={display_name}"))
+    if existing_agents:
+        agent_engine = existing_agents[0]
+    else:
+        agent_engine = agent_engines.create(display_name=display_name)
+    resource_name = agent_engine.resource_name
+
+    cache[cache_key] = resource_name
+    try:
+        cache_path.write_text(json.dumps(cache, indent=2))
+    except OSError:
+        logging.warning(f"Could not cache Agent Engine name in {cache_path}")
+    return resource_name
@@ -12,16 +12,153 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import gzip
+import hashlib
 import json
 import logging
+import threading
+import time
+from collections import OrderedDict
 from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from typing import Any
 
 import google.cloud.storage as storage
+from google.api_core import exceptions
 from google.cloud import logging as google_cloud_logging
 from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+from opentelemetry.sdk import util
 from opentelemetry.sdk.trace import ReadableSpan
 from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.trace import SpanContext, format_span_id, format_trace_id
+from opentelemetry.util.types import Attributes
+
+from app.utils.log_batching import BatchedLogWriter, DropPolicy
+
+# Cloud Logging rejects entries above 256 KB, so larger attributes go to GCS
+MAX_LOGGED_ATTRIBUTES_BYTES = 255 * 1024
+# How long a missing bucket is remembered before checking for it again
+BUCKET_RECHECK_SECONDS = 300
+# Number of offloaded content hashes remembered as already uploaded
+MAX_REMEMBERED_UPLOADS = 4096
+
+
+def _format_context(context: SpanContext) -> dict[str, str]:
+    return {
+        "trace_id": f"0x{format_trace_id(context.trace_id)}",
+        "span_id": f"0x{format_span_id(context.span_id)}",
+        "trace_state": repr(context.trace_state),
+    }
+
+
+def _format_attributes(attributes: Attributes) -> dict[str, Any]:
+    # Sequence attribute values are tuples; log entries need JSON lists
+    return {
+        key: list(value) if isinstance(value, tuple) else value
+        for key, value in (attributes or {}).items()
+    }
+
+
+def span_to_dict(span: ReadableSpan) -> dict[str, Any]:
+    """
+    Build the JSON-compatible dictionary of a span directly from its fields.
+
+    Produces the same structure as ``json.loads(span.to_json())`` without
+    serializing the span and parsing it back.
+
+    :param span: The finished span
+    :return: The span data dictionary
+    """
+    status = {"status_code": span.status.status_code.name}
+    if span.status.description:
+        status["description"] = span.status.description
+    return {
+        "name": span.name,
+        "context": _format_context(span.context) if span.context else None,
+        "kind": str(span.kind),
+        "parent_id": f"0x{format_span_id(span.parent.span_id)}"
+        if span.parent is not None
+        else None,
+        "start_time": util.ns_to_iso_str(span.start_time) if span.start_time else None,
+        "end_time": util.ns_to_iso_str(span.end_time) if span.end_time else None,
+        "status": status,
+        "attributes": _format_attributes(span.attributes),
+        "events": [
+            {
+                "name": event.name,
+                "timestamp": util.ns_to_iso_str(event.timestamp),
+                "attributes": _format_attributes(event.attributes),
+            }
+            for event in span.events
+        ],
+        "links": [
+            {
+                "context": _format_context(link.context),
+                "attributes": _format_attributes(link.attributes),
+            }
+            for link in span.links
+        ],
+        "resource": {
+            "attributes": _format_attributes(span.resource.attributes),
+            "schema_url": span.resource.schema_url,
+        },
+    }
+
+
+class EncodedAttributes:
+    """
+    JSON encodings of a span's attributes, each produced exactly once.
+
+    The encoded size of the whole attribute object is kept as a running total,
+    so deciding what to offload and writing the offloaded values reuse the
+    same per-attribute encodings instead of dumping the dictionary again.
+    """
+
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        # Size of "{}" for the empty object
+        self.size = 2
+
+    @classmethod
+    def from_attributes(cls, attributes: dict[str, Any]) -> "EncodedAttributes":
+        """
+        Encode every attribute of a span.
+
+        :param attributes: The span attributes
+        :return: The encoded attributes
+        """
+        encoded = cls()
+        for key, value in attributes.items():
+            encoded.add(key, value)
+        return encoded
+
+    def add(self, key: str, value: Any) -> None:
+        """
+        Encode one attribute and add its size to the running total.
+
+        :param key: The attribute name
+        :param value: The attribute value
+        """
+        # ensure_ascii (the default) makes the character count the byte count
+        encoded_value = json.dumps(value)
+        previous = self.values.get(key)
+        if previous is not None:
+            self.size += len(encoded_value) - len(previous)
+        else:
+            # '"key": value', preceded by ", " for every attribute but the first
+            self.size += len(json.dumps(key)) + 2 + len(encoded_value)
+            self.size += 2 if self.values else 0
+        self.values[key] = encoded_value
+
+    def to_json(self) -> str:
+        """Return the attributes object as JSON, formatted like ``json.dumps``."""
+        return (
+            "{"
+            + ", ".join(
+                f"{json.dumps(key)}: {value}" for key, value in self.values.items()
+            )
+            + "}"
+        )
 
 
 class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
@@ -39,6 +176,11 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         storage_client: storage.Client | None = None,
         bucket_name: str | None = None,
         debug: bool = False,
+        max_batch_size: int = 32,
+        flush_interval: float = 5.0,
+        max_queue_size: int = 2048,
+        drop_policy: DropPolicy = "drop_oldest",
+        upload_workers: int = 4,
         **kwargs: Any,
     ) -> None:
         """
@@ -48,6 +190,11 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :param storage_client: Google Cloud Storage client
         :param bucket_name: Name of the GCS bucket to store large payloads
         :param debug: Enable debug mode for additional logging
+        :param max_batch_size: Maximum span entries per Cloud Logging write
+        :param flush_interval: Maximum seconds a span entry waits before being written
+        :param max_queue_size: Maximum span entries held in memory awaiting a write
+        :param drop_policy: Whether to drop the oldest or the newest entry when full
+        :param upload_workers: Number of threads uploading offloaded attributes to GCS
         :param kwargs: Additional arguments to pass to the parent class
         """
         super().__init__(**kwargs)
@@ -56,11 +203,25 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             project=self.project_id
         )
         self.logger = self.logging_client.logger(__name__)
-        self.storage_client = storage_client or storage.Client(project=self.project_id)
-        self.bucket_name = (
-            bucket_name or f"{self.project_id}-test-logs"
+        self.log_writer = BatchedLogWriter(
+            self.logger,
+            max_batch_size=max_batch_size,
+            flush_interval=flush_interval,
+            max_queue_size=max_queue_size,
+            drop_policy=drop_policy,
         )
+        self.storage_client = storage_client or storage.Client(project=self.project_id)
+        self.bucket_name = bucket_name or f"{self.project_id}-test-logs"
         self.bucket = self.storage_client.bucket(self.bucket_name)
+        self._bucket_exists = False
+        self._bucket_checked_at: float | None = None
+        self._upload_lock = threading.Lock()
+        # Content hashes already uploaded or being uploaded, oldest first
+        self._uploaded: OrderedDict[str, None] = OrderedDict()
+        self._uploads: set[Future[None]] = set()
+        self._upload_executor = ThreadPoolExecutor(
+            max_workers=upload_workers, thread_name_prefix="span-offload"
+        )
 
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         """
@@ -73,7 +234,7 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             span_context = span.get_span_context()
             trace_id = format(span_context.trace_id, "x")
             span_id = format(span_context.span_id, "x")
-            span_dict = json.loads(span.to_json())
+            span_dict = span_to_dict(span)
 
             span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
             span_dict["span_id"] = span_id
@@ -85,8 +246,8 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             if self.debug:
                 print(span_dict)
 
-            # Log the span data to Google Cloud Logging
-            self.logger.log_struct(
+            # Queue the span data for a bulk write to Google Cloud Logging
+            self.log_writer.log_struct(
                 span_dict,
                 labels={
                     "type": "agent_telemetry",
@@ -97,55 +258,137 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         # Export spans to Google Cloud Trace using the parent class method
         return super().export(spans)
 
-    def store_in_gcs(self, content: str, span_id: str) -> str:
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
         """
-        Initiate storing large content in Google Cloud Storage/
+        Finish pending GCS uploads and write all queued span entries to Google
+        Cloud Logging.
+
+        :param timeout_millis: Maximum time to wait in milliseconds
+        :return: True if every upload and queued entry finished in time
+        """
+        deadline = time.monotonic() + timeout_millis / 1000
+        with self._upload_lock:
+            uploads = list(self._uploads)
+        _, pending = wait(uploads, timeout=timeout_millis / 1000)
+        flushed = self.log_writer.flush(max(deadline - time.monotonic(), 0))
+        return flushed and not pending
+
+    def shutdown(self) -> None:
+        """Finish pending uploads, flush queued span entries and shut down."""
+        self._upload_executor.shutdown(wait=True)
+        self.log_writer.shutdown()
+        super().shutdown()
+
+    def bucket_exists(self) -> bool:
+        """
+        Check whether the offload bucket exists, caching the answer.
+
+        A bucket that exists is never checked again. A missing bucket is
+        rechecked after ``BUCKET_RECHECK_SECONDS`` in case it gets created.
 
-        :param content: The content to store
-        :param span_id: The ID of the span
-        :return: The  GCS URI of the stored content
+        :return: Whether the bucket exists
         """
-        if not self.storage_client.bucket(self.bucket_name).exists():
+        now = time.monotonic()
+        if self._bucket_exists or (
+            self._bucket_checked_at is not None
+            and now - self._bucket_checked_at < BUCKET_RECHECK_SECONDS
+        ):
+            return self._bucket_exists
+        self._bucket_exists = self.bucket.exists()
+        self._bucket_checked_at = now
+        if not self._bucket_exists:
             logging.warning(
                 f"Bucket {self.bucket_name} not found. "
                 "Unable to store span attributes in GCS."
             )
+        return self._bucket_exists
+
+    def store_in_gcs(self, content: str) -> str:
+        """
+        Store an attribute value in Google Cloud Storage, keyed by its content.
+
+        The blob name is the SHA-256 of the content, so identical values such
+        as the agent instructions are uploaded only once. The upload itself,
+        including gzip compression, runs on a background thread.
+
+        :param content: The JSON-encoded attribute value
+        :return: The GCS URI the content is stored at
+        """
+        if not self.bucket_exists():
             return "GCS bucket not found"
 
-        blob_name = f"spans/{span_id}.json"
+        data = content.encode()
+        blob_name = f"spans/attributes/{hashlib.sha256(data).hexdigest()}.json"
+        upload = None
+        with self._upload_lock:
+            if blob_name in self._uploaded:
+                self._uploaded.move_to_end(blob_name)
+            else:
+                self._uploaded[blob_name] = None
+                if len(self._uploaded) > MAX_REMEMBERED_UPLOADS:
+                    self._uploaded.popitem(last=False)
+                upload = self._upload_executor.submit(self._upload, blob_name, data)
+                self._uploads.add(upload)
+        if upload is not None:
+            # Registered outside the lock: it runs at once if already finished
+            upload.add_done_callback(self._upload_done)
+        return f"gs://{self.bucket_name}/{blob_name}"
+
+    def _upload(self, blob_name: str, data: bytes) -> None:
         blob = self.bucket.blob(blob_name)
+        # Served decompressed to clients that do not accept gzip
+        blob.content_encoding = "gzip"
+        try:
+            blob.upload_from_string(
+                gzip.compress(data),
+                content_type="application/json",
+                # Only create the blob; identical content may already be stored
+                if_generation_match=0,
+            )
+        except exceptions.PreconditionFailed:
+            pass
+        except Exception:
+            logging.exception(f"Failed to upload span attribute {blob_name}")
+            with self._upload_lock:
+                self._uploaded.pop(blob_name, None)
 
-        blob.upload_from_string(content, "application/json")
-        return f"gs://{self.bucket_name}/{blob_name}"
+    def _upload_done(self, upload: Future[None]) -> None:
+        with self._upload_lock:
+            self._uploads.discard(upload)
 
     def _process_large_attributes(self, span_dict: dict, span_id: str) -> dict:
         """
         Process large attribute values by storing them in GCS if they exceed the size
         limit of Google Cloud Logging.
 
+        The largest attributes are offloaded one by one until the rest fit.
+        Each offloaded value is replaced by its GCS URI and its key is listed
+        under ``offloaded_attributes``.
+
         :param span_dict: The span data dictionary
-        :param trace_id: The trace ID
         :param span_id: The span ID
         :return: The updated span dictionary
         """
         attributes = span_dict["attributes"]
-        if len(json.dumps(attributes).encode()) > 255 * 1024:  # 250 KB
-            # Separate large payload from other attributes
-            attributes_payload = dict(attributes.items())
+        encoded = EncodedAttributes.from_attributes(attributes)
+        if encoded.size > MAX_LOGGED_ATTRIBUTES_BYTES:
             attributes_retain = dict(attributes.items())
-
-            # Store large payload in GCS
-            gcs_uri = self.store_in_gcs(json.dumps(attributes_payload), span_id)
-            attributes_retain["uri_payload"] = gcs_uri
-            attributes_retain["url_payload"] = (
-                f"https://storage.mtls.cloud.google.com/"
-                f"{self.bucket_name}/spans/{span_id}.json"
-            )
+            offloaded = []
+            for key in sorted(
+                encoded.values, key=lambda key: len(encoded.values[key]), reverse=True
+            ):
+                if encoded.size <= MAX_LOGGED_ATTRIBUTES_BYTES:
+                    break
+                gcs_uri = self.store_in_gcs(encoded.values[key])
+                attributes_retain[key] = gcs_uri
+                encoded.add(key, gcs_uri)
+                offloaded.append(key)
+            attributes_retain["offloaded_attributes"] = offloaded
 
             span_dict["attributes"] = attributes_retain
             logging.info(
-                "Length of payload span above 250 KB, storing attributes in GCS "
-                "to avoid large log entry errors"
+                f"Span {span_id} attributes above 250 KB, storing {len(offloaded)} "
+                "of them in GCS to avoid large log entry errors"
             )
 
         return span_dict
@@ -0,0 +1,111 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Micro-benchmarks for the dice hot paths.
+
+Run with `make benchmark`; results are saved as JSON under
+tests/benchmark/.results and compared against the previous run.
+"""
+
+import json
+from typing import Any
+
+import pytest
+
+from app.utils.dice import (
+    _compile_normalized,
+    _odds,
+    roll_dice,
+    roll_dice_batch,
+    roll_dice_expression,
+    roll_multiple_dice,
+    roll_single_die,
+)
+
+# From a single check up to a fireball-storm sized pool
+EXPRESSIONS = [
+    "1d20",
+    "1d20+5 adv",
+    "2d6+3",
+    "8d6",
+    "4d6kh3",
+    "2d6+1d4+3",
+    "100d6",
+    "1000d6",
+    "1000d6 adv",
+]
+# Argument tuples for roll_multiple_dice
+DICE_POOLS = [
+    (1, 20, 0, False),
+    (2, 6, 3, False),
+    (8, 6, 0, False),
+    (100, 6, 0, False),
+    (1000, 6, 0, False),
+    (1000, 6, 0, True),
+]
+
+
+def _pool_id(pool: tuple[int, int, int, bool]) -> str:
+    num_dice, dice_type, modifier, advantage = pool
+    return f"{num_dice}d{dice_type}{f'+{modifier}' if modifier else ''}{' adv' if advantage else ''}"
+
+
+@pytest.mark.parametrize("dice_type", [4, 6, 8, 10, 12, 20, 100])
+def test_roll_single_die(benchmark: Any, dice_type: int) -> None:
+    """A single die, the baseline cost of one roll."""
+    benchmark(roll_single_die, dice_type, 2)
+
+
+@pytest.mark.parametrize("pool", DICE_POOLS, ids=_pool_id)
+def test_roll_multiple_dice(benchmark: Any, pool: tuple[int, int, int, bool]) -> None:
+    """A pool of identical dice, including building the RollResult."""
+    benchmark(roll_multiple_dice, *pool)
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_roll_dice_expression(benchmark: Any, expression: str) -> None:
+    """Parsing (cached after the first call) plus rolling an expression."""
+    benchmark(roll_dice_expression, expression)
+
+
+@pytest.mark.parametrize("expression", EXPRESSIONS)
+def test_roll_dice_tool_serialization(benchmark: Any, expression: str) -> None:
+    """The roll_dice tool end to end, serialized as the model will receive it."""
+
+    def roll_and_serialize() -> str:
+        return json.dumps(roll_dice(expression, None))  # type: ignore[arg-type]
+
+    benchmark(roll_and_serialize)
+
+
+@pytest.mark.parametrize("expression", ["1d20+5", "4d6kh3", "1000d6 adv"])
+def test_compile_dice_expression_uncached(benchmark: Any, expression: str) -> None:
+    """Parsing cost on a cache miss."""
+    benchmark(_compile_normalized.__wrapped__, expression)
+
+
+@pytest.mark.parametrize("monsters", [1, 6, 20])
+def test_roll_dice_batch(benchmark: Any, monsters: int) -> None:
+    """One attack and one damage roll per monster in a single tool call."""
+    rolls = []
+    for number in range(monsters):
+        rolls.append({"label": f"goblin {number} attack", "expression": "1d20+4"})
+        rolls.append({"label": f"goblin {number} damage", "expression": "1d6+2"})
+    benchmark(roll_dice_batch, rolls, None)
+
+
+@pytest.mark.parametrize("expression", ["1d20+5 adv", "4d6kh3", "1000d6"])
+def test_dice_odds(benchmark: Any, expression: str) -> None:
+    """The dice_odds calculation with a warm distribution cache."""
+    benchmark(_odds, expression, 15)
@@ -0,0 +1,73 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Import-time budget for the agent package.
+
+Runs `python -X importtime -c "import app.agent"` in a fresh interpreter, checks that
+media, TTS and SDK modules only needed by tools are not loaded, and keeps the
+total import time under IMPORT_TIME_BUDGET_MS (default 5000).
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Loaded on first tool use instead of when the agents are imported. PIL is
+# not listed: google.genai, which ADK needs, already imports it.
+DEFERRED_MODULES = (
+    "google.cloud.texttospeech",
+    "vertexai.preview.vision_models",
+)
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "5000"))
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def _import_times(module: str) -> dict[str, int]:
+    """Return the cumulative import time in microseconds of every module loaded."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=REPO_ROOT,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_app_import_defers_tool_dependencies() -> None:
+    times = _import_times("app.agent")
+
+    loaded = [module for module in DEFERRED_MODULES if module in times]
+    assert not loaded, f"Imported eagerly: {loaded}"
+
+    total_ms = times["app.agent"] / 1000
+    heaviest = sorted(
+        (name for name in times if "." not in name and name != "app"),
+        key=times.__getitem__,
+        reverse=True,
+    )[:5]
+    print(
+        f"\nimport app.agent: {total_ms:.0f} ms (budget {IMPORT_TIME_BUDGET_MS:.0f} ms)"
+    )
+    for name in heaviest:
+        print(f"  {name}: {times[name] / 1000:.0f} ms")
+    assert total_ms <= IMPORT_TIME_BUDGET_MS
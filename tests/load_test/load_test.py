@@ -96,5 +96,16 @@ class ChatStreamUser(HttpUser):
                     response=response,
                     context={},
                 )
+            elif response.status_code == 429:
+                # Rejected by the server's admission control before the turn ran
+                response.success()
+                self.environment.events.request.fire(
+                    request_type="POST",
+                    name=f"{ENDPOINT} admission_rejected 429s",
+                    response_time=0,
+                    response_length=0,
+                    response=response,
+                    context={"retry_after": response.headers.get("Retry-After")},
+                )
             else:
                 response.failure(f"Unexpected status code: {response.status_code}")
@@ -0,0 +1,142 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from typing import Any
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from app.utils.admission import AdmissionController, AdmissionMiddleware, TurnRejected
+
+
+def test_one_turn_per_session() -> None:
+    async def scenario() -> None:
+        controller = AdmissionController(max_in_flight=4)
+        async with controller.turn("session-a"):
+            with pytest.raises(TurnRejected) as rejected:
+                async with controller.turn("session-a"):
+                    pass
+            assert rejected.value.reason == "session_busy"
+            async with controller.turn("session-b"):
+                assert controller.in_flight == 2
+        # The session is free again once its turn ends
+        async with controller.turn("session-a"):
+            pass
+
+    asyncio.run(scenario())
+
+
+def test_bounded_queue_rejects_early() -> None:
+    async def scenario() -> None:
+        controller = AdmissionController(max_in_flight=1, max_queued=1)
+        release = asyncio.Event()
+        order = []
+
+        async def run_turn(name: str) -> None:
+            async with controller.turn(name):
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.create_task(run_turn("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(run_turn("second"))
+        await asyncio.sleep(0)
+        assert (controller.in_flight, controller.queued) == (1, 1)
+
+        with pytest.raises(TurnRejected) as rejected:
+            async with controller.turn("third"):
+                pass
+        assert rejected.value.reason == "queue_full"
+        assert rejected.value.retry_after >= 1
+
+        release.set()
+        await asyncio.gather(first, second)
+        assert order == ["first", "second"]
+        assert controller.rejected_turns == {"queue_full": 1}
+
+    asyncio.run(scenario())
+
+
+def test_queued_turn_times_out() -> None:
+    async def scenario() -> None:
+        controller = AdmissionController(max_in_flight=1, queue_timeout=0.01)
+        async with controller.turn("first"):
+            with pytest.raises(TurnRejected) as rejected:
+                async with controller.turn("second"):
+                    pass
+        assert rejected.value.reason == "queue_timeout"
+        assert controller.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_middleware_answers_429_before_running_the_turn() -> None:
+    app = FastAPI()
+    started = asyncio.Event()
+    release = asyncio.Event()
+    runs = []
+
+    @app.post("/run_sse")
+    async def run_sse(request: Request) -> dict[str, Any]:
+        body = await request.json()
+        runs.append(body["sessionId"])
+        started.set()
+        await release.wait()
+        return {"ok": True}
+
+    app.add_middleware(AdmissionMiddleware, controller=AdmissionController())
+    body = {"appName": "app", "userId": "u", "sessionId": "s", "new_message": {}}
+
+    async def scenario() -> None:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            first = asyncio.create_task(client.post("/run_sse", json=body))
+            await started.wait()
+            second = await client.post("/run_sse", json=body)
+            release.set()
+            assert (await first).status_code == 200
+
+        assert second.status_code == 429
+        assert int(second.headers["Retry-After"]) >= 1
+        assert second.json()["reason"] == "session_busy"
+        # The rejected request never reached the endpoint
+        assert runs == ["s"]
+
+    asyncio.run(scenario())
+
+
+def test_unhashable_session_id_does_not_crash_the_middleware() -> None:
+    app = FastAPI()
+
+    @app.post("/run")
+    async def run(request: Request) -> dict[str, Any]:
+        return {"ok": True}
+
+    app.add_middleware(AdmissionMiddleware, controller=AdmissionController())
+    body = {"appName": "app", "userId": "u", "sessionId": {"id": "s"}}
+
+    async def scenario() -> None:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            response = await client.post("/run", json=body)
+        # Left to the endpoint's own validation
+        assert response.status_code == 200
+
+    asyncio.run(scenario())
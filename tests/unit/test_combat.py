@@ -0,0 +1,125 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.utils.combat import (
+    Combatant,
+    max_simulations,
+    run_combat_simulation,
+    simulate_combat,
+)
+
+FIGHTER = {
+    "name": "Fighter",
+    "armor_class": 18,
+    "hit_points": 44,
+    "initiative_bonus": 1,
+    "attacks": [
+        {"name": "longsword", "attack_bonus": 7, "damage": "1d8+4", "count": 2}
+    ],
+}
+GOBLINS = {
+    "name": "Goblin",
+    "armor_class": 15,
+    "hit_points": 7,
+    "count": 4,
+    "initiative_bonus": 2,
+    "attacks": [{"name": "scimitar", "attack_bonus": 4, "damage": "1d6+2"}],
+}
+
+
+def test_run_combat_simulation_is_consistent() -> None:
+    """Every finished combat has exactly one side left standing."""
+    result = run_combat_simulation(
+        [Combatant.model_validate(FIGHTER)],
+        [Combatant.model_validate(GOBLINS)],
+        simulations=500,
+        rng=np.random.default_rng(11),
+    )
+    assert result.names == ["Fighter", "Goblin 1", "Goblin 2", "Goblin 3", "Goblin 4"]
+    assert result.hit_points.shape == (500, 5)
+    assert result.hit_points.min() >= 0
+    assert not (result.party_won & result.monsters_won).any()
+    assert (result.party_won | result.monsters_won).all()
+    assert result.rounds.min() >= 1
+
+
+def test_simulate_combat_summary() -> None:
+    """A veteran fighter usually beats four goblins but a dragon-sized foe wins."""
+    easy = asyncio.run(simulate_combat([FIGHTER], [GOBLINS]))
+    assert easy["party_win_probability"] > 0.8
+    assert easy["combatants"]["Fighter"]["max_hp"] == 44
+    assert set(easy["rounds_percentiles"]) == {"p10", "p50", "p90"}
+
+    champion = {
+        "name": "The Lion",
+        "armor_class": 16,
+        "hit_points": 120,
+        "attacks": [{"attack_bonus": 8, "damage": "2d8+5", "count": 3}],
+    }
+    deadly = asyncio.run(simulate_combat([FIGHTER], [champion], simulations=500))
+    assert deadly["monster_win_probability"] > 0.9
+
+
+@pytest.mark.parametrize(
+    ("party", "monsters", "simulations"),
+    [
+        ([FIGHTER], [], 100),
+        (
+            [FIGHTER],
+            [{**GOBLINS, "attacks": [{"attack_bonus": 4, "damage": "1d7"}]}],
+            100,
+        ),
+        ([FIGHTER], [GOBLINS], 0),
+        ([FIGHTER], [{**GOBLINS, "count": 1000}], 100),
+        ([FIGHTER], [{**GOBLINS, "count": 12}, {**GOBLINS, "count": 12}], 100),
+        (
+            [FIGHTER],
+            [{**GOBLINS, "attacks": [{"attack_bonus": 4, "damage": "10000d100"}]}],
+            100,
+        ),
+    ],
+)
+def test_simulate_combat_reports_errors(
+    party: list, monsters: list, simulations: int
+) -> None:
+    """Invalid encounters come back as an error instead of raising."""
+    result = asyncio.run(simulate_combat(party, monsters, simulations))
+    assert "error" in result
+
+
+def test_large_fights_are_simulated_fewer_times() -> None:
+    """The work budget scales the simulation count down instead of blocking."""
+    horde = {
+        **GOBLINS,
+        "count": 12,
+        "attacks": [{"attack_bonus": 4, "damage": "1d6+2", "count": 10}],
+    }
+    party = [Combatant.model_validate({**horde, "name": "Militia"})]
+    monsters = [Combatant.model_validate(horde)]
+    limit = max_simulations(party, monsters)
+    assert 1 <= limit < 2000
+    with pytest.raises(ValueError):
+        run_combat_simulation(party, monsters, simulations=limit + 1)
+
+    result = asyncio.run(
+        simulate_combat([{**horde, "name": "Militia"}], [horde], simulations=20_000)
+    )
+    assert result["simulations"] == limit
+    # Small encounters keep the requested count
+    assert asyncio.run(simulate_combat([FIGHTER], [GOBLINS]))["simulations"] == 2000
@@ -0,0 +1,304 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import itertools
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.utils.dice import (
+    ROLL_COUNT_STATE_KEY,
+    SEED_STATE_KEY,
+    DiceTerm,
+    compile_dice_expression,
+    dice_expression_distribution,
+    dice_odds,
+    get_roll_journal,
+    replay_rolls,
+    roll_dice,
+    roll_dice_array,
+    roll_dice_batch,
+    roll_dice_expression,
+    roll_dice_totals,
+    roll_multiple_dice,
+)
+
+
+def test_roll_dice_array_shape_and_bounds() -> None:
+    """The bulk engine returns one row per repetition with in-range faces."""
+    rolls = roll_dice_array(8, 6, repetitions=500)
+    assert rolls.shape == (500, 8)
+    assert rolls.min() >= 1
+    assert rolls.max() <= 6
+
+
+def test_roll_dice_array_advantage_beats_disadvantage() -> None:
+    """Advantage keeps the higher of two dice, disadvantage the lower."""
+    rng = np.random.default_rng(1234)
+    advantage = roll_dice_array(1, 20, 5000, advantage=True, rng=rng)
+    disadvantage = roll_dice_array(1, 20, 5000, disadvantage=True, rng=rng)
+    assert advantage.mean() > 13 > 8 > disadvantage.mean()
+
+
+def test_roll_dice_totals_is_reproducible_with_seeded_rng() -> None:
+    """Totals include the modifier and are deterministic for a seeded generator."""
+    first = roll_dice_totals(3, 8, 100, modifier=2, rng=np.random.default_rng(7))
+    second = roll_dice_totals(3, 8, 100, modifier=2, rng=np.random.default_rng(7))
+    assert np.array_equal(first, second)
+    assert first.min() >= 5
+    assert first.max() <= 26
+
+
+def test_roll_multiple_dice_builds_result_at_boundary() -> None:
+    """The pydantic result still matches the individual dice."""
+    result = roll_multiple_dice(4, 10, modifier=3)
+    assert len(result.rolls) == 4
+    assert result.total == sum(roll.result for roll in result.rolls) + 3
+    assert result.expression == "4d10 + 3"
+
+
+@pytest.mark.parametrize(
+    ("args", "kwargs"),
+    [
+        ((1, 7), {}),
+        ((0, 6), {}),
+        ((1, 6), {"repetitions": 0}),
+        ((1, 20), {"advantage": True, "disadvantage": True}),
+    ],
+)
+def test_roll_dice_array_rejects_invalid_input(args: tuple, kwargs: dict) -> None:
+    """Invalid dice, counts and conflicting modes raise ValueError."""
+    with pytest.raises(ValueError):
+        roll_dice_array(*args, **kwargs)
+
+
+@pytest.mark.parametrize(
+    ("expression", "readable"),
+    [
+        ("1d20", "1d20"),
+        ("2d6+3", "2d6 + 3"),
+        ("1d20-2", "1d20 - 2"),
+        ("1d20 adv", "1d20 (advantage)"),
+        ("1d20+5 disadvantage", "1d20 (disadvantage) + 5"),
+        ("2d6+1d4+3+1", "2d6 + 1d4 + 4"),
+        ("4d6dl1", "4d6kh3"),
+        ("2d20kl1", "2d20kl1"),
+        ("2d6ro<2", "2d6r2"),
+    ],
+)
+def test_compile_dice_expression(expression: str, readable: str) -> None:
+    """Expressions compile to a plan with a normalized readable form."""
+    assert compile_dice_expression(expression).expression == readable
+
+
+def test_compile_dice_expression_is_cached() -> None:
+    """The same expression returns the same compiled plan."""
+    assert compile_dice_expression("2d8+3") is compile_dice_expression(" 2D8+3 ")
+
+
+def test_compiled_plan_terms() -> None:
+    """Compound expressions keep their dice groups and sum their modifiers."""
+    plan = compile_dice_expression("4d6kh3 - 1d4 + 2 - 1")
+    assert plan.terms == (
+        DiceTerm(count=4, dice_type=6, keep=3),
+        DiceTerm(count=1, dice_type=4, sign=-1),
+    )
+    assert plan.modifier == 1
+
+
+def test_roll_dice_expression_keeps_highest() -> None:
+    """Only kept dice are reported and they add up to the total."""
+    result = roll_dice_expression("4d6kh3+2")
+    assert len(result.rolls) == 3
+    assert result.total == sum(roll.result for roll in result.rolls) + 2
+
+
+def test_roll_plan_totals_respect_rerolls() -> None:
+    """Rerolling 1s and 2s once lifts the average of 2d6 to 25/3."""
+    totals = compile_dice_expression("2d6r2").roll_totals(
+        20000, rng=np.random.default_rng(3)
+    )
+    assert totals.mean() == pytest.approx(25 / 3, abs=0.1)
+
+
+def test_roll_outcome_response_matches_model() -> None:
+    """The fast tool response and the pydantic model describe the same roll."""
+    outcome = compile_dice_expression("2d6 - 1d4 + 3").roll()
+    model = outcome.to_model()
+    response = outcome.to_response()
+    assert response["total"] == model.total == outcome.total
+    assert response["rolls"] == [roll.result for roll in model.rolls]
+    assert [detail["dice_type"] for detail in response["details"]] == [6, 6, 4]
+    assert model.rolls[2].total == -model.rolls[2].result
+
+
+def test_roll_dice_tool_response() -> None:
+    """The tool returns the total, dice and details, or an error message."""
+    response = roll_dice("3d8+7", None)  # type: ignore[arg-type]
+    assert response["expression"] == "3d8 + 7"
+    assert response["total"] == sum(response["rolls"]) + 7
+    assert len(response["details"]) == 3
+    assert "error" in roll_dice("banana", None)  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["5", "1d7", "2d6+", "1d20 adv dis", "4d6kh5", "2d6kh1dl1", "1d6r6", "abc"],
+)
+def test_compile_dice_expression_rejects_invalid(expression: str) -> None:
+    """Unparseable or impossible expressions raise ValueError."""
+    with pytest.raises(ValueError):
+        compile_dice_expression(expression)
+
+
+@pytest.mark.parametrize(
+    ("expression", "count", "keep", "keep_highest"),
+    [("4d6kh3", 4, 3, True), ("3d8kl1", 3, 1, False), ("2d20kh1", 2, 1, True)],
+)
+def test_distribution_matches_enumeration(
+    expression: str, count: int, keep: int, keep_highest: bool
+) -> None:
+    """Keep-highest/lowest distributions match brute-force enumeration."""
+    dice_type = int(expression.split("d")[1].split("k")[0])
+    outcomes: Counter[int] = Counter()
+    for faces in itertools.product(range(1, dice_type + 1), repeat=count):
+        ordered = sorted(faces)
+        outcomes[sum(ordered[-keep:] if keep_highest else ordered[:keep])] += 1
+
+    distribution = dice_expression_distribution(expression)
+    for total, ways in outcomes.items():
+        assert distribution.pmf[total - distribution.minimum] == pytest.approx(
+            ways / dice_type**count
+        )
+
+
+def test_distribution_with_advantage_and_modifier() -> None:
+    """1d20+5 with advantage has the closed-form mean and success chance."""
+    distribution = dice_expression_distribution("1d20+5 adv")
+    assert distribution.minimum == 6
+    assert distribution.maximum == 25
+    assert distribution.mean == pytest.approx(13.825 + 5)
+    # P(d20 >= 15) = 0.3, so with advantage 1 - 0.7**2
+    assert distribution.probability_at_least(20) == pytest.approx(0.51)
+
+
+def test_distribution_of_large_pool_uses_fft() -> None:
+    """Large pools stay normalized and centered on the expected total."""
+    distribution = dice_expression_distribution("1000d6 - 1d4")
+    assert distribution.pmf.sum() == pytest.approx(1.0)
+    assert distribution.pmf.min() >= 0.0
+    assert distribution.mean == pytest.approx(3500 - 2.5)
+    assert distribution.percentile(50) == 3497
+
+
+def test_dice_odds_tool() -> None:
+    """The tool reports range, percentiles and the chance to beat a DC."""
+    odds = asyncio.run(dice_odds("1d20+5", dc=15))
+    assert odds["min"] == 6
+    assert odds["max"] == 25
+    assert odds["percentiles"]["p50"] == 15
+    assert odds["probability_at_least_dc"] == pytest.approx(0.55)
+    assert odds["pmf"]["6"] == pytest.approx(0.05)
+    assert "error" in asyncio.run(dice_odds("1d7"))
+
+
+def test_dice_odds_limits_keep_pools() -> None:
+    """Keep pools too large to solve quickly are refused, not computed."""
+    assert "error" in asyncio.run(dice_odds("60d20kh30"))
+    assert "error" not in asyncio.run(dice_odds("20d20kh10"))
+
+
+def test_roll_dice_batch_resolves_every_roll_in_order() -> None:
+    """Each labelled roll gets its own result, even for repeated expressions."""
+    rolls = [
+        {"label": "goblin 1 attack", "expression": "1d20+4"},
+        {"label": "goblin 1 damage", "expression": "1d6+2"},
+        {"label": "goblin 2 attack", "expression": "1d20+4"},
+        {"label": "typo", "expression": "1d7"},
+    ]
+    response = roll_dice_batch(rolls, None)  # type: ignore[arg-type]
+    results = response["results"]
+    assert [result["label"] for result in results] == [
+        "goblin 1 attack",
+        "goblin 1 damage",
+        "goblin 2 attack",
+        "typo",
+    ]
+    for result in results[:3]:
+        assert result["total"] == sum(result["rolls"]) + (
+            4 if "attack" in result["label"] else 2
+        )
+    assert "error" in results[3]
+
+
+def test_roll_many_matches_single_roll_shape() -> None:
+    """Bulk outcomes keep only the kept dice of every repetition."""
+    outcomes = compile_dice_expression("4d6kh3+1").roll_many(50)
+    assert len(outcomes) == 50
+    for outcome in outcomes:
+        assert len(outcome.results) == 3
+        assert outcome.total == sum(outcome.results) + 1
+
+
+def _tool_context(session_id: str, state: dict | None = None) -> SimpleNamespace:
+    return SimpleNamespace(state=state or {}, session=SimpleNamespace(id=session_id))
+
+
+def test_session_rolls_are_seeded_and_journaled() -> None:
+    """Rolls draw from the session seed and are recorded in its journal."""
+    context = _tool_context("journal-session", {SEED_STATE_KEY: 42})
+    first = roll_dice("1d20+5", context)  # type: ignore[arg-type]
+    batch = roll_dice_batch(
+        [
+            {"label": "attack", "expression": "1d20+4"},
+            {"label": "damage", "expression": "2d6+2"},
+            {"label": "typo", "expression": "1d7"},
+        ],
+        context,  # type: ignore[arg-type]
+    )
+    assert context.state[ROLL_COUNT_STATE_KEY] == 2
+
+    journal = get_roll_journal("journal-session")
+    assert journal is not None
+    assert len(journal) == 3
+    assert journal.totals() == [
+        first["total"],
+        batch["results"][0]["total"],
+        batch["results"][1]["total"],
+    ]
+    assert journal.calls() == {0: ["1d20+5"], 1: ["1d20+4", "2d6+2"]}
+    stats = journal.stats()
+    assert stats["dice"] == 4
+    assert stats["by_dice_type"]["d20"]["count"] == 2
+
+
+def test_session_rolls_replay_deterministically() -> None:
+    """Replaying a journal from its seed reproduces every roll exactly."""
+    context = _tool_context("replay-session")
+    for _ in range(5):
+        roll_dice("4d6kh3", context)  # type: ignore[arg-type]
+    journal = get_roll_journal("replay-session")
+    assert journal is not None
+    assert journal.seed == context.state[SEED_STATE_KEY]
+
+    replayed = replay_rolls(journal.seed, journal.calls())
+    assert [outcome.total for outcome in replayed] == journal.totals()
+
+    # A second session with the same seed sees the same stream
+    twin = _tool_context("twin-session", {SEED_STATE_KEY: journal.seed})
+    totals = [roll_dice("4d6kh3", twin)["total"] for _ in range(5)]  # type: ignore[arg-type]
+    assert totals == journal.totals()
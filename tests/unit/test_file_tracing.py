@@ -0,0 +1,87 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+from app.utils.file_tracing import (
+    JsonLinesSpanExporter,
+    main,
+    read_span_records,
+    summarize_latency,
+)
+
+
+def _record_turns(exporter: JsonLinesSpanExporter, turns: int) -> None:
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracer = provider.get_tracer(__name__)
+    for turn in range(turns):
+        with tracer.start_as_current_span("invocation"):
+            illustrator = tracer.start_span(
+                "execute_tool illustrator_agent", start_time=0
+            )
+            illustrator.set_attribute("gen_ai.tool.type", "AgentTool")
+            illustrator.set_attribute("gcp.vertex.agent.llm_request", "x" * 5000)
+            illustrator.end(end_time=(turn + 1) * 1_000_000_000)
+
+
+def test_spans_are_written_rotated_and_summarized(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    exporter = JsonLinesSpanExporter(
+        tmp_path, max_file_bytes=500, max_files=3, max_attribute_chars=100
+    )
+    _record_turns(exporter, 10)
+    exporter.shutdown()
+
+    assert len(list(tmp_path.glob("spans-*.jsonl"))) == 3
+    records = list(read_span_records(tmp_path))
+    assert 0 < len(records) < 20
+    request = records[0]["attributes"].get("gcp.vertex.agent.llm_request")
+    assert request is None or len(request) < 200
+
+    rows = summarize_latency(iter(records))
+    illustrator = next(row for row in rows if row["name"] == "illustrator_agent")
+    assert illustrator["component"] == "sub_agent"
+    assert illustrator["max_ms"] == 10_000
+
+    main([str(tmp_path)])
+    assert "illustrator_agent" in capsys.readouterr().out
+
+
+def test_summary_cli_runs_without_credentials(tmp_path: Path) -> None:
+    """The offline summary must not load the agents, which ask for credentials."""
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if name not in ("GOOGLE_APPLICATION_CREDENTIALS", "GOOGLE_CLOUD_PROJECT")
+    }
+    env["HOME"] = str(tmp_path)
+    result = subprocess.run(
+        [sys.executable, "-m", "app.utils.file_tracing", str(tmp_path)],
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).resolve().parents[2],
+        env=env,
+        check=False,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "No agent spans found" in result.stdout
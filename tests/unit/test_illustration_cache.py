@@ -0,0 +1,90 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+
+import numpy as np
+
+from app.utils.illustration_cache import IllustrationCache, minhash, prompt_key
+
+CELL_BLOCK = (
+    "Torchlight flickers across the damp stone of the cell block as the guards "
+    "drag a new prisoner past the rusted bars toward the arena tunnel"
+)
+
+
+def test_prompt_key_ignores_case_and_punctuation() -> None:
+    assert prompt_key("The  Arena, at dusk!") == prompt_key("the arena at dusk")
+    assert prompt_key("the arena at dusk", "webp") != prompt_key("the arena at dusk")
+
+
+def test_minhash_estimates_similarity() -> None:
+    same = np.mean(minhash(CELL_BLOCK) == minhash(CELL_BLOCK + "."))
+    near = np.mean(minhash(CELL_BLOCK) == minhash(CELL_BLOCK + " at dawn"))
+    other = np.mean(minhash(CELL_BLOCK) == minhash("A dragon circles the tower"))
+    assert same == 1.0
+    assert near > 0.7
+    assert other < 0.2
+
+
+def test_exact_and_near_duplicate_lookups(tmp_path: Path) -> None:
+    cache = IllustrationCache(tmp_path, similarity_threshold=0.7)
+    key = cache.store(CELL_BLOCK, "image/png", b"image", b"thumb", profile="png")
+
+    exact = cache.lookup(CELL_BLOCK.upper(), profile="png")
+    assert exact is not None
+    assert (exact.key, exact.data, exact.thumbnail, exact.similarity) == (
+        key,
+        b"image",
+        b"thumb",
+        1.0,
+    )
+    near = cache.lookup(CELL_BLOCK + " at dawn", profile="png")
+    assert near is not None and near.key == key and near.similarity < 1.0
+    # Images made with other output settings never match
+    assert cache.lookup(CELL_BLOCK, profile="webp") is None
+    assert cache.lookup("A dragon circles the tower", profile="png") is None
+    assert cache.stats()["near_duplicate_hits"] == 1
+
+
+def test_least_recently_used_are_evicted_and_index_persists(tmp_path: Path) -> None:
+    cache = IllustrationCache(tmp_path, max_bytes=10, similarity_threshold=None)
+    cache.store("first scene", "image/png", b"aaaa")
+    cache.store("second scene", "image/png", b"bbbb")
+    assert cache.lookup("first scene") is not None
+    cache.store("third scene", "image/png", b"cccc")
+
+    assert cache.lookup("second scene") is None
+    restarted = IllustrationCache(tmp_path, max_bytes=10, similarity_threshold=None)
+    assert restarted.stats()["entries"] == 2
+    hit = restarted.lookup("first scene")
+    assert hit is not None and hit.data == b"aaaa"
+    assert sorted(path.name for path in tmp_path.glob("*.image")) == sorted(
+        f"{prompt_key(prompt)}.image" for prompt in ("first scene", "third scene")
+    )
+
+
+def test_scenes_with_another_creature_never_match(tmp_path: Path) -> None:
+    minotaur = (
+        "A minotaur charges across the blood soaked sand of the arena, "
+        "horns lowered toward the prisoner"
+    )
+    troll = minotaur.replace("minotaur", "troll")
+    cache = IllustrationCache(tmp_path)
+    cache.store(minotaur, "image/png", b"minotaur")
+
+    # Only identical scenes match by default
+    assert cache.lookup(troll) is None
+    # Nor does the narrative alone look alike enough at a typical threshold
+    assert IllustrationCache(tmp_path, similarity_threshold=0.85).lookup(troll) is None
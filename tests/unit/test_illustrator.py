@@ -0,0 +1,210 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from google.adk.events import EventActions
+from google.genai import types
+from PIL import Image
+
+from app.agents.illustrator import agent as illustrator
+
+GENERATION_SECONDS = 0.2
+
+
+def _png() -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _image_response() -> types.GenerateContentResponse:
+    part = types.Part(inline_data=types.Blob(mime_type="image/png", data=_png()))
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(parts=[part]))]
+    )
+
+
+class FakeClient:
+    """Image model taking GENERATION_SECONDS, as a real one takes seconds."""
+
+    instances = 0
+
+    def __init__(self, **kwargs: Any) -> None:
+        FakeClient.instances += 1
+        self.generations = 0
+        self.running = 0
+        self.max_running = 0
+        # The sync API blocks the calling thread like the real client does
+        self.models = SimpleNamespace(generate_content=self._generate)
+        self.aio = SimpleNamespace(
+            models=SimpleNamespace(generate_content=self._generate_async)
+        )
+
+    def _generate(self, **kwargs: Any) -> types.GenerateContentResponse:
+        time.sleep(GENERATION_SECONDS)
+        return _image_response()
+
+    async def _generate_async(self, **kwargs: Any) -> types.GenerateContentResponse:
+        self.generations += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(GENERATION_SECONDS)
+        self.running -= 1
+        return _image_response()
+
+
+class FakeToolContext:
+    def __init__(self) -> None:
+        self.artifacts: dict[str, types.Part] = {}
+        self.state: dict[str, Any] = {}
+        self.actions = EventActions()
+
+    async def save_artifact(self, filename: str, part: types.Part) -> int:
+        self.artifacts[filename] = part
+        self.actions.artifact_delta[filename] = 0
+        return 0
+
+
+@pytest.fixture(autouse=True)
+def fake_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    FakeClient.instances = 0
+    monkeypatch.setattr(illustrator.genai, "Client", FakeClient)
+    monkeypatch.setattr(illustrator, "_client", None)
+    monkeypatch.setattr(illustrator, "_generation_slots", None)
+    monkeypatch.setattr(illustrator, "_cache", None)
+    monkeypatch.setattr(illustrator, "ILLUSTRATION_CACHE_MAX_BYTES", 0)
+
+
+def test_other_sessions_keep_streaming_during_generation() -> None:
+    async def stream(stop: asyncio.Event) -> list[float]:
+        """Another session's SSE stream, sending an event every 10 ms."""
+        gaps = []
+        last = time.monotonic()
+        while not stop.is_set():
+            await asyncio.sleep(0.01)
+            now = time.monotonic()
+            gaps.append(now - last)
+            last = now
+        return gaps
+
+    async def scenario() -> None:
+        stop = asyncio.Event()
+        streaming = asyncio.create_task(stream(stop))
+        context = FakeToolContext()
+        filename = await illustrator.generate_illustration_tool(
+            "A goblin ambush", context
+        )
+        stop.set()
+        gaps = await streaming
+
+        assert filename in context.artifacts
+        assert len(gaps) >= 5
+        # The loop never stalled for the length of the generation
+        assert max(gaps) < GENERATION_SECONDS / 2
+
+    asyncio.run(scenario())
+
+
+def test_client_is_shared_and_generations_are_capped(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(illustrator, "MAX_CONCURRENT_ILLUSTRATIONS", 2)
+
+    async def scenario() -> None:
+        await asyncio.gather(
+            *(
+                illustrator.generate_illustration_tool(
+                    f"Scene {number}", FakeToolContext()
+                )
+                for number in range(5)
+            )
+        )
+
+    # The cap keeps working when a later event loop has to wait on it
+    asyncio.run(scenario())
+    asyncio.run(scenario())
+
+    assert FakeClient.instances == 1
+    assert illustrator._client.max_running == 2
+
+
+def _generate(context: FakeToolContext) -> str:
+    return asyncio.run(illustrator.generate_illustration_tool("A tavern", context))
+
+
+def test_matching_format_is_passed_through(monkeypatch: pytest.MonkeyPatch) -> None:
+    def fail(*args: Any) -> bytes:
+        raise AssertionError("Re-encoded an image already in the output format")
+
+    monkeypatch.setattr(illustrator, "_encode", fail)
+    context = FakeToolContext()
+    filename = _generate(context)
+
+    assert filename.endswith(".png")
+    assert context.artifacts[filename].inline_data.data == _png()
+
+
+def test_output_profile_with_thumbnail(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(illustrator, "ILLUSTRATION_FORMAT", "webp")
+    monkeypatch.setattr(illustrator, "ILLUSTRATION_THUMBNAIL_SIZE", 2)
+    context = FakeToolContext()
+    filename = _generate(context)
+
+    thumbnail_filename = filename.replace(".webp", "_thumb.webp")
+    assert sorted(context.artifacts) == sorted([filename, thumbnail_filename])
+    for name, size in ((filename, (4, 4)), (thumbnail_filename, (2, 2))):
+        blob = context.artifacts[name].inline_data
+        assert blob.mime_type == "image/webp"
+        image = Image.open(BytesIO(blob.data))
+        assert (image.format, image.size) == ("WEBP", size)
+
+
+def test_cached_illustrations_skip_generation(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(illustrator, "ILLUSTRATION_CACHE_MAX_BYTES", 1 << 20)
+    monkeypatch.setattr(illustrator, "ILLUSTRATION_CACHE_DIR", str(tmp_path))
+    scene = "The arena gates grind open and the crowd roars for blood"
+    first_session, second_session = FakeToolContext(), FakeToolContext()
+
+    async def scenario() -> list[str]:
+        first = await illustrator.generate_illustration_tool(scene, first_session)
+        # A retry in the same session, in a later turn, reuses its artifact
+        first_session.actions = EventActions()
+        retry = await illustrator.generate_illustration_tool(scene, first_session)
+        # The same scene, punctuated differently, in another session
+        other = await illustrator.generate_illustration_tool(
+            scene + "!", second_session
+        )
+        return [first, retry, other]
+
+    first, retry, other = asyncio.run(scenario())
+
+    assert FakeClient.instances == 1
+    assert illustrator._client.generations == 1
+    assert retry == first
+    assert list(first_session.artifacts) == [first]
+    # The reused artifact is still announced so the UI shows it again
+    assert first_session.actions.artifact_delta == {first: 0}
+    assert (
+        second_session.artifacts[other].inline_data.data
+        == first_session.artifacts[first].inline_data.data
+    )
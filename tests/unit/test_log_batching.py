@@ -0,0 +1,86 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any
+
+from app.utils.log_batching import BatchedLogWriter
+
+
+class FakeBatch:
+    def __init__(self, logger: "FakeLogger") -> None:
+        self.logger = logger
+        self.entries: list[tuple[dict[str, Any], dict[str, Any]]] = []
+
+    def log_struct(self, info: dict[str, Any], **kw: Any) -> None:
+        self.entries.append((info, kw))
+
+    def commit(self) -> None:
+        if self.logger.fail:
+            raise RuntimeError("write failed")
+        self.logger.commits.append(self.entries)
+
+
+class FakeLogger:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+        self.commits: list[list[tuple[dict[str, Any], dict[str, Any]]]] = []
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+
+def test_entries_are_written_in_batches() -> None:
+    logger = FakeLogger()
+    writer = BatchedLogWriter(logger, max_batch_size=4, flush_interval=60)
+    for number in range(10):
+        writer.log_struct({"number": number}, severity="INFO")
+    assert writer.flush(timeout=5)
+    writer.shutdown()
+
+    assert all(len(batch) <= 4 for batch in logger.commits)
+    written = [info["number"] for batch in logger.commits for info, _ in batch]
+    assert written == list(range(10))
+    assert logger.commits[0][0][1] == {"severity": "INFO"}
+    assert writer.stats()["flushed_entries"] == 10
+
+
+def test_full_queue_applies_drop_policy() -> None:
+    for policy, kept in (("drop_oldest", [2, 3]), ("drop_newest", [0, 1])):
+        logger = FakeLogger()
+        writer = BatchedLogWriter(
+            logger,
+            max_batch_size=100,
+            flush_interval=60,
+            max_queue_size=2,
+            drop_policy=policy,
+        )
+        results = [writer.log_struct({"number": number}) for number in range(4)]
+        writer.shutdown()
+
+        written = [info["number"] for batch in logger.commits for info, _ in batch]
+        assert written == kept
+        assert results == (
+            [True] * 4 if policy == "drop_oldest" else [True, True, False, False]
+        )
+        assert writer.stats()["dropped_entries"] == 2
+
+
+def test_failed_writes_are_counted() -> None:
+    writer = BatchedLogWriter(FakeLogger(fail=True), flush_interval=60)
+    writer.log_struct({"message": "lost"})
+    writer.shutdown()
+
+    stats = writer.stats()
+    assert stats["failed_entries"] == 1
+    assert stats["flushed_entries"] == 0
@@ -0,0 +1,74 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from opentelemetry.sdk.trace import TracerProvider
+
+from app.utils.metrics import LatencyHistogram, SpanMetricsProcessor, phase_span
+
+
+def test_spans_are_aggregated_per_component() -> None:
+    metrics = SpanMetricsProcessor()
+    provider = TracerProvider()
+    provider.add_span_processor(metrics)
+    tracer = provider.get_tracer(__name__)
+
+    start = 1_000_000_000
+    for turn in range(4):
+        with tracer.start_as_current_span("invocation", start_time=start):
+            with tracer.start_as_current_span("invoke_agent root_agent"):
+                with tracer.start_as_current_span("call_llm") as llm:
+                    llm.set_attribute("gen_ai.request.model", "gemini-2.5-flash")
+                    llm.set_attribute("gen_ai.usage.input_tokens", 1000)
+                    llm.set_attribute("gen_ai.usage.output_tokens", 50)
+                tool = tracer.start_span("execute_tool illustrator_agent", start_time=0)
+                tool.set_attribute("gen_ai.tool.type", "AgentTool")
+                tool.end(end_time=(turn + 1) * 3_000_000_000)
+                with tracer.start_as_current_span("execute_tool roll_dice") as dice:
+                    dice.set_attribute("gen_ai.tool.type", "FunctionTool")
+                    with phase_span("dice.roll", tracer):
+                        pass
+
+    rendered = metrics.render()
+    for labels in (
+        'component="invocation",name="invocation"',
+        'component="agent",name="root_agent"',
+        'component="model",name="gemini-2.5-flash"',
+        'component="sub_agent",name="illustrator_agent"',
+        'component="tool",name="roll_dice"',
+        'component="phase",name="dice.roll"',
+    ):
+        assert f"agent_span_latency_seconds_count{{{labels}}} 4" in rendered
+    assert (
+        'agent_model_tokens_total{model="gemini-2.5-flash",type="input"} 4000'
+        in rendered
+    )
+    assert (
+        'agent_span_latency_seconds_bucket{component="sub_agent",'
+        'name="illustrator_agent",le="+Inf"} 4'
+    ) in rendered
+
+    quantiles = metrics.quantiles("sub_agent", "illustrator_agent")
+    assert 2.5 <= quantiles["p50"] <= 10.0
+    assert quantiles["p95"] <= 20.0
+
+
+def test_histogram_quantiles_interpolate_within_buckets() -> None:
+    histogram = LatencyHistogram(bounds=(1.0, 2.0, 4.0))
+    for seconds in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(seconds)
+
+    assert histogram.quantile(0.5) == 1.5
+    assert histogram.quantile(1.0) == 4.0
+    histogram.observe(100.0)
+    assert histogram.quantile(0.99) == 4.0
@@ -0,0 +1,146 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any, ClassVar
+
+import pytest
+from google.cloud import texttospeech
+from google.genai import types
+
+from app.agents.narrator import agent as narrator
+
+# The service's MP3 output starts with an ID3v2 tag; this one holds 3 bytes
+# of frames
+ID3_TAG = b"ID3\x04\x00\x00\x00\x00\x00\x03TAG"
+
+
+class FakeTextToSpeechClient:
+    """Async client whose synthesis takes 50 ms plus 0.5 ms per character."""
+
+    instances: ClassVar[list["FakeTextToSpeechClient"]] = []
+
+    def __init__(self) -> None:
+        FakeTextToSpeechClient.instances.append(self)
+        self.running = 0
+        self.max_running = 0
+        self.requests: list[str] = []
+
+    async def synthesize_speech(self, **kwargs: Any) -> SimpleNamespace:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        # Longer text takes longer, as with the real service
+        await asyncio.sleep(0.05 + len(kwargs["input"].text) / 2000)
+        self.running -= 1
+        self.requests.append(kwargs["input"].text)
+        return SimpleNamespace(audio_content=ID3_TAG + kwargs["input"].text.encode())
+
+
+class FakeToolContext:
+    def __init__(self) -> None:
+        self.artifacts: dict[str, types.Part] = {}
+
+    async def save_artifact(self, filename: str, part: types.Part) -> int:
+        self.artifacts[filename] = part
+        return 0
+
+
+@pytest.fixture(autouse=True)
+def fake_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    FakeTextToSpeechClient.instances = []
+    monkeypatch.setattr(texttospeech, "TextToSpeechAsyncClient", FakeTextToSpeechClient)
+    monkeypatch.setattr(narrator, "_client", None)
+
+
+def test_client_is_shared_and_syntheses_are_capped(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(narrator, "MAX_CONCURRENT_NARRATIONS", 2)
+
+    async def scenario() -> list[dict]:
+        context = FakeToolContext()
+        results = await asyncio.gather(
+            *(narrator.narrator(f"Line {n}.", context) for n in range(5))
+        )
+        for result in results:
+            assert context.artifacts[result["filename"]].inline_data.mime_type == (
+                "audio/mpeg"
+            )
+        return results
+
+    # Each event loop, as with the server's and a test runner's, gets its own
+    # client and cap
+    for _ in range(2):
+        results = asyncio.run(scenario())
+        assert [result["status"] for result in results] == ["success"] * 5
+
+    assert len(FakeTextToSpeechClient.instances) == 2
+    for client in FakeTextToSpeechClient.instances:
+        assert client.max_running == 2
+        assert sorted(client.requests) == [f"Line {n}." for n in range(5)]
+
+
+def test_narrative_is_chunked_on_sentence_boundaries() -> None:
+    text = 'The gate creaks. A guard shouts "Halt!" The crowd roars... What do you do?'
+
+    assert narrator.split_sentences(text) == [
+        "The gate creaks.",
+        'A guard shouts "Halt!"',
+        "The crowd roars...",
+        "What do you do?",
+    ]
+    assert narrator.chunk_narrative(text, max_chars=45) == [
+        'The gate creaks. A guard shouts "Halt!"',
+        "The crowd roars... What do you do?",
+    ]
+
+
+def test_chunked_narration_synthesizes_concurrently_into_one_file(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(narrator, "NARRATION_MODE", "chunked")
+    monkeypatch.setattr(narrator, "NARRATION_CHUNK_CHARS", 60)
+    text = "Steel rings out. " + " ".join(
+        f"Sentence {n} describes the arena in vivid detail." for n in range(6)
+    )
+    chunks = narrator.chunk_narrative(text, 60)
+
+    monkeypatch.setattr(narrator, "MAX_CONCURRENT_NARRATIONS", 4)
+    monkeypatch.setattr(narrator, "NARRATION_CHUNK_CONCURRENCY", 2)
+
+    async def scenario() -> tuple[dict, FakeToolContext]:
+        context = FakeToolContext()
+        return await narrator.narrator(text, context), context
+
+    result, context = asyncio.run(scenario())
+
+    assert result["status"] == "success"
+    # Everything is saved before the tool returns, as one artifact
+    assert list(context.artifacts) == [result["filename"]]
+    [client] = FakeTextToSpeechClient.instances
+    assert len(chunks) > 2
+    # Concurrent, but within the narration's own cap below the global one
+    assert client.max_running == 2
+    # Only the first chunk keeps its tag, so the file has one at its start
+    audio = context.artifacts[result["filename"]].inline_data.data
+    assert audio == ID3_TAG + "".join(chunks).encode()
+
+
+def test_id3_tag_is_stripped_with_its_footer() -> None:
+    # Syncsafe size 0x81 = 1 * 128 + 1, and the footer flag set
+    tag = b"ID3\x04\x00\x10\x00\x00\x01\x01" + bytes(129) + b"3DI" + bytes(7)
+
+    assert narrator._strip_id3(tag + b"\xff\xfbframe") == b"\xff\xfbframe"
+    assert narrator._strip_id3(b"\xff\xfbframe") == b"\xff\xfbframe"
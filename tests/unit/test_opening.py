@@ -0,0 +1,137 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.events import Event, EventActions
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.utils.opening import OpeningSceneSessionService
+
+OPENING_TEXT = "You wake in a cage. What do you do?"
+SCENE_IMAGE = types.Part(inline_data=types.Blob(mime_type="image/png", data=b"png"))
+
+
+class ScriptedAgent(BaseAgent):
+    """Agent that always tells the same opening, counting its runs."""
+
+    runs: int = 0
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        self.runs += 1
+        assert ctx.artifact_service is not None
+        version = await ctx.artifact_service.save_artifact(
+            app_name=ctx.app_name,
+            user_id=ctx.user_id,
+            session_id=ctx.session.id,
+            filename="scene.png",
+            artifact=SCENE_IMAGE,
+        )
+        yield Event(
+            author=self.name,
+            invocation_id=ctx.invocation_id,
+            content=types.Content(role="model", parts=[types.Part(text=OPENING_TEXT)]),
+            actions=EventActions(
+                state_delta={"dice_seed": 7}, artifact_delta={"scene.png": version}
+            ),
+        )
+
+
+def test_new_sessions_start_with_the_opening(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        agent = ScriptedAgent(name="root_agent")
+        artifacts = InMemoryArtifactService()
+        service = OpeningSceneSessionService(
+            InMemorySessionService(),
+            agent,
+            "app",
+            tmp_path / "opening.json",
+            artifact_service=artifacts,
+        )
+        # Not ready yet: the session starts right away, without the opening
+        early = await service.create_session(app_name="app", user_id="a")
+        assert early.events == []
+
+        await service.warm()
+        first, second = await asyncio.gather(
+            service.create_session(app_name="app", user_id="a"),
+            service.create_session(app_name="app", user_id="b"),
+        )
+
+        assert agent.runs == 1
+        for session in (first, second):
+            # The player's prompt followed by the agent's opening scene
+            assert [event.author for event in session.events] == [
+                "user",
+                "root_agent",
+            ]
+            assert session.events[-1].content.parts[0].text == OPENING_TEXT
+            assert "dice_seed" not in session.state
+            # The illustration the opening refers to exists in the session
+            assert session.events[-1].actions.artifact_delta == {"scene.png": 0}
+            image = await artifacts.load_artifact(
+                app_name="app",
+                user_id=session.user_id,
+                session_id=session.id,
+                filename="scene.png",
+            )
+            assert image == SCENE_IMAGE
+        assert first.events[-1].id != second.events[-1].id
+
+        other = await service.create_session(app_name="other", user_id="a")
+        assert other.events == []
+
+    asyncio.run(scenario())
+
+
+def test_opening_is_cached_on_disk(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        cache_file = tmp_path / "opening.json"
+        agent = ScriptedAgent(name="root_agent")
+        await OpeningSceneSessionService(
+            InMemorySessionService(), agent, "app", cache_file
+        ).warm()
+
+        artifacts = InMemoryArtifactService()
+        restarted = OpeningSceneSessionService(
+            InMemorySessionService(),
+            agent,
+            "app",
+            cache_file,
+            artifact_service=artifacts,
+        )
+        await restarted.warm()
+        session = await restarted.create_session(app_name="app", user_id="a")
+        assert session.events[-1].content.parts[0].text == OPENING_TEXT
+        assert agent.runs == 1
+        assert await artifacts.list_artifact_keys(
+            app_name="app", user_id="a", session_id=session.id
+        ) == ["scene.png"]
+
+        # A different opening prompt invalidates the cache
+        reprompted = OpeningSceneSessionService(
+            InMemorySessionService(), agent, "app", cache_file, prompt="Begin!"
+        )
+        await reprompted.warm()
+        assert agent.runs == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,92 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from opentelemetry.sdk.trace import ReadableSpan, SpanProcessor, TracerProvider
+from opentelemetry.trace import Status, StatusCode
+
+from app.utils.sampling import TailSamplingSpanProcessor, trim_attribute
+
+PROMPT = "You are the Dungeon Master. " * 500
+
+
+class CollectingProcessor(SpanProcessor):
+    def __init__(self) -> None:
+        self.spans: list[ReadableSpan] = []
+
+    def on_end(self, span: ReadableSpan) -> None:
+        self.spans.append(span)
+
+
+def _run_traces(
+    processor: TailSamplingSpanProcessor, traces: int, error: bool = False
+) -> None:
+    provider = TracerProvider()
+    provider.add_span_processor(processor)
+    tracer = provider.get_tracer(__name__)
+    for _ in range(traces):
+        with tracer.start_as_current_span("invocation"):
+            with tracer.start_as_current_span("call_llm") as child:
+                child.set_attribute("gcp.vertex.agent.llm_request", PROMPT)
+                if error:
+                    child.set_status(Status(StatusCode.ERROR, "quota exceeded"))
+
+
+def test_error_traces_are_always_kept_in_full() -> None:
+    delegate = CollectingProcessor()
+    processor = TailSamplingSpanProcessor(delegate, sample_rate=0.0)
+    _run_traces(processor, 5, error=True)
+
+    assert len(delegate.spans) == 10
+    assert processor.kept_traces == 5
+    llm_spans = [span for span in delegate.spans if span.name == "call_llm"]
+    assert all(
+        span.attributes["gcp.vertex.agent.llm_request"] == PROMPT for span in llm_spans
+    )
+
+
+def test_healthy_traces_are_sampled_whole_and_trimmed() -> None:
+    delegate = CollectingProcessor()
+    processor = TailSamplingSpanProcessor(
+        delegate, sample_rate=0.5, slow_threshold_ms=60_000, max_attribute_chars=100
+    )
+    _run_traces(processor, 400)
+
+    assert 120 < processor.kept_traces < 280
+    assert processor.kept_traces + processor.sampled_out_traces == 400
+    # Traces are kept or dropped as a whole
+    assert len(delegate.spans) == 2 * processor.kept_traces
+    for span in delegate.spans:
+        if span.name == "call_llm":
+            request = span.attributes["gcp.vertex.agent.llm_request"]
+            assert request.startswith(PROMPT[:100])
+            assert request.endswith(f"[truncated {len(PROMPT) - 100} chars]")
+
+
+def test_slow_traces_are_kept() -> None:
+    delegate = CollectingProcessor()
+    processor = TailSamplingSpanProcessor(
+        delegate, sample_rate=0.0, slow_threshold_ms=0
+    )
+    _run_traces(processor, 3)
+
+    assert processor.kept_traces == 3
+    assert len(delegate.spans) == 6
+
+
+def test_trim_attribute_modes() -> None:
+    assert trim_attribute("short", 10, "truncate") == "short"
+    assert trim_attribute("x" * 20, 20, "hash") == "x" * 20
+    assert trim_attribute("x" * 30, 10, "keep") == "x" * 30
+    assert trim_attribute("x" * 30, 10, "hash").startswith("sha256:")
+    assert trim_attribute("x" * 30, 10, "hash").endswith("(30 chars)")
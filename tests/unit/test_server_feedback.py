@@ -0,0 +1,59 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import server
+from app.utils.log_batching import BatchedLogWriter
+
+
+class FakeLogger:
+    def __init__(self) -> None:
+        self.commits: list[list[dict[str, Any]]] = []
+
+    def batch(self) -> "FakeLogger":
+        self.commits.append([])
+        return self
+
+    def log_struct(self, info: dict[str, Any], **kw: Any) -> None:
+        self.commits[-1].append(info)
+
+    def commit(self) -> None:
+        pass
+
+
+def test_feedback_is_written_in_bulk(monkeypatch: pytest.MonkeyPatch) -> None:
+    logger = FakeLogger()
+    writer = BatchedLogWriter(logger, max_batch_size=100, flush_interval=60)
+    monkeypatch.setattr(server, "feedback_writer", writer)
+    # Not entered as a context manager, so the lifespan does not run
+    client = TestClient(server.app)
+
+    for score in range(5):
+        response = client.post(
+            "/feedback", json={"score": score, "invocation_id": "inv", "text": "ok"}
+        )
+        assert response.json() == {"status": "success"}
+    # Queued, not written per request
+    assert logger.commits == []
+
+    writer.shutdown()
+    assert len(logger.commits) == 1
+    assert [info["score"] for info in logger.commits[0]] == list(range(5))
+
+    response = client.post("/feedback", json={"score": 1, "invocation_id": "inv"})
+    assert response.json() == {"status": "unavailable"}
@@ -0,0 +1,157 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+from google.adk.events import Event, EventActions
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.utils.sessions import WriteBehindSessionService
+
+APP, USER = "app", "user"
+
+
+def _event(text: str, **state: str) -> Event:
+    return Event(
+        author="narrator",
+        content=types.Content(role="model", parts=[types.Part(text=text)]),
+        actions=EventActions(state_delta=state),
+    )
+
+
+async def _remote_events(remote: InMemorySessionService, session_id: str) -> list:
+    session = await remote.get_session(
+        app_name=APP, user_id=USER, session_id=session_id
+    )
+    assert session is not None
+    return session.events
+
+
+def test_events_are_written_behind() -> None:
+    async def scenario() -> None:
+        remote = InMemorySessionService()
+        service = WriteBehindSessionService(remote, flush_interval=60)
+        session = await service.create_session(app_name=APP, user_id=USER)
+
+        await service.append_event(session, _event("Once", scene="1"))
+        await service.append_event(session, _event("upon", scene="2"))
+        # Served locally before anything reaches the remote service
+        local = await service.get_session(
+            app_name=APP, user_id=USER, session_id=session.id
+        )
+        assert local is not None and local.state["scene"] == "2"
+        assert await _remote_events(remote, session.id) == []
+        assert service.pending_events() == 2
+
+        await service.close()
+        events = await _remote_events(remote, session.id)
+        assert [e.content.parts[0].text for e in events] == ["Once", "upon"]
+        assert service.pending_events() == 0
+        assert service.flushed_events == 2
+
+    asyncio.run(scenario())
+
+
+def test_background_flush() -> None:
+    async def scenario() -> None:
+        remote = InMemorySessionService()
+        service = WriteBehindSessionService(remote, flush_interval=0.01)
+        session = await service.create_session(app_name=APP, user_id=USER)
+
+        await service.append_event(session, _event("Once"))
+        await asyncio.sleep(0.1)
+
+        assert len(await _remote_events(remote, session.id)) == 1
+        await service.close()
+
+    asyncio.run(scenario())
+
+
+def test_local_miss_reloads_from_remote() -> None:
+    async def scenario() -> None:
+        remote = InMemorySessionService()
+        first = WriteBehindSessionService(remote)
+        session = await first.create_session(app_name=APP, user_id=USER)
+        await first.append_event(session, _event("Once", scene="1"))
+        await first.close()
+
+        # A new instance, e.g. after a restart, starts with an empty local store
+        second = WriteBehindSessionService(remote)
+        reloaded = await second.get_session(
+            app_name=APP, user_id=USER, session_id=session.id
+        )
+        assert reloaded is not None
+        assert reloaded.state["scene"] == "1"
+        assert len(reloaded.events) == 1
+        # Replayed events are not sent back
+        assert second.pending_events() == 0
+        assert (
+            await second.get_session(app_name=APP, user_id=USER, session_id="missing")
+            is None
+        )
+
+    asyncio.run(scenario())
+
+
+class SlowRemote(InMemorySessionService):
+    async def append_event(self, session, event):  # type: ignore[no-untyped-def]
+        await asyncio.sleep(0.01)
+        return await super().append_event(session, event)
+
+
+def test_close_waits_for_a_running_flush() -> None:
+    async def scenario() -> None:
+        remote = SlowRemote()
+        service = WriteBehindSessionService(remote, flush_interval=0)
+        session = await service.create_session(app_name=APP, user_id=USER)
+        for number in range(10):
+            await service.append_event(session, _event(str(number)))
+        # Let the background flush take the events off the queue
+        await asyncio.sleep(0.015)
+
+        await service.close()
+        assert len(await _remote_events(remote, session.id)) == 10
+
+    asyncio.run(scenario())
+
+
+def test_synced_sessions_are_evicted_locally() -> None:
+    async def scenario() -> None:
+        remote = InMemorySessionService()
+        service = WriteBehindSessionService(
+            remote, flush_interval=60, max_local_sessions=2
+        )
+        sessions = []
+        for _ in range(3):
+            session = await service.create_session(app_name=APP, user_id=USER)
+            await service.append_event(session, _event("Once"))
+            sessions.append(session)
+        # Unsent events keep every session local
+        assert service.evicted_sessions == 0
+
+        await service.flush()
+        await service.create_session(app_name=APP, user_id=USER)
+        assert service.evicted_sessions == 2
+        local = await service.local.list_sessions(app_name=APP, user_id=USER)
+        assert len(local.sessions) == 2
+
+        # An evicted session is reloaded from the remote service on demand
+        reloaded = await service.get_session(
+            app_name=APP, user_id=USER, session_id=sessions[0].id
+        )
+        assert reloaded is not None and len(reloaded.events) == 1
+        await service.close()
+
+    asyncio.run(scenario())
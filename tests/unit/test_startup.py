@@ -0,0 +1,63 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from pathlib import Path
+
+import pytest
+
+from app.utils.startup import (
+    AGENT_ENGINE_RESOURCE_ENV,
+    StartupTimer,
+    resolve_agent_engine,
+)
+
+RESOURCE_NAME = "projects/p/locations/us-central1/reasoningEngines/123"
+
+
+def test_resource_name_override_skips_cache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv(AGENT_ENGINE_RESOURCE_ENV, RESOURCE_NAME)
+    cache_file = tmp_path / "cache.json"
+
+    assert resolve_agent_engine("test", "p", cache_file) == RESOURCE_NAME
+    assert not cache_file.exists()
+
+
+def test_cached_resource_name_is_used(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.delenv(AGENT_ENGINE_RESOURCE_ENV, raising=False)
+    cache_file = tmp_path / "cache.json"
+    other_project = "projects/q/locations/us-central1/reasoningEngines/456"
+    cache_file.write_text(
+        json.dumps({"q/test": other_project, "p/test": RESOURCE_NAME})
+    )
+
+    assert resolve_agent_engine("test", "p", cache_file) == RESOURCE_NAME
+    assert resolve_agent_engine("test", "q", cache_file) == other_project
+
+
+def test_startup_timer_renders_phases() -> None:
+    timer = StartupTimer()
+    with timer.phase("bucket"):
+        pass
+    timer.record("agent_engine", 0.25)
+    total = timer.finish()
+
+    assert total >= 0
+    rendered = timer.render()
+    assert 'app_startup_seconds{phase="agent_engine"} 0.25' in rendered
+    assert 'app_startup_seconds{phase="total"}' in rendered
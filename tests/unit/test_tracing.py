@@ -0,0 +1,143 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+from collections.abc import Sequence
+from typing import Any
+
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    SimpleSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+from opentelemetry.trace import Status, StatusCode
+
+from app.utils.tracing import (
+    MAX_LOGGED_ATTRIBUTES_BYTES,
+    CloudTraceLoggingSpanExporter,
+    EncodedAttributes,
+    span_to_dict,
+)
+
+
+class CollectingExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.spans: list[ReadableSpan] = []
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        self.spans.extend(spans)
+        return SpanExportResult.SUCCESS
+
+
+def _record_spans() -> list[ReadableSpan]:
+    exporter = CollectingExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    tracer = provider.get_tracer(__name__)
+    with tracer.start_as_current_span("invocation") as root:
+        root.set_attribute("llm.instruction", 'You are the "Dungeon Master" 🐉\n' * 50)
+        root.set_attribute("llm.tokens", (12, 345))
+        root.add_event("turn", {"number": 1})
+        with tracer.start_as_current_span("call_llm") as child:
+            child.set_status(Status(StatusCode.ERROR, "quota exceeded"))
+    return exporter.spans
+
+
+def test_span_to_dict_matches_to_json() -> None:
+    for span in _record_spans():
+        assert span_to_dict(span) == json.loads(span.to_json())
+
+
+def test_encoded_attributes_track_serialized_size() -> None:
+    for span in _record_spans():
+        attributes = span_to_dict(span)["attributes"]
+        encoded = EncodedAttributes.from_attributes(attributes)
+        assert encoded.to_json() == json.dumps(attributes)
+        assert encoded.size == len(json.dumps(attributes).encode())
+
+    encoded = EncodedAttributes.from_attributes({"a": "short"})
+    encoded.add("a", "much longer value")
+    assert encoded.size == len(json.dumps({"a": "much longer value"}))
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str) -> None:
+        self.bucket = bucket
+        self.name = name
+        self.content_encoding: str | None = None
+
+    def upload_from_string(self, data: bytes, **kwargs: Any) -> None:
+        self.bucket.uploads.append((self.name, self.content_encoding, data))
+
+
+class FakeBucket:
+    def __init__(self) -> None:
+        self.exists_calls = 0
+        self.uploads: list[tuple[str, str | None, bytes]] = []
+
+    def exists(self) -> bool:
+        self.exists_calls += 1
+        return True
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+
+class FakeStorageClient:
+    def __init__(self) -> None:
+        self.fake_bucket = FakeBucket()
+
+    def bucket(self, name: str) -> FakeBucket:
+        return self.fake_bucket
+
+
+class FakeLoggingClient:
+    def logger(self, name: str) -> object:
+        return object()
+
+
+def test_large_attributes_are_offloaded_once_per_content() -> None:
+    storage_client = FakeStorageClient()
+    exporter = CloudTraceLoggingSpanExporter(
+        logging_client=FakeLoggingClient(),
+        storage_client=storage_client,
+        bucket_name="logs",
+        project_id="test-project",
+        client=object(),
+    )
+    instruction = "Describe the tavern. " * 20000
+    spans = [
+        exporter._process_large_attributes(
+            {"attributes": {"llm.instruction": instruction, "turn": turn}},
+            span_id=f"span{turn}",
+        )
+        for turn in range(3)
+    ]
+    assert exporter.force_flush()
+    exporter.shutdown()
+
+    bucket = storage_client.fake_bucket
+    assert bucket.exists_calls == 1
+    assert len(bucket.uploads) == 1
+    name, encoding, data = bucket.uploads[0]
+    assert encoding == "gzip"
+    assert json.loads(gzip.decompress(data)) == instruction
+    for turn, span in enumerate(spans):
+        attributes = span["attributes"]
+        assert attributes["llm.instruction"] == f"gs://logs/{name}"
+        assert attributes["offloaded_attributes"] == ["llm.instruction"]
+        assert attributes["turn"] == turn
+        assert len(json.dumps(attributes)) <= MAX_LOGGED_ATTRIBUTES_BYTES